@@ -0,0 +1,198 @@
+"""Per-tab rerun latency and query-count budgets, checked end to end against a local database.
+
+    export DASHBOARD_DB_CONNECTION_STRING="Driver={ODBC Driver 17 for SQL Server};Server=localhost,1433;Database=LoadTest;Uid=sa;Pwd=...;TrustServerCertificate=yes"
+    python budgets.py                          # seed and check 25, 500 and 5,000 properties
+    python budgets.py --scales 25 500 --output budgets-report.json
+    python budgets.py --record budgets.json    # write measured values x headroom as new budgets
+    python budgets.py --budgets budgets.json   # check against recorded budgets
+
+For each scale the database is re-seeded (which bumps the data version, so the first run is
+cold), then the dashboard is rendered headlessly twice: a cold load and a warm rerun. Every
+tab's render time comes from the app's timed sections, and statements are attributed to the
+tab that was rendering when they ran. Query budgets do not grow with the portfolio, so a
+per-property query (N+1) fails at the smallest scale. Exits 1 when any budget is exceeded.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+
+from loadtest import APP_PATH, QueryCounter, install_query_counter
+
+import pyodbc
+from streamlit.testing.v1 import AppTest
+
+from app import CONNECTION_STRING_ENV, RENDER_TIMINGS_KEY, TAB_NAMES, build_connection_string
+from seed import seed_database
+
+SCALES = [25, 500, 5000]
+SEED_MONTHS = 36
+SETUP = 'Setup'
+SECTIONS = [SETUP] + TAB_NAMES
+PHASES = ['cold', 'warm']
+
+# Statements per section. Setup covers connect, migrations, version poll and the shared-cache
+# loads (cube, history, loans); on a warm rerun only the version poll and property list should
+# reach the database.
+DEFAULT_QUERY_BUDGETS = {
+    'cold': dict({SETUP: 15}, **{tab: 2 for tab in TAB_NAMES}),
+    'warm': dict({SETUP: 3}, **{tab: 2 for tab in TAB_NAMES}),
+}
+# Property details plus the rent roll version poll and its three grouped queries
+DEFAULT_QUERY_BUDGETS['cold']["Property Details"] = 5
+
+# Wall time per section in milliseconds, by number of properties
+DEFAULT_WALL_BUDGETS_MS = {
+    25: dict({SETUP: 3000}, **{tab: 1500 for tab in TAB_NAMES}),
+    500: dict({SETUP: 6000}, **{tab: 3000 for tab in TAB_NAMES}),
+    5000: dict({SETUP: 20000}, **{tab: 10000 for tab in TAB_NAMES}),
+}
+# One card per property
+DEFAULT_WALL_BUDGETS_MS[5000]["Property Details"] = 30000
+
+RECORD_HEADROOM = 1.5
+
+
+def load_budgets(path: Optional[str]) -> Dict:
+    if path is None:
+        return {'queries': DEFAULT_QUERY_BUDGETS, 'wall_ms': DEFAULT_WALL_BUDGETS_MS}
+    with open(path, encoding='utf-8') as f:
+        budgets = json.load(f)
+    # JSON object keys are strings
+    budgets['wall_ms'] = {int(scale): sections for scale, sections in budgets['wall_ms'].items()}
+    return budgets
+
+
+def measure_run(at: AppTest, counter: QueryCounter, timeout: float) -> Dict:
+    """Render the page once; wall time and statements per section"""
+    started = time.perf_counter()
+    at.run(timeout=timeout)
+    finished = time.perf_counter()
+
+    errors = [str(e.value) for e in at.exception] + [str(e.value) for e in at.error]
+    intervals = dict(at.session_state[RENDER_TIMINGS_KEY]) if RENDER_TIMINGS_KEY in at.session_state else {}
+    sections = {}
+    in_tabs = 0
+    for tab in TAB_NAMES:
+        if tab not in intervals:
+            errors.append(f"{tab} did not render")
+            continue
+        start, end = intervals[tab]
+        statements = counter.between(start, end)
+        in_tabs += len(statements)
+        sections[tab] = {'ms': (end - start) * 1000, 'queries': len(statements), 'statements': statements}
+
+    first_tab = min((start for start, _ in intervals.values()), default=finished)
+    statements = counter.between(started, finished)
+    sections[SETUP] = {'ms': (first_tab - started) * 1000, 'queries': len(statements) - in_tabs}
+    return {'total_ms': (finished - started) * 1000, 'queries': len(statements), 'sections': sections,
+            'errors': errors}
+
+
+def check_scale(scale: int, months: int, budgets: Dict, counter: QueryCounter, timeout: float,
+                reseed: bool) -> Dict:
+    if reseed:
+        conn = pyodbc.connect(build_connection_string())
+        try:
+            seeded = seed_database(conn, properties=scale, months=months, replace=True)
+        finally:
+            conn.close()
+    else:
+        seeded = None
+
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    at.session_state['authenticated'] = True
+    at.session_state['username'] = 'budget-check'
+
+    wall_budgets = budgets['wall_ms'].get(scale) or budgets['wall_ms'][max(budgets['wall_ms'])]
+    result = {'scale': scale, 'seeded': seeded, 'phases': {}, 'violations': []}
+    for phase in PHASES:
+        run = measure_run(at, counter, timeout)
+        result['phases'][phase] = run
+        for message in run['errors']:
+            result['violations'].append(f"{phase}: page error: {message}")
+        for section, measured in run['sections'].items():
+            max_queries = budgets['queries'][phase].get(section)
+            max_ms = wall_budgets.get(section)
+            if max_queries is not None and measured['queries'] > max_queries:
+                result['violations'].append(
+                    f"{phase} {section}: {measured['queries']} statements > budget {max_queries}")
+            if max_ms is not None and measured['ms'] > max_ms:
+                result['violations'].append(f"{phase} {section}: {measured['ms']:.0f} ms > budget {max_ms} ms")
+    return result
+
+
+def recorded_budgets(results: List[Dict], headroom: float = RECORD_HEADROOM) -> Dict:
+    """Budgets from measured values: slowest phase per section times headroom, query counts as measured"""
+    queries = {phase: {} for phase in PHASES}
+    wall_ms = {}
+    for result in results:
+        wall = wall_ms.setdefault(result['scale'], {})
+        for phase, run in result['phases'].items():
+            for section, measured in run['sections'].items():
+                queries[phase][section] = max(queries[phase].get(section, 0), measured['queries'])
+                wall[section] = max(wall.get(section, 0), int(measured['ms'] * headroom) + 1)
+    return {'queries': queries, 'wall_ms': wall_ms}
+
+
+def print_table(results: List[Dict]):
+    print(f"{'scale':>6} {'phase':<5} {'section':<22} {'ms':>9} {'queries':>8}", file=sys.stderr)
+    for result in results:
+        for phase, run in result['phases'].items():
+            for section in SECTIONS:
+                measured = run['sections'].get(section)
+                if measured is not None:
+                    print(f"{result['scale']:>6} {phase:<5} {section:<22} {measured['ms']:>9.0f} "
+                          f"{measured['queries']:>8}", file=sys.stderr)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Check per-tab latency and query budgets at fixed scales")
+    parser.add_argument('--scales', type=int, nargs='+', default=SCALES, help="Property counts to seed and check")
+    parser.add_argument('--months', type=int, default=SEED_MONTHS)
+    parser.add_argument('--no-seed', action='store_true',
+                        help="Check the database as it is (a single scale, taken from --scales)")
+    parser.add_argument('--budgets', default=None, help="JSON budgets file (default: the built-in budgets)")
+    parser.add_argument('--record', default=None, help="Write measured values x headroom as a budgets file")
+    parser.add_argument('--timeout', type=float, default=300.0, help="Per-run timeout in seconds")
+    parser.add_argument('--output', default=None, help="Also write the JSON report to this file")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not os.environ.get(CONNECTION_STRING_ENV):
+        parser.error(f"Set {CONNECTION_STRING_ENV} to a local database that can be re-seeded")
+    if args.no_seed and len(args.scales) != 1:
+        parser.error("--no-seed checks one scale; pass it with --scales")
+
+    budgets = load_budgets(args.budgets)
+    counter = QueryCounter(keep_log=True)
+    undo = install_query_counter(counter)
+    try:
+        results = [check_scale(scale, args.months, budgets, counter, args.timeout, reseed=not args.no_seed)
+                   for scale in args.scales]
+    finally:
+        undo()
+
+    print_table(results)
+    report = {'results': results, 'violations': [f"{result['scale']} properties, {violation}"
+                                                  for result in results for violation in result['violations']]}
+    text = json.dumps(report, indent=2, default=str)
+    print(text)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    if args.record:
+        with open(args.record, 'w', encoding='utf-8') as f:
+            json.dump(recorded_budgets(results), f, indent=2)
+        return
+    if report['violations']:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
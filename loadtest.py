@@ -0,0 +1,366 @@
+"""Concurrent-session load test for the dashboard against a local seeded database.
+
+    export DASHBOARD_DB_CONNECTION_STRING="Driver={ODBC Driver 17 for SQL Server};Server=localhost,1433;Database=LoadTest;Uid=sa;Pwd=...;TrustServerCertificate=yes"
+    python main.py seed --properties 500 --months 36 --replace
+    python loadtest.py --sessions 20 --actions 30
+    python loadtest.py --sessions 50 --actions 20 --no-writes --output report.json
+
+Every simulated session is a headless AppTest run of streamlit-app/app.py in its own thread.
+All sessions share one process, so st.cache_resource (connection pool, shared frame cache)
+is shared between them as it is between browser tabs on one app instance. Each session logs
+in, loads the dashboard, then plays a random click path. The JSON report has rerun latency
+percentiles per action, reruns per second, database statements per rerun and peak RSS.
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'streamlit-app')
+APP_PATH = os.path.join(APP_DIR, 'app.py')
+sys.path.insert(0, APP_DIR)
+
+import numpy as np
+import pyodbc
+from streamlit.runtime import Runtime
+from streamlit.testing.v1 import AppTest
+
+from app import CONNECTION_STRING_ENV
+
+PERCENTILES = [50, 90, 95, 99]
+
+
+class QueryCounter:
+    """Thread-safe count of statements sent to the database, grouped by their first line.
+
+    With `keep_log`, every statement's perf_counter timestamp is kept too, so statements can
+    be attributed to the page section that was rendering when they ran.
+    """
+
+    def __init__(self, keep_log: bool = False):
+        self._lock = threading.Lock()
+        self.total = 0
+        self.statements = Counter()
+        self.log: Optional[List] = [] if keep_log else None
+
+    def record(self, sql: str):
+        fingerprint = ' '.join(str(sql).split())[:100]
+        with self._lock:
+            self.total += 1
+            self.statements[fingerprint] += 1
+            if self.log is not None:
+                self.log.append((time.perf_counter(), fingerprint))
+
+    def between(self, start: float, end: float) -> List[str]:
+        """Statements recorded within [start, end]; needs keep_log"""
+        with self._lock:
+            return [sql for at, sql in self.log if start <= at <= end]
+
+
+class CountingCursor:
+    def __init__(self, cursor, counter: QueryCounter):
+        object.__setattr__(self, '_cursor', cursor)
+        object.__setattr__(self, '_counter', counter)
+
+    def execute(self, sql, *params):
+        self._counter.record(sql)
+        return self._cursor.execute(sql, *params)
+
+    def executemany(self, sql, params):
+        self._counter.record(sql)
+        return self._cursor.executemany(sql, params)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._cursor, name, value)
+
+
+class CountingConnection:
+    """pyodbc connection proxy whose cursors report every statement to a QueryCounter"""
+
+    def __init__(self, conn, counter: QueryCounter):
+        object.__setattr__(self, '_conn', conn)
+        object.__setattr__(self, '_counter', counter)
+
+    def cursor(self):
+        return CountingCursor(self._conn.cursor(), self._counter)
+
+    def execute(self, sql, *params):
+        self._counter.record(sql)
+        return self._conn.execute(sql, *params)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._conn, name, value)
+
+
+def install_query_counter(counter: QueryCounter) -> Callable[[], None]:
+    """Route every pyodbc.connect through CountingConnection; returns the undo function"""
+    connect = pyodbc.connect
+
+    def counting_connect(*args, **kwargs):
+        return CountingConnection(connect(*args, **kwargs), counter)
+
+    pyodbc.connect = counting_connect
+
+    def restore():
+        pyodbc.connect = connect
+    return restore
+
+
+def share_test_runtime() -> Callable[[], None]:
+    """Let AppTest runs overlap in one process.
+
+    AppTest installs a mock Runtime for each run and clears the singleton when the run ends,
+    which would pull it out from under other sessions still running. Fall back to the last
+    installed runtime instead of raising.
+    """
+    original = Runtime.__dict__['instance']
+    last = {}
+
+    def instance(cls):
+        if cls._instance is not None:
+            last['runtime'] = cls._instance
+            return cls._instance
+        if 'runtime' in last:
+            return last['runtime']
+        return original.__func__(cls)
+
+    Runtime.instance = classmethod(instance)
+
+    def restore():
+        Runtime.instance = original
+    return restore
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is kilobytes on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _widget(at: AppTest, kind: str, label: str, form: Optional[str] = None):
+    for widget in getattr(at, kind):
+        if widget.label == label and (form is None or getattr(widget, 'form_id', '') == form):
+            return widget
+    raise LookupError(f"No {kind} labelled {label!r} on the page")
+
+
+# Click paths: each takes a session that has already rendered the dashboard and triggers one rerun
+
+def action_change_range(at: AppTest, rng: random.Random):
+    time_range = _widget(at, 'selectbox', "Time Range")
+    options = [option for option in time_range.options if option != "Custom Range"]
+    time_range.select(rng.choice(options)).run()
+
+
+def action_change_year(at: AppTest, rng: random.Random):
+    time_range = _widget(at, 'selectbox', "Time Range")
+    if time_range.value != "Calendar Year":
+        time_range.select("Calendar Year").run()
+    year = _widget(at, 'selectbox', "Select Year")
+    year.select(rng.choice(year.options)).run()
+
+
+def action_top_movers(at: AppTest, rng: random.Random):
+    compare = _widget(at, 'selectbox', "Compare")
+    compare.select(rng.choice(compare.options)).run()
+
+
+def action_alert_filter(at: AppTest, rng: random.Random):
+    severity = _widget(at, 'multiselect', "Severity")
+    severity.set_value(rng.sample(list(severity.options), rng.randint(1, len(severity.options)))).run()
+
+
+def action_history_filter(at: AppTest, rng: random.Random):
+    history = _widget(at, 'selectbox', "Filter by Property")
+    history.select(rng.choice(history.options)).run()
+
+
+def action_manual_import(at: AppTest, rng: random.Random):
+    form = 'manual_entry_form'
+    prop = _widget(at, 'selectbox', "Select Property", form)
+    prop.select(rng.choice(prop.options))
+    gross = rng.uniform(20_000, 400_000)
+    vacancy = gross * rng.uniform(0.02, 0.12)
+    expenses = gross * rng.uniform(0.3, 0.5)
+    _widget(at, 'number_input', "Gross Rent ($)", form).set_value(round(gross, 2))
+    _widget(at, 'number_input', "Vacancy Loss ($)", form).set_value(round(vacancy, 2))
+    _widget(at, 'number_input', "Total Income ($)", form).set_value(round(gross - vacancy, 2))
+    _widget(at, 'number_input', "Total Expenses ($)", form).set_value(round(expenses, 2))
+    _widget(at, 'button', "💾 Save Financial Data", form).click().run()
+
+
+ACTIONS: Dict[str, Callable] = {
+    'change_range': action_change_range,
+    'change_year': action_change_year,
+    'top_movers': action_top_movers,
+    'alert_filter': action_alert_filter,
+    'history_filter': action_history_filter,
+    'manual_import': action_manual_import,
+}
+
+# Relative frequency of each click in a session; analysts mostly browse
+DEFAULT_WEIGHTS = {'change_range': 3, 'change_year': 3, 'top_movers': 2, 'alert_filter': 1,
+                   'history_filter': 2, 'manual_import': 1}
+
+
+class SessionResult:
+    def __init__(self, session: int):
+        self.session = session
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: List[Dict] = []
+        # Clicks whose widget was not on the page (e.g. no alerts in range to filter)
+        self.skipped = Counter()
+
+
+def page_errors(at: AppTest) -> List[str]:
+    """Uncaught exceptions plus st.error messages the run rendered"""
+    return [str(e.value) for e in at.exception] + [str(e.value) for e in at.error]
+
+
+def run_session(session: int, actions: int, weights: Dict[str, int], seed: int, timeout: float,
+                start_barrier: Optional[threading.Barrier] = None) -> SessionResult:
+    rng = random.Random(seed * 1000 + session)
+    result = SessionResult(session)
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    at.session_state['authenticated'] = True
+    at.session_state['username'] = f"loadtest-{session}"
+
+    if start_barrier is not None:
+        start_barrier.wait()
+
+    names, frequency = zip(*weights.items())
+    plan = ['initial_load'] + rng.choices(names, weights=frequency, k=actions)
+    for name in plan:
+        started = time.perf_counter()
+        try:
+            if name == 'initial_load':
+                at.run()
+            else:
+                ACTIONS[name](at, rng)
+        except LookupError:
+            result.skipped[name] += 1
+            continue
+        except Exception as e:
+            result.errors.append({'action': name, 'error': f"{type(e).__name__}: {e}"})
+            continue
+        result.latencies[name].append(time.perf_counter() - started)
+        for message in page_errors(at):
+            result.errors.append({'action': name, 'error': message})
+    return result
+
+
+def summarize_latencies(samples: List[float]) -> Dict:
+    values = np.asarray(samples) * 1000
+    summary = {'count': len(values)}
+    if len(values):
+        summary.update({f'p{p}_ms': float(np.percentile(values, p)) for p in PERCENTILES})
+        summary['max_ms'] = float(values.max())
+        summary['mean_ms'] = float(values.mean())
+    return summary
+
+
+def run_load_test(sessions: int, actions: int, weights: Dict[str, int], seed: int = 0,
+                  timeout: float = 120.0) -> Dict:
+    counter = QueryCounter()
+    undo_counter = install_query_counter(counter)
+    undo_runtime = share_test_runtime()
+    rss_before = peak_rss_mb()
+    barrier = threading.Barrier(sessions)
+
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=sessions, thread_name_prefix='loadtest-session') as executor:
+            futures = [executor.submit(run_session, i, actions, weights, seed, timeout, barrier)
+                       for i in range(sessions)]
+            results = [future.result() for future in futures]
+    finally:
+        undo_runtime()
+        undo_counter()
+    elapsed = time.perf_counter() - started
+
+    by_action: Dict[str, List[float]] = defaultdict(list)
+    for result in results:
+        for name, samples in result.latencies.items():
+            by_action[name].extend(samples)
+    all_samples = [sample for samples in by_action.values() for sample in samples]
+    errors = [dict(error, session=result.session) for result in results for error in result.errors]
+    skipped = sum((result.skipped for result in results), Counter())
+
+    reruns = len(all_samples)
+    return {
+        'sessions': sessions,
+        'actions_per_session': actions,
+        'seed': seed,
+        'elapsed_seconds': elapsed,
+        'reruns': reruns,
+        'reruns_per_second': reruns / elapsed if elapsed > 0 else 0.0,
+        'latency': summarize_latencies(all_samples),
+        'latency_by_action': {name: summarize_latencies(samples) for name, samples in sorted(by_action.items())},
+        'queries': counter.total,
+        'queries_per_rerun': counter.total / reruns if reruns else 0.0,
+        'top_statements': [{'statement': sql, 'count': count} for sql, count in counter.statements.most_common(10)],
+        'peak_rss_mb': peak_rss_mb(),
+        'rss_growth_mb': peak_rss_mb() - rss_before,
+        'skipped_actions': dict(skipped),
+        'errors': len(errors),
+        'error_samples': errors[:20]
+    }
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Concurrent-session load test for the dashboard")
+    parser.add_argument('--sessions', type=int, default=10, help="Simulated concurrent sessions")
+    parser.add_argument('--actions', type=int, default=20, help="Clicks per session after the initial load")
+    parser.add_argument('--seed', type=int, default=0, help="Click-path random seed")
+    parser.add_argument('--timeout', type=float, default=120.0, help="Per-rerun timeout in seconds")
+    parser.add_argument('--no-writes', action='store_true', help="Leave manual imports out of the click paths")
+    parser.add_argument('--weight', action='append', default=[], metavar='ACTION=N',
+                        help=f"Override a click-path weight; actions: {', '.join(ACTIONS)}")
+    parser.add_argument('--output', default=None, help="Also write the JSON report to this file")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not os.environ.get(CONNECTION_STRING_ENV):
+        parser.error(f"Set {CONNECTION_STRING_ENV} to a local seeded database (see `python main.py seed`)")
+
+    weights = dict(DEFAULT_WEIGHTS)
+    for override in args.weight:
+        name, _, value = override.partition('=')
+        if name not in ACTIONS:
+            parser.error(f"Unknown action {name!r}")
+        weights[name] = int(value)
+    if args.no_writes:
+        weights.pop('manual_import', None)
+    weights = {name: weight for name, weight in weights.items() if weight > 0}
+
+    report = run_load_test(args.sessions, args.actions, weights, seed=args.seed, timeout=args.timeout)
+    text = json.dumps(report, indent=2, default=str)
+    print(text)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    if report['errors']:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
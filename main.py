@@ -0,0 +1,448 @@
+"""Headless entry point for batch ETL against the dashboard database.
+
+    python main.py import data/2024-*.csv --workers 4
+    python main.py ingest-t12 t12s/*.xlsx --mapping coa.json --workers 8
+    python main.py ingest-rentroll rentrolls/*.csv --as-of 2024-12-31 --workers 4
+    python main.py export history --output history.parquet
+    python main.py rollup --by property --start 2024-01 --end 2024-12 --output rollup.csv
+    python main.py kpis --range "Trailing 12 Months"
+    python main.py quality --output fixlist.csv --fix noi_mismatch cash_flow_mismatch
+    python main.py seed --properties 500 --months 36 --replace
+
+Every command prints a JSON summary with its timings to stdout.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'streamlit-app'))
+
+import pandas as pd
+import pyodbc
+
+from app import RealEstateDashboard, build_connection_string
+from cube import FinancialCube, ROLLUP_AXES
+from etl import load_financial_csv
+from exports import EXPORT_FORMATS, write_export
+import quality
+from rentroll_etl import apply_rent_roll, load_rent_roll
+from scheduler import ConnectionPool
+from schema import ensure_schema
+from seed import seed_database
+from t12 import ingest_workbooks, load_mapping
+from timeseries import RANGE_MODES, TimeRangeEngine
+
+EXPORT_DATASETS = ['history', 'monthly', 'properties']
+
+
+def make_pool(max_size: int) -> ConnectionPool:
+    return ConnectionPool(lambda: pyodbc.connect(build_connection_string()), max_size=max_size)
+
+
+def load_cube(pool: ConnectionPool, timings: Dict) -> FinancialCube:
+    """Rebuild the property x month x line item cube straight from MonthlyFinancials"""
+    started = time.perf_counter()
+    with pool.connection() as conn:
+        records = RealEstateDashboard._query_cube_records(conn)
+        properties = RealEstateDashboard._query_cube_properties(conn)
+    timings['query_seconds'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    cube = FinancialCube(records, properties)
+    timings['build_seconds'] = time.perf_counter() - started
+    return cube
+
+
+def parse_file(path: str, valid_property_ids: List[int]) -> Dict:
+    """Parse and validate one file; returns its loaded frames and the result it will report"""
+    loaded = load_financial_csv(path, valid_property_ids)
+    loaded['path'] = path
+    loaded['result'] = {
+        'file': loaded['file'],
+        'rows': len(loaded['frame']) + len(loaded['rejected']),
+        'new': 0,
+        'updated': 0,
+        'unchanged': 0,
+        'rejected': len(loaded['rejected']),
+        'parse_seconds': loaded['parse_seconds'],
+        'write_seconds': 0.0
+    }
+    return loaded
+
+
+def write_file(pool: ConnectionPool, loaded: Dict) -> Dict:
+    """Upsert one parsed file in its own transaction on a pooled connection"""
+    result = loaded['result']
+    started = time.perf_counter()
+    dashboard = RealEstateDashboard(pool=pool)
+    try:
+        result.update(dashboard.import_financial_frame(loaded['frame'], file_path=loaded['path']))
+    finally:
+        dashboard.disconnect_from_database()
+    result['write_seconds'] = time.perf_counter() - started
+    result['data_version'] = dashboard.data_version
+    return result
+
+
+def write_group(pool: ConnectionPool, group: List[Dict]) -> List[Dict]:
+    """Write files one after another, so each is classified against the rows the previous one stored"""
+    outcomes = []
+    for loaded in group:
+        try:
+            outcomes.append(write_file(pool, loaded))
+        except Exception as e:
+            outcomes.append({'file': loaded['file'], 'error': str(e)})
+    return outcomes
+
+
+def overlapping_groups(loaded_files: List[Dict]) -> List[List[Dict]]:
+    """Chain files that share any (PropertyID, ReportingMonth), keeping command-line order within a chain.
+
+    Files in different chains never write the same row, so chains can run in parallel. Two files
+    writing the same new property-month at once would both classify it as new against the same
+    stored hashes, and the second insert would hit UQ_MonthlyFinancials_PropertyMonth.
+    """
+    parent = list(range(len(loaded_files)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    owners = {}
+    for i, loaded in enumerate(loaded_files):
+        frame = loaded['frame']
+        for cell in zip(frame['PropertyID'], frame['ReportingMonth']):
+            owner = owners.setdefault(cell, i)
+            if owner != i:
+                parent[find(i)] = find(owner)
+
+    groups = {}
+    for i, loaded in enumerate(loaded_files):
+        groups.setdefault(find(i), []).append(loaded)
+    return list(groups.values())
+
+
+def cmd_import(args) -> Dict:
+    pool = make_pool(args.workers + 1)
+    with pool.connection() as conn:
+        ensure_schema(conn)
+        valid_property_ids = [pid for pid, _ in RealEstateDashboard._query_property_list(conn)]
+
+    files, failed, parsed = [], [], {}
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        # Parse everything first, so files touching the same property-months can be written in order
+        futures = {executor.submit(parse_file, path, valid_property_ids): path for path in args.files}
+        for future in as_completed(futures):
+            try:
+                parsed[futures[future]] = future.result()
+            except Exception as e:
+                failed.append({'file': os.path.basename(futures[future]), 'error': str(e)})
+
+        loaded_files = [parsed[path] for path in args.files if path in parsed]
+        pending = [loaded for loaded in loaded_files if not args.dry_run and not loaded['frame'].empty]
+        files.extend(loaded['result'] for loaded in loaded_files if args.dry_run or loaded['frame'].empty)
+        futures = [executor.submit(write_group, pool, group) for group in overlapping_groups(pending)]
+        for future in as_completed(futures):
+            for outcome in future.result():
+                (failed if 'error' in outcome else files).append(outcome)
+    pool.close_all()
+
+    files.sort(key=lambda result: result['file'])
+    return {
+        'files': files,
+        'failed': failed,
+        'rows': sum(result['rows'] for result in files),
+        'new': sum(result['new'] for result in files),
+        'updated': sum(result['updated'] for result in files),
+        'unchanged': sum(result['unchanged'] for result in files),
+        'rejected': sum(result['rejected'] for result in files),
+        'dry_run': args.dry_run
+    }
+
+
+def cmd_ingest_t12(args) -> Dict:
+    pool = make_pool(1)
+    with pool.connection() as conn:
+        ensure_schema(conn)
+        property_ids = {name: pid for pid, name in RealEstateDashboard._query_property_list(conn)}
+
+    result = ingest_workbooks(args.files, mapping=load_mapping(args.mapping), property_ids=property_ids,
+                              workers=args.workers, sheet=args.sheet)
+    frame = result.pop('frame')
+    summary = dict(result, rows=len(frame), new=0, updated=0, unchanged=0, dry_run=args.dry_run, write_seconds=0.0)
+
+    if not args.dry_run and not frame.empty:
+        started = time.perf_counter()
+        dashboard = RealEstateDashboard(pool=pool)
+        try:
+            # One transaction (and one version bump) per property
+            for _, rows in frame.groupby('PropertyID', sort=True):
+                counts = dashboard.import_financial_frame(rows, file_path='T12 Import')
+                for status, count in counts.items():
+                    summary[status] += count
+        finally:
+            dashboard.disconnect_from_database()
+        summary['write_seconds'] = time.perf_counter() - started
+    pool.close_all()
+    return summary
+
+
+def ingest_rent_roll_file(pool: ConnectionPool, path: str, property_ids: Dict[str, int], args) -> Dict:
+    """Stream-parse one rent roll and apply it property by property on a pooled connection"""
+    loaded = load_rent_roll(path, property_ids=property_ids, valid_property_ids=property_ids.values(),
+                            property_id=args.property_id, sheet=args.sheet)
+    result = {'file': loaded['file'], 'rows': loaded['rows'], 'units': len(loaded['frame']),
+              'rejected': len(loaded['rejected']), 'parse_seconds': loaded['parse_seconds'],
+              'rows_per_second': loaded['rows'] / loaded['parse_seconds'] if loaded['parse_seconds'] > 0 else 0.0}
+    if args.dry_run or loaded['frame'].empty:
+        return result
+
+    with pool.connection() as conn:
+        applied = apply_rent_roll(conn, loaded['frame'], as_of=args.as_of)
+    applied.pop('properties')
+    result.update(applied)
+    return result
+
+
+def cmd_ingest_rentroll(args) -> Dict:
+    pool = make_pool(args.workers + 1)
+    with pool.connection() as conn:
+        ensure_schema(conn)
+        property_ids = {name: pid for pid, name in RealEstateDashboard._query_property_list(conn)}
+
+    files, failed = [], []
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = {executor.submit(ingest_rent_roll_file, pool, path, property_ids, args): path
+                   for path in args.files}
+        for future in as_completed(futures):
+            try:
+                files.append(future.result())
+            except Exception as e:
+                failed.append({'file': os.path.basename(futures[future]), 'error': str(e)})
+    pool.close_all()
+
+    files.sort(key=lambda result: result['file'])
+    failed.extend(dict(failure, file=result['file']) for result in files for failure in result.get('failed', []))
+    summary = {'files': files, 'failed': failed, 'dry_run': args.dry_run}
+    for name in ['rows', 'units', 'rejected', 'units_inserted', 'units_updated', 'leases_inserted',
+                 'leases_updated', 'move_outs', 'leases_kept']:
+        summary[name] = sum(result.get(name, 0) for result in files)
+    write_seconds = sum(result.get('write_seconds', 0.0) for result in files)
+    summary['units_per_second'] = summary['units'] / write_seconds if write_seconds > 0 else 0.0
+    return summary
+
+
+def cmd_export(args) -> Dict:
+    fmt = args.format or next((name for name, (ext, _) in EXPORT_FORMATS.items()
+                               if args.output.endswith('.' + ext)), 'CSV')
+    pool = make_pool(1)
+    timings = {}
+
+    started = time.perf_counter()
+    if args.dataset == 'monthly':
+        data = load_cube(pool, timings).monthly_series()
+    else:
+        with pool.connection() as conn:
+            if args.dataset == 'history':
+                data = RealEstateDashboard._query_financial_history(conn, args.property_id)
+            else:
+                data = RealEstateDashboard._query_cube_properties(conn)
+    timings['load_seconds'] = time.perf_counter() - started
+    pool.close_all()
+
+    started = time.perf_counter()
+    with open(args.output, 'wb') as f:
+        rows = write_export(data, fmt, f, sheet_name=args.dataset.title())
+    timings['write_seconds'] = time.perf_counter() - started
+    return {'dataset': args.dataset, 'format': fmt, 'output': args.output, 'rows': rows,
+            'bytes': os.path.getsize(args.output), 'timings': timings}
+
+
+def cmd_rollup(args) -> Dict:
+    pool = make_pool(1)
+    timings = {}
+    cube = load_cube(pool, timings)
+    pool.close_all()
+
+    started = time.perf_counter()
+    rollup = cube.rollup(by=args.by, start=args.start, end=args.end, how=args.how)
+    timings['rollup_seconds'] = time.perf_counter() - started
+
+    summary = {'by': args.by, 'how': args.how, 'cube_shape': list(cube.shape),
+               'cube_bytes': cube.nbytes, 'rows': len(rollup), 'timings': timings}
+    if args.output:
+        with open(args.output, 'wb') as f:
+            write_export(rollup.reset_index(), args.format, f, sheet_name='Rollup')
+        summary['output'] = args.output
+    return summary
+
+
+def cmd_kpis(args) -> Dict:
+    pool = make_pool(1)
+    timings = {}
+    cube = load_cube(pool, timings)
+    pool.close_all()
+
+    started = time.perf_counter()
+    engine = TimeRangeEngine(cube.monthly_series())
+    if engine.is_empty:
+        raise SystemExit("No monthly financials loaded")
+    start, end = engine.resolve(args.range, year=args.year or engine.last_month.year,
+                                start=args.start, end=args.end)
+    kpis = cube.kpis(start, end)
+    timings['kpi_seconds'] = time.perf_counter() - started
+    return {'range': args.range, 'start': start.strftime('%Y-%m'), 'end': end.strftime('%Y-%m'),
+            'kpis': kpis, 'timings': timings}
+
+
+def cmd_quality(args) -> Dict:
+    tasks = quality.scan_tasks(args.tolerance, args.outlier_z)
+    pool = make_pool(len(tasks))
+    timings = {}
+
+    # Each check is one set-based query, so they run side by side on pooled connections
+    started = time.perf_counter()
+    def run_check(task):
+        with pool.connection() as conn:
+            return task(conn)
+
+    with ThreadPoolExecutor(max_workers=len(tasks)) as executor:
+        frames = [future.result() for future in as_completed(executor.submit(run_check, task)
+                                                              for task in tasks.values())]
+    issues = pd.concat(frames, ignore_index=True).reindex(columns=quality.ISSUE_COLUMNS)
+    with pool.connection() as conn:
+        property_names = dict(RealEstateDashboard._query_cube_properties(conn)[['PropertyID', 'PropertyName']]
+                              .itertuples(index=False))
+    timings['scan_seconds'] = time.perf_counter() - started
+
+    fixes = quality.fix_list(issues, property_names)
+    summary = {'issues': len(fixes), 'checks': quality.summary(issues).to_dict('records'), 'timings': timings}
+    if args.output:
+        fmt = args.format or next((name for name, (ext, _) in EXPORT_FORMATS.items()
+                                   if args.output.endswith('.' + ext)), 'CSV')
+        with open(args.output, 'wb') as f:
+            write_export(fixes, fmt, f, sheet_name='Fix List')
+        summary['output'] = args.output
+
+    if args.fix:
+        started = time.perf_counter()
+        with pool.connection() as conn:
+            summary['fixed'] = quality.apply_fixes(conn, args.fix, args.tolerance, args.property_id)
+        timings['fix_seconds'] = time.perf_counter() - started
+    pool.close_all()
+    return summary
+
+
+def cmd_seed(args) -> Dict:
+    conn = pyodbc.connect(build_connection_string())
+    try:
+        started = time.perf_counter()
+        summary = seed_database(conn, properties=args.properties, months=args.months, seed=args.seed,
+                                end_month=args.end, replace=args.replace)
+    finally:
+        conn.close()
+    summary['seed_seconds'] = time.perf_counter() - started
+    return summary
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Batch ETL for the real estate dashboard database")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    importer = commands.add_parser('import', help="Bulk import MonthlyFinancials CSV files")
+    importer.add_argument('files', nargs='+', help="CSV files in the CSV Import template layout")
+    importer.add_argument('--workers', type=int, default=min(4, os.cpu_count() or 1),
+                          help="Files processed in parallel, each on its own connection")
+    importer.add_argument('--dry-run', action='store_true', help="Parse and validate without writing")
+    importer.set_defaults(handler=cmd_import)
+
+    t12 = commands.add_parser('ingest-t12', help="Ingest property-manager T12 workbooks")
+    t12.add_argument('files', nargs='+', help="T12 .xlsx workbooks (12 month columns x GL line items)")
+    t12.add_argument('--mapping', default=None,
+                     help="JSON chart-of-accounts mapping {column: [GL code/label patterns]}")
+    t12.add_argument('--sheet', default=None, help="Worksheet name (default: first sheet)")
+    t12.add_argument('--workers', type=int, default=None, help="Parser processes (default: CPU count)")
+    t12.add_argument('--dry-run', action='store_true', help="Parse and map without writing")
+    t12.set_defaults(handler=cmd_ingest_t12)
+
+    rentroll = commands.add_parser('ingest-rentroll', help="Load rent roll exports into Units and Tenants")
+    rentroll.add_argument('files', nargs='+', help="Rent roll .csv or .xlsx exports, one row per unit")
+    rentroll.add_argument('--as-of', default=None,
+                          help="Rent roll date (YYYY-MM-DD, default: today); units vacant on it move out")
+    rentroll.add_argument('--property-id', type=int, default=None,
+                          help="Property for files without a property column")
+    rentroll.add_argument('--sheet', default=None, help="Worksheet name for workbooks (default: first sheet)")
+    rentroll.add_argument('--workers', type=int, default=min(4, os.cpu_count() or 1),
+                          help="Files processed in parallel, each on its own connection")
+    rentroll.add_argument('--dry-run', action='store_true', help="Parse and normalize without writing")
+    rentroll.set_defaults(handler=cmd_ingest_rentroll)
+
+    exporter = commands.add_parser('export', help="Export a dataset to a file")
+    exporter.add_argument('dataset', choices=EXPORT_DATASETS)
+    exporter.add_argument('--output', required=True)
+    exporter.add_argument('--format', choices=list(EXPORT_FORMATS), default=None,
+                          help="Defaults to the format matching the output extension")
+    exporter.add_argument('--property-id', type=int, default=None, help="Limit history to one property")
+    exporter.set_defaults(handler=cmd_export)
+
+    rollup = commands.add_parser('rollup', help="Rebuild the financial cube and aggregate it")
+    rollup.add_argument('--by', choices=list(ROLLUP_AXES), default='property')
+    rollup.add_argument('--how', choices=['sum', 'mean', 'count'], default='sum')
+    rollup.add_argument('--start', default=None, help="First month (YYYY-MM)")
+    rollup.add_argument('--end', default=None, help="Last month (YYYY-MM)")
+    rollup.add_argument('--output', default=None)
+    rollup.add_argument('--format', choices=list(EXPORT_FORMATS), default='CSV')
+    rollup.set_defaults(handler=cmd_rollup)
+
+    kpis = commands.add_parser('kpis', help="Compute portfolio KPIs for a time range")
+    kpis.add_argument('--range', choices=RANGE_MODES, default="Trailing 12 Months")
+    kpis.add_argument('--year', type=int, default=None, help="Year for Calendar Year / Year to Date")
+    kpis.add_argument('--start', default=None, help="First month for Custom Range (YYYY-MM)")
+    kpis.add_argument('--end', default=None, help="Last month for Custom Range (YYYY-MM)")
+    kpis.set_defaults(handler=cmd_kpis)
+
+    checker = commands.add_parser('quality', help="Scan MonthlyFinancials for reconciliation errors")
+    checker.add_argument('--tolerance', type=float, default=quality.DEFAULT_TOLERANCE,
+                         help="Dollar difference allowed before a total counts as a mismatch")
+    checker.add_argument('--outlier-z', type=float, default=quality.DEFAULT_OUTLIER_Z,
+                         help="Robust z-score above which a month is flagged as an outlier")
+    checker.add_argument('--output', default=None, help="Write the prioritized fix list here")
+    checker.add_argument('--format', choices=list(EXPORT_FORMATS), default=None,
+                         help="Defaults to the output file's extension")
+    checker.add_argument('--fix', nargs='+', choices=quality.AUTO_FIXES, default=None,
+                         help="Auto-correct rows failing these checks after the scan")
+    checker.add_argument('--property-id', type=int, nargs='+', default=None, help="Limit --fix to these properties")
+    checker.set_defaults(handler=cmd_quality)
+
+    seed = commands.add_parser('seed', help="Fill a local database with synthetic data for load tests")
+    seed.add_argument('--properties', type=int, default=25)
+    seed.add_argument('--months', type=int, default=36)
+    seed.add_argument('--end', default=None, help="Last seeded month (YYYY-MM, default: this month)")
+    seed.add_argument('--seed', type=int, default=0, help="Random seed; equal seeds give identical data")
+    seed.add_argument('--replace', action='store_true', help="Delete existing properties and financials first")
+    seed.set_defaults(handler=cmd_seed)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == 'kpis' and args.range == "Custom Range" and not (args.start and args.end):
+        parser.error("--start and --end are required with --range 'Custom Range'")
+    started = time.perf_counter()
+    summary = args.handler(args)
+    summary['command'] = args.command
+    summary['total_seconds'] = time.perf_counter() - started
+    print(json.dumps(summary, indent=2, default=str))
+    if summary.get('failed'):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+import ast
+import json
+import operator
+import os
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from cube import FinancialCube, LINE_ITEMS, ITEM_INDEX, METRIC_INDEX
+from timeseries import month_ordinal
+from variance import COMPARISONS, LOOKBACK, VarianceEngine
+
+SEVERITY_WEIGHT = {'critical': 3.0, 'warning': 2.0, 'info': 1.0}
+
+# Optional rule file next to the app; the defaults below apply when it is missing
+ALERT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'alert_rules.json')
+
+OPERATORS = {'<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge}
+
+# Ratios available to rule expressions alongside the raw line items and the ratios stored with
+# each row (VacancyPct, NOIMargin, ExpenseRatio, ...); the first two keep their older rule names
+DERIVED_METRICS = {
+    'VacancyRate': lambda v: v['VacancyPct'],
+    'NOI_Margin': lambda v: v['NOIMargin'],
+    'CashFlowMargin': lambda v: _ratio(v['CashFlow'], v['TotalIncome']) * 100,
+    'DSCR': lambda v: _ratio(v['NOI'], v['DebtService']),
+}
+
+# Rule functions: percent change against the variance engine's baselines
+FUNCTIONS = {
+    'mom': 'MoM',
+    'yoy': 'YoY',
+    'vs_t3': 'vs T3',
+    'vs_t12': 'vs T12 Avg',
+}
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(denominator != 0, numerator / denominator, np.nan)
+
+
+# Expression evaluation: a small whitelisted subset of Python over [property, month] arrays
+_BINARY = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv,
+           ast.BitAnd: operator.and_, ast.BitOr: operator.or_}
+_COMPARE = {ast.Lt: operator.lt, ast.LtE: operator.le, ast.Gt: operator.gt, ast.GtE: operator.ge,
+            ast.Eq: operator.eq, ast.NotEq: operator.ne}
+_NAMES = set(LINE_ITEMS) | set(METRIC_INDEX) | set(DERIVED_METRICS)
+
+
+def _parse(expression: str) -> ast.AST:
+    tree = ast.parse(expression, mode='eval').body
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and node.id not in _NAMES and node.id not in FUNCTIONS and node.id != 'abs':
+            raise ValueError(f"Unknown name '{node.id}' in '{expression}'")
+        if isinstance(node, ast.Call) and not (isinstance(node.func, ast.Name) and len(node.args) == 1
+                                               and not node.keywords
+                                               and (node.func.id in FUNCTIONS or node.func.id == 'abs')):
+            raise ValueError(f"Unsupported call in '{expression}'")
+        if not isinstance(node, (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Compare, ast.BoolOp, ast.Call,
+                                 ast.Name, ast.Constant, ast.Load, ast.USub, ast.UAdd, ast.And, ast.Or,
+                                 *_BINARY, *_COMPARE)):
+            raise ValueError(f"Unsupported syntax '{type(node).__name__}' in '{expression}'")
+    return tree
+
+
+class AlertRule:
+    """Threshold rule over a metric expression, with optional per-property thresholds"""
+
+    def __init__(self, name: str, metric: str, op: str, threshold: float, severity: str = 'warning',
+                 message: str = "{rule}: {value:,.1f} (threshold {threshold:,.1f})",
+                 where: Optional[str] = None, overrides: Optional[Dict[int, float]] = None):
+        if op not in OPERATORS:
+            raise ValueError(f"Unknown operator '{op}' in rule '{name}'")
+        if severity not in SEVERITY_WEIGHT:
+            raise ValueError(f"Unknown severity '{severity}' in rule '{name}'")
+        self.name = name
+        self.metric = metric
+        self.op = op
+        self.threshold = float(threshold)
+        self.severity = severity
+        self.message = message
+        self.where = where
+        self.overrides = {int(pid): float(value) for pid, value in (overrides or {}).items()}
+        # Parse up front so a bad expression fails when the rules load, not mid-render
+        self._metric_tree = _parse(metric)
+        self._where_tree = _parse(where) if where else None
+
+    def to_dict(self) -> Dict:
+        return {'name': self.name, 'metric': self.metric, 'op': self.op, 'threshold': self.threshold,
+                'severity': self.severity, 'message': self.message, 'where': self.where,
+                'overrides': self.overrides}
+
+
+DEFAULT_RULES = [
+    AlertRule('NOI decline YoY', 'yoy(NOI)', '<', -10, 'critical',
+              "NOI decreased by {abs_value:.1f}% compared to last year"),
+    AlertRule('DSCR below covenant', 'DSCR', '<', 1.25, 'critical',
+              "DSCR of {value:.2f}x is below {threshold:.2f}x", where='DebtService > 0'),
+    AlertRule('High vacancy', 'VacancyRate', '>', 10, 'warning',
+              "Vacancy ({value:.1f}%) is above {threshold:.0f}% target"),
+    AlertRule('Revenue decline YoY', 'yoy(TotalIncome)', '<', -5, 'warning',
+              "Revenue decreased by {abs_value:.1f}% compared to last year"),
+    AlertRule('Occupancy below target', 'Occupancy', '<', 95.0, 'info',
+              "Occupancy ({value:.1f}%) is below {threshold:.0f}% target", where='Occupancy > 0'),
+    AlertRule('NOI below target', 'NOI', '<', 50000, 'info',
+              "NOI of ${value:,.0f} is below ${threshold:,.0f} target"),
+]
+
+
+def load_rules(path: str = ALERT_RULES_PATH) -> List[AlertRule]:
+    """Rules from a JSON list of AlertRule fields, or the defaults when the file is absent"""
+    if not os.path.exists(path):
+        return list(DEFAULT_RULES)
+    with open(path, encoding='utf-8') as f:
+        return [AlertRule(**rule) for rule in json.load(f)]
+
+
+def rules_key(rules: Iterable[AlertRule]) -> str:
+    """Stable cache key for a rule set"""
+    return json.dumps([rule.to_dict() for rule in rules], sort_keys=True)
+
+
+class _Context:
+    """Lazily computed metric arrays over an extended [property, month] window"""
+
+    def __init__(self, values: np.ndarray, mask: np.ndarray, metrics: np.ndarray):
+        self.values = values
+        self.mask = mask
+        self.metrics = metrics
+        self._cache: Dict[str, np.ndarray] = {}
+
+    def metric(self, name: str) -> np.ndarray:
+        if name not in self._cache:
+            if name in ITEM_INDEX:
+                array = np.where(self.mask, self.values[..., ITEM_INDEX[name]], np.nan)
+            elif name in METRIC_INDEX:
+                array = np.where(self.mask, self.metrics[..., METRIC_INDEX[name]], np.nan)
+            else:
+                array = DERIVED_METRICS[name](_LineItems(self))
+            self._cache[name] = array
+        return self._cache[name]
+
+    def evaluate(self, node: ast.AST) -> np.ndarray:
+        if isinstance(node, ast.Constant):
+            return node.value
+        if isinstance(node, ast.Name):
+            return self.metric(node.id)
+        if isinstance(node, ast.UnaryOp):
+            operand = self.evaluate(node.operand)
+            return -operand if isinstance(node.op, ast.USub) else operand
+        if isinstance(node, ast.BinOp):
+            left, right = self.evaluate(node.left), self.evaluate(node.right)
+            if isinstance(node.op, ast.Div):
+                return _ratio(left, right)
+            return _BINARY[type(node.op)](left, right)
+        if isinstance(node, ast.BoolOp):
+            combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+            result = self.evaluate(node.values[0])
+            for value in node.values[1:]:
+                result = combine(result, self.evaluate(value))
+            return result
+        if isinstance(node, ast.Compare):
+            result, left = True, self.evaluate(node.left)
+            for op, comparator in zip(node.ops, node.comparators):
+                right = self.evaluate(comparator)
+                result = np.logical_and(result, _COMPARE[type(op)](left, right))
+                left = right
+            return result
+        if isinstance(node, ast.Call):
+            argument = self.evaluate(node.args[0])
+            if node.func.id == 'abs':
+                return np.abs(argument)
+            return self.percent_change(argument, FUNCTIONS[node.func.id])
+        raise ValueError(f"Unsupported expression node {type(node).__name__}")
+
+    def percent_change(self, series: np.ndarray, comparison: str) -> np.ndarray:
+        """Percent change of each month against a variance-engine baseline, along the month axis"""
+        kind, months = COMPARISONS[comparison]
+        base = np.full_like(series, np.nan)
+        if kind == 'lag':
+            base[:, months:] = series[:, :-months]
+        else:
+            present = ~np.isnan(series)
+            sums = np.concatenate([np.zeros_like(series[:, :1]), np.cumsum(np.where(present, series, 0.0), axis=1)], axis=1)
+            counts = np.concatenate([np.zeros_like(series[:, :1]), np.cumsum(present, axis=1)], axis=1)
+            hi = np.arange(series.shape[1])
+            lo = np.maximum(hi - months, 0)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                base = np.where(counts[:, hi] - counts[:, lo] > 0,
+                                (sums[:, hi] - sums[:, lo]) / (counts[:, hi] - counts[:, lo]), np.nan)
+        return VarianceEngine.changes(series, base)[1]
+
+
+class _LineItems:
+    """Mapping view so derived metrics can index line items by name"""
+
+    def __init__(self, context: _Context):
+        self.context = context
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.context.metric(name)
+
+
+class AlertEngine:
+    """Evaluate rules as masks over the cube's property x month matrix and keep a ranked feed"""
+
+    ALERT_COLUMNS = ['PropertyID', 'PropertyName', 'ReportingMonth', 'Rule', 'Severity',
+                     'Value', 'Threshold', 'Score']
+
+    def __init__(self, cube: FinancialCube, rules: Optional[List[AlertRule]] = None):
+        self.cube = cube
+        self.rules = rules if rules is not None else list(DEFAULT_RULES)
+        self.alerts = pd.DataFrame(columns=self.ALERT_COLUMNS)
+        self.evaluations = 0
+        if cube.month_count:
+            self.alerts = self._evaluate(0, cube.month_count)
+
+    def _evaluate(self, lo: int, hi: int) -> pd.DataFrame:
+        """Alerts for month positions [lo, hi), evaluated with enough lookback for every function"""
+        self.evaluations += 1
+        cube = self.cube
+        ext_lo = max(lo - LOOKBACK, 0)
+        context = _Context(cube.values[:, ext_lo:hi, :], cube.mask[:, ext_lo:hi], cube.metrics[:, ext_lo:hi, :])
+        offset = lo - ext_lo
+        months = np.asarray(cube.months()[lo:hi], dtype='datetime64[ns]')
+        names = np.asarray(cube.property_names, dtype=object)
+
+        frames = []
+        for rule in self.rules:
+            value = np.broadcast_to(context.evaluate(rule._metric_tree), context.mask.shape)[:, offset:]
+            threshold = np.full((len(cube.property_ids), 1), rule.threshold)
+            for property_id, override in rule.overrides.items():
+                if property_id in cube.property_index:
+                    threshold[cube.property_index[property_id]] = override
+
+            with np.errstate(invalid='ignore'):
+                hit = OPERATORS[rule.op](value, threshold) & context.mask[:, offset:] & ~np.isnan(value)
+                if rule._where_tree is not None:
+                    hit &= np.broadcast_to(context.evaluate(rule._where_tree), context.mask.shape)[:, offset:]
+            p, m = np.nonzero(hit)
+            if not len(p):
+                continue
+
+            values, thresholds = value[p, m], threshold[p, 0]
+            breach = np.abs(values - thresholds) / np.maximum(np.abs(thresholds), 1.0)
+            frames.append(pd.DataFrame({
+                'PropertyID': cube.property_ids[p],
+                'PropertyName': names[p],
+                'ReportingMonth': months[m],
+                'Rule': rule.name,
+                'Severity': rule.severity,
+                'Value': values,
+                'Threshold': thresholds,
+                'Score': SEVERITY_WEIGHT[rule.severity] * (1 + breach)
+            }))
+
+        if not frames:
+            return pd.DataFrame(columns=self.ALERT_COLUMNS)
+        return pd.concat(frames, ignore_index=True)
+
+    def update(self, touched_months: Iterable) -> int:
+        """Re-evaluate only the months a write touched plus those whose lookback includes them"""
+        positions = sorted({month_ordinal(month) - self.cube.start_ordinal for month in touched_months})
+        if not positions:
+            return 0
+
+        # A change in month m feeds lag/trailing baselines up to LOOKBACK months later
+        ranges = []
+        for position in positions:
+            lo, hi = max(position, 0), min(position + LOOKBACK + 1, self.cube.month_count)
+            if ranges and lo <= ranges[-1][1]:
+                ranges[-1][1] = max(ranges[-1][1], hi)
+            else:
+                ranges.append([lo, hi])
+
+        months = self.cube.months()
+        affected = {months[i] for lo, hi in ranges for i in range(lo, hi)}
+        kept = self.alerts[~self.alerts['ReportingMonth'].isin(list(affected))]
+        fresh = [self._evaluate(lo, hi) for lo, hi in ranges if lo < hi]
+        self.alerts = pd.concat([kept] + [frame for frame in fresh if not frame.empty], ignore_index=True)
+        return len(affected)
+
+    def feed(self, start=None, end=None, severities: Optional[List[str]] = None,
+             limit: Optional[int] = None) -> pd.DataFrame:
+        """Alerts in [start, end], highest score first, then most recent, with their messages"""
+        alerts = self.alerts
+        if start is not None:
+            alerts = alerts[alerts['ReportingMonth'] >= pd.Timestamp(start)]
+        if end is not None:
+            alerts = alerts[alerts['ReportingMonth'] <= pd.Timestamp(end)]
+        if severities:
+            alerts = alerts[alerts['Severity'].isin(severities)]
+        alerts = alerts.sort_values(['Score', 'ReportingMonth'], ascending=[False, False], kind='stable')
+        alerts = (alerts.head(limit) if limit else alerts).reset_index(drop=True)
+
+        # Messages are only formatted for the alerts actually shown
+        templates = {rule.name: rule.message for rule in self.rules}
+        alerts['Message'] = [
+            templates[rule].format(rule=rule, value=value, abs_value=abs(value), threshold=threshold)
+            for rule, value, threshold in zip(alerts['Rule'], alerts['Value'], alerts['Threshold'])
+        ]
+        return alerts
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.alerts.memory_usage(deep=True).sum())
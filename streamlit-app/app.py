@@ -2,27 +2,53 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import pyodbc
 from datetime import datetime, timedelta
+from contextlib import contextmanager
 import io
+import os
+import time
 from typing import Dict, List, Optional
 import numpy as np
 import warnings
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from timeseries import TimeRangeEngine, RANGE_MODES
+from cube import FinancialCube, LINE_ITEMS
+from derived import DERIVED_COLUMNS, derive_row, sql_values, with_derived_metrics
+from scheduler import ConnectionPool, QueryScheduler, CircuitBreaker, backoff_delay, is_transient_error
+from exports import ExportCache, available_formats
+from charts import monthly_performance_figure, vacancy_trend_figure, noi_margin_figure, sensitivity_heatmap, \
+    projection_band_figure
+from schema import ensure_schema
+from shared_cache import SharedFrameCache
+from variance import VarianceEngine, COMPARISONS
+from rolling import RollingEngine
+from valuation import ValuationEngine, ValuationAssumptions, assumptions_key
+from sensitivity import SensitivityGrid, AXES as SENSITIVITY_AXES, METRICS as SENSITIVITY_METRICS, axis_values, grid_key
+from projections import project, band_frame, history_frame, METRICS as PROJECTION_METRICS
+from debt import DebtEngine, DEFAULT_INDEX_RATE, LOAN_COLUMNS
+from waterfall import WaterfallTerms, FUND_ID, entity_cash_flows, run_waterfall, terms_key, waterfall_summary
+import rentroll
+from rentroll_etl import apply_rent_roll, load_rent_roll
+import quality
+from alerts import AlertEngine, AlertRule, load_rules, rules_key
+from etl import prepare_financial_frame, classify_rows, row_hash, row_hashes
 
 # Suppress the pandas SQLAlchemy warning since we're using pyodbc intentionally
 warnings.filterwarnings('ignore', message='pandas only supports SQLAlchemy connectable.*')
 
-# Page configuration
-st.set_page_config(
-    page_title="Kyle Tran's Real Estate Investment Trust",
-    page_icon="🏢",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
+def configure_page():
+    """Page configuration and custom CSS; must run before any other Streamlit output"""
+    # Page configuration
+    st.set_page_config(
+        page_title="Kyle Tran's Real Estate Investment Trust",
+        page_icon="🏢",
+        layout="wide",
+        initial_sidebar_state="expanded"
+    )
 
-# Custom CSS with MRK Water Analytics styling
-st.markdown("""
+    # Custom CSS with MRK Water Analytics styling
+    st.markdown("""
 <style>
     /* Typography and base styles */
     .stApp {
@@ -288,43 +314,143 @@ st.markdown("""
         border-top-color: #F47C20 !important;
     }
 </style>
-""", unsafe_allow_html=True)
+    """, unsafe_allow_html=True)
+
+# Azure SQL Server connection settings
+DB_CONFIG = {
+    'server': "kyletristentran.database.windows.net",
+    'database': "MultifamilyRealEstateDB",
+    'username': "kyletristentran",
+    'password': "Tran1105",
+    'driver': "ODBC Driver 17 for SQL Server"
+}
+
+# Full ODBC connection string overriding DB_CONFIG, e.g. a local seeded database for load tests
+CONNECTION_STRING_ENV = 'DASHBOARD_DB_CONNECTION_STRING'
+
+def build_connection_string(config: Optional[Dict] = None) -> str:
+    """Build the pyodbc connection string for the dashboard database"""
+    if config is None:
+        override = os.environ.get(CONNECTION_STRING_ENV)
+        if override:
+            return override
+        config = DB_CONFIG
+    return (
+        f"Driver={{{config['driver']}}};"
+        f"Server=tcp:{config['server']},1433;"
+        f"Database={config['database']};"
+        f"Uid={config['username']};"
+        f"Pwd={config['password']};"
+        f"Encrypt=yes;"
+        f"TrustServerCertificate=no;"
+        f"Connection Timeout=30;"
+    )
+
+@st.cache_resource
+def get_query_scheduler() -> QueryScheduler:
+    """Process-wide connection pool and query thread pool shared by all sessions"""
+    pool = ConnectionPool(lambda: pyodbc.connect(build_connection_string()), max_size=8)
+    return QueryScheduler(pool, default_timeout=30)
+
+# Byte budget for frames and arrays shared by every session in the process
+SHARED_CACHE_BUDGET_BYTES = 512 * 1024 * 1024
+
+TAB_NAMES = [
+    "Performance Overview",
+    "Portfolio Analysis",
+    "Financial Trends",
+    "Property Details",
+    "Data Management",
+    "Monthly Financials"
+]
+
+# Session-state key holding each section's render interval from the latest run
+RENDER_TIMINGS_KEY = 'render_timings'
+
+# Connection attempts and the per-run data-version poll must fail fast, not hang the page
+CONNECT_TIMEOUT_SECONDS = 15
+CONNECT_RETRIES = 2
+POLL_TIMEOUT_SECONDS = 5
+
+@st.cache_resource
+def get_shared_cache() -> SharedFrameCache:
+    """Process-wide cache of query results and derived frames, keyed by (name, data version, ...)"""
+    return SharedFrameCache(SHARED_CACHE_BUDGET_BYTES)
+
+def current_session_id() -> str:
+    """Streamlit session id, used to count the sessions referencing a shared entry"""
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else 'headless'
+
+@contextmanager
+def timed_section(name: str):
+    """Record the (start, end) perf_counter interval of a page section for the debug panel and budget checks"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        st.session_state.setdefault(RENDER_TIMINGS_KEY, {})[name] = (started, time.perf_counter())
+
+def rerun_requested() -> bool:
+    """True once the user has triggered a rerun (or closed the tab) while this run is still going"""
+    ctx = get_script_run_ctx()
+    requests = getattr(ctx, 'script_requests', None)
+    state = getattr(requests, '_state', None)
+    return state is not None and state.name != 'CONTINUE'
+
+@st.cache_resource
+def ensure_database_schema(_conn) -> List[str]:
+    """Apply idempotent schema migrations once per process"""
+    return ensure_schema(_conn)
 
 class RealEstateDashboard:
-    def __init__(self):
+    def __init__(self, pool: Optional[ConnectionPool] = None, breaker: Optional[CircuitBreaker] = None):
         self.conn = None
         self.current_user = None
+        self.cube = None
+        self.pool = pool
+        self.breaker = breaker
+        # Data version the session's cached data was loaded at (see dbo.DataVersion)
+        self.data_version = None
+        self.cube_stale = False
+        # Set when a write had to grow the cube, so it went to a private copy (see _cube_for_write)
+        self.cube_copied = False
+        # (PropertyID, month) cells written by this session since the last data-version adoption
+        self.touched_cells = []
         
-    def connect_to_database(self):
-        """Connect to the Azure SQL Server MultifamilyRealEstateDB database"""
-        server = "kyletristentran.database.windows.net"
-        database = "MultifamilyRealEstateDB"
-        username = "kyletristentran"
-        password = "Tran1105"
-        driver = "ODBC Driver 17 for SQL Server"
-        
-        conn_str = (
-            f"Driver={{{driver}}};"
-            f"Server=tcp:{server},1433;"
-            f"Database={database};"
-            f"Uid={username};"
-            f"Pwd={password};"
-            f"Encrypt=yes;"
-            f"TrustServerCertificate=no;"
-            f"Connection Timeout=30;"
-        )
-        
-        try:
-            self.conn = pyodbc.connect(conn_str)
-            return True
-        except pyodbc.Error as e:
-            st.error(f"❌ Error connecting to database: {str(e)}")
-            return False
+    def connect_to_database(self, retries: int = CONNECT_RETRIES):
+        """Connect to the Azure SQL Server MultifamilyRealEstateDB database.
+
+        Transient failures are retried with jittered backoff; while the circuit breaker is
+        open the attempt fails fast so the caller can fall back to cached data.
+        """
+        for attempt in range(retries + 1):
+            if self.breaker is not None and not self.breaker.allow():
+                return False
+            try:
+                if self.pool is not None:
+                    self.conn = self.pool.acquire(timeout=CONNECT_TIMEOUT_SECONDS)
+                else:
+                    self.conn = pyodbc.connect(build_connection_string(), timeout=CONNECT_TIMEOUT_SECONDS)
+                if self.breaker is not None:
+                    self.breaker.record_success()
+                return True
+            except (pyodbc.Error, TimeoutError) as e:
+                if self.breaker is not None:
+                    self.breaker.record_failure()
+                if attempt >= retries or not is_transient_error(e):
+                    st.error(f"❌ Error connecting to database: {str(e)}")
+                    return False
+                time.sleep(backoff_delay(attempt))
+        return False
     
     def disconnect_from_database(self):
-        """Close the database connection"""
+        """Close the database connection, or hand it back to the pool"""
         if self.conn:
-            self.conn.close()
+            if self.pool is not None:
+                self.pool.release(self.conn)
+            else:
+                self.conn.close()
             self.conn = None
     
     def test_database_connection(self):
@@ -332,11 +458,10 @@ class RealEstateDashboard:
         st.write("🔍 **Testing Database Connection...**")
         
         # Connection parameters
-        server = "kyletristentran.database.windows.net"
-        database = "MultifamilyRealEstateDB"
-        username = "kyletristentran"
-        password = "Tran1105"
-        driver = "ODBC Driver 17 for SQL Server"
+        server = DB_CONFIG['server']
+        database = DB_CONFIG['database']
+        username = DB_CONFIG['username']
+        driver = DB_CONFIG['driver']
         
         # Show connection details (without password)
         st.write(f"**Server:** {server}")
@@ -345,16 +470,7 @@ class RealEstateDashboard:
         st.write(f"**Driver:** {driver}")
         
         # Construct connection string
-        conn_str = (
-            f"Driver={{{driver}}};"
-            f"Server=tcp:{server},1433;"
-            f"Database={database};"
-            f"Uid={username};"
-            f"Pwd={password};"
-            f"Encrypt=yes;"
-            f"TrustServerCertificate=no;"
-            f"Connection Timeout=30;"
-        )
+        conn_str = build_connection_string()
         
         try:
             st.write("⏳ Attempting to connect with pyodbc...")
@@ -441,6 +557,9 @@ class RealEstateDashboard:
     
     def get_portfolio_kpis(self, year: int) -> Dict:
         """Get key portfolio metrics for the dashboard"""
+        if self.cube is not None:
+            return self.cube.kpis(datetime(year, 1, 1), datetime(year, datetime.now().month, 1))
+
         if not self.conn:
             return {}
         
@@ -451,11 +570,7 @@ class RealEstateDashboard:
                 ISNULL(SUM(TotalIncome), 0) as total_revenue,
                 ISNULL(SUM(TotalExpenses), 0) as total_expenses,
                 ISNULL(SUM(NOI), 0) as total_noi,
-                CASE 
-                    WHEN AVG(Vacancy) > 100 THEN AVG(Vacancy) / 100
-                    WHEN AVG(Vacancy) < 0 THEN 0
-                    ELSE ISNULL(AVG(Vacancy), 0)
-                END as avg_vacancy,
+                ISNULL(AVG(VacancyPct), 0) as avg_vacancy,
                 COUNT(DISTINCT PropertyID) as property_count
             FROM dbo.MonthlyFinancials mf
             WHERE YEAR(ReportingMonth) = ? AND MONTH(ReportingMonth) <= MONTH(GETDATE())
@@ -491,10 +606,8 @@ class RealEstateDashboard:
             prev_revenue = prev_df['prev_revenue'].iloc[0] or 0
             revenue_variance = ((current_revenue - prev_revenue) / prev_revenue * 100) if prev_revenue != 0 else 0
             
-            # Ensure vacancy is between 0 and 100
             avg_vacancy = current_df['avg_vacancy'].iloc[0] or 0
-            avg_vacancy = min(max(avg_vacancy, 0), 100)
-            
+
             return {
                 'total_portfolio_value': portfolio_df['total_portfolio_value'].iloc[0] or 0,
                 'total_revenue': current_revenue,
@@ -514,6 +627,9 @@ class RealEstateDashboard:
     
     def get_monthly_performance(self, year: int) -> pd.DataFrame:
         """Get monthly performance data for charts"""
+        if self.cube is not None:
+            return self.cube.monthly_performance(datetime(year, 1, 1), datetime(year, 12, 1))
+
         if not self.conn:
             return pd.DataFrame()
         
@@ -525,11 +641,8 @@ class RealEstateDashboard:
                 ISNULL(SUM(TotalExpenses), 0) as Expenses,
                 ISNULL(SUM(NOI), 0) as NOI,
                 ISNULL(SUM(CashFlow), 0) as CashFlow,
-                CASE 
-                    WHEN AVG(Vacancy) > 100 THEN AVG(Vacancy) / 100
-                    WHEN AVG(Vacancy) < 0 THEN 0
-                    ELSE ISNULL(AVG(Vacancy), 0)
-                END as Vacancy
+                ISNULL(AVG(VacancyPct), 0) as Vacancy,
+                CASE WHEN SUM(TotalIncome) > 0 THEN SUM(NOI) * 100.0 / SUM(TotalIncome) END as NOI_Margin
             FROM dbo.MonthlyFinancials
             WHERE YEAR(ReportingMonth) = ?
             GROUP BY ReportingMonth
@@ -545,14 +658,151 @@ class RealEstateDashboard:
             st.error(f"Error fetching monthly performance: {str(e)}")
             return pd.DataFrame()
     
+    def get_monthly_series(self) -> pd.DataFrame:
+        """Get the full portfolio monthly series used by the time-range engine"""
+        if not self.conn:
+            return pd.DataFrame()
+
+        try:
+            # Vacancy percent is kept as sum/count so any window can re-derive the row-weighted average
+            query = """
+            SELECT
+                ReportingMonth,
+                ISNULL(SUM(TotalIncome), 0) as Revenue,
+                ISNULL(SUM(TotalExpenses), 0) as Expenses,
+                ISNULL(SUM(NOI), 0) as NOI,
+                ISNULL(SUM(CashFlow), 0) as CashFlow,
+                ISNULL(SUM(VacancyPct), 0) as VacancySum,
+                COUNT(VacancyPct) as VacancyCount,
+                COUNT(DISTINCT PropertyID) as PropertyCount
+            FROM dbo.MonthlyFinancials
+            GROUP BY ReportingMonth
+            ORDER BY ReportingMonth
+            """
+
+            df = pd.read_sql(query, self.conn)
+            if not df.empty:
+                df['ReportingMonth'] = pd.to_datetime(df['ReportingMonth'])
+            return df
+
+        except Exception as e:
+            st.error(f"Error fetching monthly series: {str(e)}")
+            return pd.DataFrame()
+
+    def get_time_range_engine(self) -> TimeRangeEngine:
+        """Wrap the monthly series in a time-range engine, from the cube when loaded"""
+        if self.cube is not None:
+            return TimeRangeEngine(self.cube.monthly_series())
+        return TimeRangeEngine(self.get_monthly_series())
+
+    def load_financial_cube(self) -> Optional[FinancialCube]:
+        """Load every MonthlyFinancials row once into a property x month x line item cube"""
+        if not self.conn:
+            return None
+
+        try:
+            self.cube = FinancialCube(self._query_cube_records(self.conn),
+                                      self._query_cube_properties(self.conn))
+            return self.cube
+
+        except Exception as e:
+            st.error(f"Error loading financial cube: {str(e)}")
+            return None
+
+    @staticmethod
+    def _query_cube_properties(conn) -> pd.DataFrame:
+        """Property attributes for the cube's property axis"""
+        query = """
+        SELECT PropertyID, PropertyName, PurchasePrice, UnitCount
+        FROM dbo.Properties
+        ORDER BY PropertyID
+        """
+        return pd.read_sql(query, conn)
+
+    @staticmethod
+    def _query_cube_records(conn) -> pd.DataFrame:
+        """Every MonthlyFinancials row for the cube's cells"""
+        query = f"""
+        SELECT PropertyID, FinancialID, ReportingMonth, {', '.join(LINE_ITEMS + DERIVED_COLUMNS)}
+        FROM dbo.MonthlyFinancials
+        """
+        return pd.read_sql(query, conn)
+
+    @staticmethod
+    def _query_loans(conn) -> pd.DataFrame:
+        """Active loans for the debt engine"""
+        query = f"""
+        SELECT {', '.join(LOAN_COLUMNS)}
+        FROM dbo.Loans
+        WHERE IsActive = 1
+        ORDER BY PropertyID, LoanID
+        """
+        return pd.read_sql(query, conn)
+
+    def load_dashboard_data(self, scheduler: QueryScheduler, include_cube: bool = True,
+                            include_history: bool = True, include_loans: bool = True,
+                            cancel_check=None) -> Dict:
+        """Fetch the independent dashboard datasets concurrently over pooled connections"""
+        tasks = {'property list': (self._query_property_list, 15)}
+        if include_history:
+            tasks['financial history'] = (self._query_financial_history, 60)
+        if include_cube:
+            tasks['properties'] = (self._query_cube_properties, 30)
+            tasks['monthly financials'] = (self._query_cube_records, 60)
+        if include_loans:
+            tasks['loans'] = (self._query_loans, 30)
+
+        results = scheduler.run(tasks, cancel_check=cancel_check)
+
+        if include_cube and results['properties'].ok and results['monthly financials'].ok:
+            self.cube = FinancialCube(results['monthly financials'].value, results['properties'].value)
+        return results
+
+    def load_rent_roll(self, scheduler: QueryScheduler, as_of, cancel_check=None) -> Dict:
+        """Rent roll summary, unit mix and expiration ladder as of a date, fetched concurrently"""
+        tasks = {
+            'rent roll summary': (lambda conn: rentroll.query_summary(conn, as_of), 60),
+            'unit mix': (lambda conn: rentroll.query_unit_mix(conn, as_of), 60),
+            'lease expirations': (lambda conn: rentroll.query_expirations(conn, as_of), 60)
+        }
+        return scheduler.run(tasks, cancel_check=cancel_check)
+
+    def get_portfolio_value(self) -> float:
+        """Get total portfolio value from property purchase prices"""
+        if self.cube is not None:
+            return self.cube.portfolio_value()
+
+        if not self.conn:
+            return 0
+
+        try:
+            query = """
+            SELECT ISNULL(SUM(PurchasePrice), 0) as total_portfolio_value
+            FROM dbo.Properties
+            """
+
+            df = pd.read_sql(query, self.conn)
+            return df['total_portfolio_value'].iloc[0] or 0
+
+        except Exception as e:
+            st.error(f"Error fetching portfolio value: {str(e)}")
+            return 0
+
     # Removed create_kpi_card method - using native Streamlit metrics instead
-    
-    def get_property_details(self, year):
-        """Fetch detailed property information including financials"""
+
+    def get_property_details(self, start_month, end_month):
+        """Fetch detailed property information including financials for a month window"""
+        if self.cube is not None:
+            return self.cube.property_details(start_month, end_month)
+
         try:
             if not self.conn:
                 return pd.DataFrame()
-            
+
+            # Half-open date range keeps the predicate sargable on ReportingMonth
+            start_date = pd.Timestamp(start_month).replace(day=1).date()
+            end_date = (pd.Timestamp(end_month).replace(day=1) + pd.DateOffset(months=1)).date()
+
             query = """
             SELECT 
                 p.PropertyID,
@@ -562,56 +812,43 @@ class RealEstateDashboard:
                 COALESCE(SUM(mf.TotalIncome), 0) as TotalRevenue,
                 COALESCE(SUM(mf.TotalExpenses), 0) as TotalExpenses,
                 COALESCE(SUM(mf.NOI), 0) as TotalNOI,
-                CASE 
-                    WHEN AVG(mf.Vacancy) > 100 THEN AVG(mf.Vacancy) / 100
-                    WHEN AVG(mf.Vacancy) < 0 THEN 0
-                    ELSE COALESCE(AVG(mf.Vacancy), 0)
-                END as AvgVacancy,
+                COALESCE(AVG(mf.VacancyPct), 0) as AvgVacancy,
+                AVG(mf.OccupancyPct) as AvgOccupancy,
+                CASE WHEN SUM(mf.TotalIncome) > 0 THEN SUM(mf.NOI) * 100.0 / SUM(mf.TotalIncome) END as NOIMargin,
+                AVG(mf.RevenuePerUnit) as RevenuePerUnit,
+                AVG(mf.NOIPerUnit) as NOIPerUnit,
                 COUNT(DISTINCT mf.ReportingMonth) as MonthsReported
             FROM dbo.Properties p
             LEFT JOIN dbo.MonthlyFinancials mf ON p.PropertyID = mf.PropertyID
-                AND YEAR(mf.ReportingMonth) = ?
+                AND mf.ReportingMonth >= ? AND mf.ReportingMonth < ?
             GROUP BY p.PropertyID, p.PropertyName, p.PurchasePrice, p.UnitCount
             ORDER BY p.PropertyName
             """
-            
-            df = pd.read_sql(query, self.conn, params=[year])
-            
-            # Additional safety check: ensure vacancy is between 0 and 100
-            if not df.empty and 'AvgVacancy' in df.columns:
-                df['AvgVacancy'] = df['AvgVacancy'].clip(0, 100)
-            
-            return df
+
+            return pd.read_sql(query, self.conn, params=[start_date, end_date])
             
         except Exception as e:
             st.error(f"Error fetching property details: {str(e)}")
             return pd.DataFrame()
     
-    def create_alerts(self, kpis: Dict):
-        """Create alert section if needed"""
-        alerts = []
-        
-        # Check NOI performance
-        if kpis.get('noi_variance', 0) < -10:
-            alerts.append(f"NOI decreased by {abs(kpis['noi_variance']):.1f}% compared to last year")
-        
-        # Check vacancy
-        if kpis.get('avg_vacancy', 0) > 10:
-            alerts.append(f"Average vacancy ({kpis['avg_vacancy']:.1f}%) is above 10% target")
-        
-        # Check revenue
-        if kpis.get('revenue_variance', 0) < -5:
-            alerts.append(f"Revenue decreased by {abs(kpis['revenue_variance']):.1f}% compared to last year")
-        
-        if alerts:
-            alert_items = "".join([f'<div class="alert-item">• {alert}</div>' for alert in alerts])
-            return f"""
-            <div class="alert-section">
-                <div class="alert-header">⚠️ Critical Alerts</div>
-                {alert_items}
-            </div>
-            """
-        return ""
+    def create_alerts(self, feed: pd.DataFrame, limit: int = 5):
+        """Create alert section from the top of the ranked alert feed"""
+        if feed.empty:
+            return ""
+
+        alerts = [
+            f"{row.PropertyName} ({row.ReportingMonth.strftime('%b %Y')}): {row.Message}"
+            for row in feed.head(limit).itertuples()
+        ]
+        more = f'<div class="alert-item">…and {len(feed) - limit:,} more in Alert Feed below</div>' if len(feed) > limit else ""
+        alert_items = "".join([f'<div class="alert-item">• {alert}</div>' for alert in alerts])
+        return f"""
+        <div class="alert-section">
+            <div class="alert-header">⚠️ Critical Alerts</div>
+            {alert_items}
+            {more}
+        </div>
+        """
     
     # Removed create_financial_card method - using native Streamlit components instead
     
@@ -622,16 +859,19 @@ class RealEstateDashboard:
                 return []
         
         try:
-            query = "SELECT PropertyID, PropertyName FROM dbo.Properties ORDER BY PropertyName"
-            cursor = self.conn.cursor()
-            cursor.execute(query)
-            
-            properties = [(row.PropertyID, row.PropertyName) for row in cursor.fetchall()]
-            return properties
+            return self._query_property_list(self.conn)
         except Exception as e:
             st.error(f"❌ Error retrieving property list: {str(e)}")
             return []
     
+    @staticmethod
+    def _query_property_list(conn) -> List:
+        """(PropertyID, PropertyName) pairs ordered by name"""
+        query = "SELECT PropertyID, PropertyName FROM dbo.Properties ORDER BY PropertyName"
+        cursor = conn.cursor()
+        cursor.execute(query)
+        return [(row.PropertyID, row.PropertyName) for row in cursor.fetchall()]
+
     def import_monthly_financials(self, property_id, reporting_month, data):
         """Import monthly financial data for a property"""
         if not self.conn:
@@ -639,59 +879,37 @@ class RealEstateDashboard:
                 return False
         
         try:
+            cursor = self.conn.cursor()
+            content_hash = row_hash(data)
+
             # Check if we already have a record for this property and month
-            check_query = """
-            SELECT FinancialID FROM dbo.MonthlyFinancials 
+            cursor.execute("""
+            SELECT FinancialID, RowHash FROM dbo.MonthlyFinancials 
             WHERE PropertyID = ? AND ReportingMonth = ?
-            """
-            
-            cursor = self.conn.cursor()
-            cursor.execute(check_query, (property_id, reporting_month))
+            """, (property_id, reporting_month))
             existing_record = cursor.fetchone()
-            
+
+            if existing_record and existing_record[1] == content_hash:
+                # Identical content is already stored; nothing to write
+                return True
+            # Ratios are derived once here and stored with the row, so reads never recompute them
+            unit_count = self._query_unit_counts(self.conn, [property_id]).get(int(property_id))
+            data = dict(data, **derive_row(property_id, data, unit_count))
             if existing_record:
-                # Update existing record
                 financial_id = existing_record[0]
-                update_query = """
-                UPDATE dbo.MonthlyFinancials SET
-                    GrossRent = ?, Vacancy = ?, OtherIncome = ?, TotalIncome = ?,
-                    RepairsMaintenance = ?, Utilities = ?, PropertyManagement = ?,
-                    PropertyTaxes = ?, Insurance = ?, Marketing = ?, Administrative = ?,
-                    TotalExpenses = ?, NOI = ?, DebtService = ?, CashFlow = ?,
-                    Occupancy = ?, FilePath = ?
-                WHERE FinancialID = ?
-                """
-                
-                cursor.execute(update_query, (
-                    data.get('GrossRent', 0), data.get('Vacancy', 0), data.get('OtherIncome', 0),
-                    data.get('TotalIncome', 0), data.get('RepairsMaintenance', 0), data.get('Utilities', 0),
-                    data.get('PropertyManagement', 0), data.get('PropertyTaxes', 0), data.get('Insurance', 0),
-                    data.get('Marketing', 0), data.get('Administrative', 0), data.get('TotalExpenses', 0),
-                    data.get('NOI', 0), data.get('DebtService', 0), data.get('CashFlow', 0),
-                    data.get('Occupancy', 0), data.get('FilePath', 'Streamlit Import'),
-                    financial_id
-                ))
+                self._update_monthly_financial(cursor, financial_id, data, content_hash)
             else:
-                # Insert new record
-                insert_query = """
-                INSERT INTO dbo.MonthlyFinancials (
-                    PropertyID, ReportingMonth, GrossRent, Vacancy, OtherIncome, TotalIncome,
-                    RepairsMaintenance, Utilities, PropertyManagement, PropertyTaxes, Insurance,
-                    Marketing, Administrative, TotalExpenses, NOI, DebtService, CashFlow,
-                    Occupancy, FilePath
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """
-                
-                cursor.execute(insert_query, (
-                    property_id, reporting_month, data.get('GrossRent', 0), data.get('Vacancy', 0),
-                    data.get('OtherIncome', 0), data.get('TotalIncome', 0), data.get('RepairsMaintenance', 0),
-                    data.get('Utilities', 0), data.get('PropertyManagement', 0), data.get('PropertyTaxes', 0),
-                    data.get('Insurance', 0), data.get('Marketing', 0), data.get('Administrative', 0),
-                    data.get('TotalExpenses', 0), data.get('NOI', 0), data.get('DebtService', 0),
-                    data.get('CashFlow', 0), data.get('Occupancy', 0), 'Streamlit Import'
-                ))
-            
+                financial_id = self._insert_monthly_financial(cursor, property_id, reporting_month, data,
+                                                              content_hash)
+
+            new_version = self._bump_data_version(cursor)
             self.conn.commit()
+
+            # Keep the in-memory cube in step with the committed row
+            if self.cube is not None:
+                self._cube_for_write([(property_id, reporting_month)]).update(property_id, reporting_month, data, financial_id)
+            self.touched_cells.append((property_id, reporting_month))
+            self._record_data_version(new_version)
             return True
             
         except Exception as e:
@@ -699,6 +917,153 @@ class RealEstateDashboard:
             if self.conn:
                 self.conn.rollback()
             return False
+
+    def import_financial_frame(self, frame: pd.DataFrame, file_path: str = 'Batch Import') -> Dict:
+        """Write only the rows whose content hash changed, in one transaction with a single version bump.
+
+        Returns counts of new, updated and unchanged rows. Raises on failure (after rolling
+        back) so batch callers can report per-file errors.
+        """
+        if not self.conn:
+            if not self.connect_to_database():
+                raise ConnectionError("Failed to connect to database")
+
+        if 'RowHash' not in frame.columns:
+            frame = frame.assign(RowHash=row_hashes(frame))
+        rows = classify_rows(frame, self._query_stored_hashes(self.conn, frame))
+        counts = {status: int((rows['Status'] == status).sum()) for status in ('new', 'updated', 'unchanged')}
+        changed = rows[rows['Status'] != 'unchanged']
+        if changed.empty:
+            return counts
+        changed = with_derived_metrics(changed, self._query_unit_counts(self.conn, changed['PropertyID']))
+
+        cursor = self.conn.cursor()
+        try:
+            financial_ids = []
+            for row in changed.to_dict('records'):
+                if row['Status'] == 'updated':
+                    financial_id = int(row['FinancialID'])
+                    self._update_monthly_financial(cursor, financial_id, row, row['RowHash'], file_path)
+                else:
+                    financial_id = self._insert_monthly_financial(cursor, row['PropertyID'], row['ReportingMonth'],
+                                                                  row, row['RowHash'], file_path)
+                financial_ids.append(financial_id)
+            new_version = self._bump_data_version(cursor)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+
+        if self.cube is not None:
+            cube = self._cube_for_write(zip(changed['PropertyID'], changed['ReportingMonth']))
+            for row, financial_id in zip(changed.to_dict('records'), financial_ids):
+                cube.update(row['PropertyID'], row['ReportingMonth'], row, financial_id)
+        self.touched_cells.extend(zip(changed['PropertyID'], changed['ReportingMonth']))
+        self._record_data_version(new_version)
+        return counts
+
+    def fix_data_quality(self, checks: List[str]) -> Dict:
+        """Bulk-correct every row failing the chosen reconciliation checks in one transaction"""
+        if not self.conn:
+            if not self.connect_to_database():
+                raise ConnectionError("Failed to connect to database")
+        result = quality.apply_fixes(self.conn, checks)
+        if result['rows']:
+            # Rows all over the table changed, so the cube is reloaded rather than patched
+            self.cube_stale = True
+            self._record_data_version(result['data_version'])
+        return result
+
+    def import_rent_roll(self, frame: pd.DataFrame, as_of=None) -> Dict:
+        """Diff normalized rent roll rows against Units/Tenants and apply them, one transaction per property"""
+        if not self.conn:
+            if not self.connect_to_database():
+                raise ConnectionError("Failed to connect to database")
+        return apply_rent_roll(self.conn, frame, as_of=as_of)
+
+    @staticmethod
+    def _query_unit_counts(conn, property_ids) -> Dict[int, Optional[int]]:
+        """Properties.UnitCount by PropertyID, for the per-unit derived columns"""
+        property_ids = sorted({int(pid) for pid in property_ids})
+        unit_counts = {}
+        cursor = conn.cursor()
+        for i in range(0, len(property_ids), 1000):
+            batch = property_ids[i:i + 1000]
+            cursor.execute(f"SELECT PropertyID, UnitCount FROM dbo.Properties "
+                           f"WHERE PropertyID IN ({', '.join('?' * len(batch))})", batch)
+            unit_counts.update({row.PropertyID: row.UnitCount for row in cursor.fetchall()})
+        return unit_counts
+
+    @staticmethod
+    def _query_stored_hashes(conn, frame: pd.DataFrame) -> pd.DataFrame:
+        """FinancialID and RowHash of stored rows for the frame's properties and month span"""
+        property_ids = sorted({int(pid) for pid in frame['PropertyID']})
+        frames = []
+        # SQL Server allows 2100 parameters per statement, so large files are looked up in batches
+        for i in range(0, len(property_ids), 1000):
+            batch = property_ids[i:i + 1000]
+            query = f"""
+            SELECT PropertyID, ReportingMonth, FinancialID, RowHash
+            FROM dbo.MonthlyFinancials
+            WHERE PropertyID IN ({', '.join('?' * len(batch))})
+              AND ReportingMonth BETWEEN ? AND ?
+            """
+            frames.append(pd.read_sql(query, conn, params=batch + [min(frame['ReportingMonth']),
+                                                                   max(frame['ReportingMonth'])]))
+        if not frames:
+            return pd.DataFrame(columns=['PropertyID', 'ReportingMonth', 'FinancialID', 'RowHash'])
+        return pd.concat(frames, ignore_index=True)
+
+    @staticmethod
+    def _update_monthly_financial(cursor, financial_id, data, content_hash: str,
+                                  file_path: str = 'Streamlit Import'):
+        """Overwrite an existing MonthlyFinancials row and its content hash"""
+        update_query = """
+        UPDATE dbo.MonthlyFinancials SET
+            GrossRent = ?, Vacancy = ?, OtherIncome = ?, TotalIncome = ?,
+            RepairsMaintenance = ?, Utilities = ?, PropertyManagement = ?,
+            PropertyTaxes = ?, Insurance = ?, Marketing = ?, Administrative = ?,
+            TotalExpenses = ?, NOI = ?, DebtService = ?, CashFlow = ?,
+            Occupancy = ?, VacancyPct = ?, OccupancyPct = ?, NOIMargin = ?,
+            ExpenseRatio = ?, RevenuePerUnit = ?, NOIPerUnit = ?, FilePath = ?, RowHash = ?
+        WHERE FinancialID = ?
+        """
+        
+        cursor.execute(update_query, (
+            data.get('GrossRent', 0), data.get('Vacancy', 0), data.get('OtherIncome', 0),
+            data.get('TotalIncome', 0), data.get('RepairsMaintenance', 0), data.get('Utilities', 0),
+            data.get('PropertyManagement', 0), data.get('PropertyTaxes', 0), data.get('Insurance', 0),
+            data.get('Marketing', 0), data.get('Administrative', 0), data.get('TotalExpenses', 0),
+            data.get('NOI', 0), data.get('DebtService', 0), data.get('CashFlow', 0),
+            data.get('Occupancy', 0), *sql_values(data), data.get('FilePath', file_path), content_hash,
+            financial_id
+        ))
+
+    @staticmethod
+    def _insert_monthly_financial(cursor, property_id, reporting_month, data, content_hash: str,
+                                  file_path: str = 'Streamlit Import') -> int:
+        """Insert a new MonthlyFinancials row; returns its FinancialID"""
+        insert_query = """
+        INSERT INTO dbo.MonthlyFinancials (
+            PropertyID, ReportingMonth, GrossRent, Vacancy, OtherIncome, TotalIncome,
+            RepairsMaintenance, Utilities, PropertyManagement, PropertyTaxes, Insurance,
+            Marketing, Administrative, TotalExpenses, NOI, DebtService, CashFlow,
+            Occupancy, VacancyPct, OccupancyPct, NOIMargin, ExpenseRatio, RevenuePerUnit, NOIPerUnit,
+            FilePath, RowHash
+        )
+        OUTPUT INSERTED.FinancialID
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """
+        
+        cursor.execute(insert_query, (
+            property_id, reporting_month, data.get('GrossRent', 0), data.get('Vacancy', 0),
+            data.get('OtherIncome', 0), data.get('TotalIncome', 0), data.get('RepairsMaintenance', 0),
+            data.get('Utilities', 0), data.get('PropertyManagement', 0), data.get('PropertyTaxes', 0),
+            data.get('Insurance', 0), data.get('Marketing', 0), data.get('Administrative', 0),
+            data.get('TotalExpenses', 0), data.get('NOI', 0), data.get('DebtService', 0),
+            data.get('CashFlow', 0), data.get('Occupancy', 0), *sql_values(data), file_path, content_hash
+        ))
+        return cursor.fetchone()[0]
     
     def get_financial_history(self, property_id=None):
         """Get financial history for properties"""
@@ -707,42 +1072,100 @@ class RealEstateDashboard:
                 return pd.DataFrame()
         
         try:
-            if property_id:
-                query = """
-                SELECT 
-                    p.PropertyName, mf.FinancialID, mf.ReportingMonth,
-                    mf.GrossRent, mf.Vacancy, mf.OtherIncome, mf.TotalIncome,
-                    mf.RepairsMaintenance, mf.Utilities, mf.PropertyManagement,
-                    mf.PropertyTaxes, mf.Insurance, mf.Marketing, mf.Administrative,
-                    mf.TotalExpenses, mf.NOI, mf.DebtService, mf.CashFlow, mf.Occupancy
-                FROM dbo.MonthlyFinancials mf
-                JOIN dbo.Properties p ON mf.PropertyID = p.PropertyID
-                WHERE mf.PropertyID = ?
-                ORDER BY mf.ReportingMonth DESC
-                """
-                df = pd.read_sql(query, self.conn, params=[property_id])
-            else:
-                query = """
-                SELECT 
-                    p.PropertyName, mf.FinancialID, mf.ReportingMonth,
-                    mf.GrossRent, mf.Vacancy, mf.OtherIncome, mf.TotalIncome,
-                    mf.RepairsMaintenance, mf.Utilities, mf.PropertyManagement,
-                    mf.PropertyTaxes, mf.Insurance, mf.Marketing, mf.Administrative,
-                    mf.TotalExpenses, mf.NOI, mf.DebtService, mf.CashFlow, mf.Occupancy
-                FROM dbo.MonthlyFinancials mf
-                JOIN dbo.Properties p ON mf.PropertyID = p.PropertyID
-                ORDER BY p.PropertyName, mf.ReportingMonth DESC
-                """
-                df = pd.read_sql(query, self.conn)
-            
-            if not df.empty:
-                df['ReportingMonth'] = pd.to_datetime(df['ReportingMonth'])
-            return df
+            return self._query_financial_history(self.conn, property_id)
             
         except Exception as e:
             st.error(f"❌ Error retrieving financial history: {str(e)}")
             return pd.DataFrame()
+
+    @staticmethod
+    def _query_financial_history(conn, property_id=None) -> pd.DataFrame:
+        """Financial history rows for one property, or all properties"""
+        if property_id:
+            query = """
+            SELECT 
+                p.PropertyName, mf.FinancialID, mf.ReportingMonth,
+                mf.GrossRent, mf.Vacancy, mf.OtherIncome, mf.TotalIncome,
+                mf.RepairsMaintenance, mf.Utilities, mf.PropertyManagement,
+                mf.PropertyTaxes, mf.Insurance, mf.Marketing, mf.Administrative,
+                mf.TotalExpenses, mf.NOI, mf.DebtService, mf.CashFlow, mf.Occupancy,
+                mf.VacancyPct, mf.OccupancyPct, mf.NOIMargin, mf.ExpenseRatio, mf.RevenuePerUnit, mf.NOIPerUnit
+            FROM dbo.MonthlyFinancials mf
+            JOIN dbo.Properties p ON mf.PropertyID = p.PropertyID
+            WHERE mf.PropertyID = ?
+            ORDER BY mf.ReportingMonth DESC
+            """
+            df = pd.read_sql(query, conn, params=[property_id])
+        else:
+            query = """
+            SELECT 
+                p.PropertyName, mf.FinancialID, mf.ReportingMonth,
+                mf.GrossRent, mf.Vacancy, mf.OtherIncome, mf.TotalIncome,
+                mf.RepairsMaintenance, mf.Utilities, mf.PropertyManagement,
+                mf.PropertyTaxes, mf.Insurance, mf.Marketing, mf.Administrative,
+                mf.TotalExpenses, mf.NOI, mf.DebtService, mf.CashFlow, mf.Occupancy,
+                mf.VacancyPct, mf.OccupancyPct, mf.NOIMargin, mf.ExpenseRatio, mf.RevenuePerUnit, mf.NOIPerUnit
+            FROM dbo.MonthlyFinancials mf
+            JOIN dbo.Properties p ON mf.PropertyID = p.PropertyID
+            ORDER BY p.PropertyName, mf.ReportingMonth DESC
+            """
+            df = pd.read_sql(query, conn)
+        
+        if not df.empty:
+            df['ReportingMonth'] = pd.to_datetime(df['ReportingMonth'])
+        return df
     
+    def get_data_version(self, name: str = 'MonthlyFinancials') -> Optional[int]:
+        """Single cheap poll of the change counter bumped by every write"""
+        if not self.conn:
+            return None
+
+        try:
+            # The poll runs on every rerun, so it must never hold the page up for long
+            self.conn.timeout = POLL_TIMEOUT_SECONDS
+            try:
+                cursor = self.conn.cursor()
+                cursor.execute("SELECT Version FROM dbo.DataVersion WHERE Name = ?", (name,))
+                row = cursor.fetchone()
+            finally:
+                self.conn.timeout = 0
+            return int(row[0]) if row else None
+        except Exception as e:
+            st.error(f"Error checking data version: {str(e)}")
+            return None
+
+    @staticmethod
+    def _bump_data_version(cursor, name: str = 'MonthlyFinancials') -> Optional[int]:
+        """Increment the change counter inside the caller's transaction and return the new value"""
+        cursor.execute("""
+        UPDATE dbo.DataVersion
+        SET Version = Version + 1, UpdatedAt = SYSUTCDATETIME()
+        OUTPUT INSERTED.Version
+        WHERE Name = ?
+        """, (name,))
+        row = cursor.fetchone()
+        return int(row[0]) if row else None
+
+    def _cube_for_write(self, cells) -> FinancialCube:
+        """The cube to patch with `cells`: the shared one, or a private copy when a cell needs a new slot.
+
+        Growing an axis reassigns values, mask, financial_ids and metrics one after another, so
+        another session reading the shared cube meanwhile could pair arrays of different shapes.
+        after_data_write publishes the copy under the new data version instead.
+        """
+        if not self.cube_copied and not all(self.cube.covers(pid, month) for pid, month in cells):
+            self.cube = self.cube.copy()
+            self.cube_copied = True
+        return self.cube
+
+    def _record_data_version(self, new_version: Optional[int]):
+        """Track our own bump; a jump of more than one means another session wrote too"""
+        if new_version is None:
+            return
+        if self.data_version is not None and new_version != self.data_version + 1:
+            self.cube_stale = True
+        self.data_version = new_version
+
     def delete_financial_record(self, financial_id):
         """Delete a financial record"""
         if not self.conn:
@@ -753,7 +1176,14 @@ class RealEstateDashboard:
             query = "DELETE FROM dbo.MonthlyFinancials WHERE FinancialID = ?"
             cursor = self.conn.cursor()
             cursor.execute(query, (financial_id,))
+            new_version = self._bump_data_version(cursor)
             self.conn.commit()
+
+            if self.cube is not None:
+                removed = self.cube.remove(financial_id)
+                if removed is not None:
+                    self.touched_cells.append(removed)
+            self._record_data_version(new_version)
             return True
             
         except Exception as e:
@@ -762,12 +1192,93 @@ class RealEstateDashboard:
                 self.conn.rollback()
             return False
 
+# Shared entries that local writes patch in place instead of rebuilding
+PATCHABLE_ENTRIES = ('financial_cube', 'alert_engine', 'rolling_engine', 'loans', 'debt_engine')
+
+def invalidate_cached_data(reload_cube: bool = True):
+    """Drop shared entries for the current data version (all but the patchable ones unless `reload_cube`)"""
+    version = st.session_state.get('data_version')
+    get_shared_cache().invalidate(
+        lambda key: key[1] == version and (reload_cube or key[0] not in PATCHABLE_ENTRIES)
+    )
+    st.session_state.pop('view_cache', None)
+
+def after_data_write(dashboard: 'RealEstateDashboard'):
+    """Adopt our own version bump so the next poll does not treat it as a foreign change"""
+    old_version = st.session_state.get('data_version')
+    invalidate_cached_data(reload_cube=dashboard.cube_stale)
+    if not dashboard.cube_stale:
+        # The shared cube was patched in place (or, if the write grew it, replaced by a copy),
+        # so it now holds the new version's data; engines over it only re-evaluate what this session touched
+        cache = get_shared_cache()
+        for key in [key for key in cache.keys() if key[0] in PATCHABLE_ENTRIES and key[1] == old_version]:
+            new_key = (key[0], dashboard.data_version) + key[2:]
+            if dashboard.cube_copied and key[0] != 'loans':
+                # The write grew a private copy of the cube; entries over the shared one are
+                # left to their readers and rebuilt over the copy on demand
+                cache.invalidate(lambda candidate, key=key: candidate == key)
+                continue
+            entry = cache.get(key)
+            if key[0] == 'alert_engine' and entry is not None:
+                entry.update([month for _, month in dashboard.touched_cells])
+            elif key[0] == 'rolling_engine' and entry is not None:
+                entry.update(dashboard.touched_cells)
+            cache.rekey(key, new_key)
+        if dashboard.cube_copied:
+            cache.put(('financial_cube', dashboard.data_version), dashboard.cube, current_session_id())
+    dashboard.cube_copied = False
+    dashboard.touched_cells = []
+    st.session_state.data_version = dashboard.data_version
+
+def cached_view(name: str, key, build_fn):
+    """Reuse a derived result (figure, frame) until its key changes or the data version moves"""
+    cache = st.session_state.setdefault('view_cache', {})
+    entry = cache.get(name)
+    if entry is not None and entry[0] == key:
+        return entry[1]
+    value = build_fn()
+    cache[name] = (key, value)
+    return value
+
+def render_export_controls(label: str, name: str, source_fn, data_key, file_stem: str):
+    """Format picker plus on-demand export: the file is only generated after Prepare is clicked"""
+    if 'export_cache' not in st.session_state:
+        st.session_state.export_cache = ExportCache()
+    cache = st.session_state.export_cache
+    data_key = (st.session_state.get('data_version'), data_key)
+
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        fmt = st.selectbox("Format", options=available_formats(), key=f"{name}_format",
+                           label_visibility="collapsed")
+    with col2:
+        artifact = cache.get(name, fmt, data_key)
+        if artifact is None:
+            if st.button(f"⚙️ Prepare {label}", key=f"{name}_prepare"):
+                try:
+                    with st.spinner(f"Generating {label}..."):
+                        artifact = cache.build(name, fmt, data_key, source_fn, sheet_name=label)
+                except Exception as e:
+                    st.error(f"❌ Error generating export: {str(e)}")
+
+        if artifact is not None:
+            st.download_button(
+                label=f"📥 Download {label} ({artifact.size / 1024:,.0f} KB)",
+                data=artifact.data,
+                file_name=f"{file_stem}.{artifact.extension}",
+                mime=artifact.mime,
+                key=f"{name}_download"
+            )
+
 def main():
+    configure_page()
+
     # Header
     st.markdown('<h1 class="main-header">🏢 Kyle Tran\'s Real Estate Investment Trust</h1>', unsafe_allow_html=True)
     
-    # Initialize dashboard
-    dashboard = RealEstateDashboard()
+    # Initialize dashboard on the shared connection pool
+    scheduler = get_query_scheduler()
+    dashboard = RealEstateDashboard(pool=scheduler.pool, breaker=scheduler.breaker)
     
     # Sidebar controls
     st.sidebar.markdown('<h3 style="color: white;">Real Estate Analytics</h3>', unsafe_allow_html=True)
@@ -793,49 +1304,215 @@ def main():
         st.info("👋 Please log in using the sidebar to access the dashboard")
         return
     
-    # Connect to database
-    if not dashboard.connect_to_database():
-        st.error("Failed to connect to database. Please check your connection.")
-        return
+    # Connect to database; when it is down, keep serving the last-known-good shared data
+    connected = dashboard.connect_to_database()
+    try:
+        render_dashboard(dashboard, scheduler, connected, debug_mode)
+    finally:
+        # Every exit (st.rerun, st.stop, errors) hands the pooled connection back
+        dashboard.disconnect_from_database()
+
+
+def render_dashboard(dashboard: 'RealEstateDashboard', scheduler: QueryScheduler, connected: bool,
+                     debug_mode: bool):
+    """Everything drawn once the connection is taken; main() releases it however this exits"""
+    shared_cache = get_shared_cache()
+    session_id = current_session_id()
+
+    if not connected:
+        if shared_cache.latest('financial_cube') is None:
+            st.error("Failed to connect to database. Please check your connection.")
+            return
+        st.warning("⚠️ Database unavailable – showing last-known-good data (read-only)")
     
-    # Year selector
+    if connected:
+        try:
+            ensure_database_schema(dashboard.conn)
+        except Exception as e:
+            st.warning(f"⚠️ Could not apply schema migrations: {str(e)}")
+
+    # One cheap poll per run: cached data is only dropped when another writer changed it
+    data_version = dashboard.get_data_version() if connected else None
+    if data_version is not None and data_version != st.session_state.get('data_version'):
+        # Shared entries are keyed by version, so only this session's views need dropping
+        st.session_state.pop('view_cache', None)
+        st.session_state.data_version = data_version
+    dashboard.data_version = st.session_state.get('data_version')
+    version = dashboard.data_version
+
+    # Fetch independent datasets concurrently; datasets already in the shared cache are skipped.
+    # A rerun or disconnect cancels the statements still in flight.
+    with st.spinner("Loading dashboard data..."):
+        query_results = dashboard.load_dashboard_data(
+            scheduler,
+            include_cube=not shared_cache.contains(('financial_cube', version)),
+            include_history=not shared_cache.contains(('financial_history', version)),
+            include_loans=not shared_cache.contains(('loans', version)),
+            cancel_check=rerun_requested
+        )
+
+    degraded = False
+    for result in query_results.values():
+        if result.cancelled:
+            # A newer run is already queued; hand the connection back and let it take over
+            dashboard.disconnect_from_database()
+            st.stop()
+        if not result.ok:
+            degraded = True
+            if not result.circuit_open:
+                reason = "timed out" if result.timed_out else str(result.error)
+                st.error(f"❌ Error loading {result.name}: {reason}")
+
+    if dashboard.cube is not None:
+        shared_cache.put(('financial_cube', version), dashboard.cube, session_id)
+    else:
+        dashboard.cube = shared_cache.get(('financial_cube', version), session_id)
+    if dashboard.cube is None:
+        # Last-known-good: the newest cube any session loaded, and that version's derived data
+        fallback = shared_cache.latest('financial_cube', session_id)
+        if fallback is not None:
+            (_, version), dashboard.cube = fallback
+            dashboard.data_version = version
+            if connected:
+                st.warning("⚠️ Database degraded – showing last-known-good data")
+
+    if query_results['property list'].ok:
+        properties = shared_cache.put(('property_list', version), query_results['property list'].value, session_id)
+    else:
+        fallback = shared_cache.latest('property_list', session_id)
+        properties = fallback[1] if fallback is not None else []
+    if 'financial history' in query_results and query_results['financial history'].ok:
+        all_history = shared_cache.put(('financial_history', version), query_results['financial history'].value, session_id)
+    else:
+        all_history = shared_cache.get(('financial_history', version), session_id)
+        if all_history is None and degraded:
+            fallback = shared_cache.latest('financial_history', session_id)
+            all_history = fallback[1] if fallback is not None else None
+    if all_history is None:
+        all_history = pd.DataFrame()
+    if 'loans' in query_results and query_results['loans'].ok:
+        loans = shared_cache.put(('loans', version), query_results['loans'].value, session_id)
+    else:
+        loans = shared_cache.get(('loans', version), session_id)
+        if loans is None:
+            fallback = shared_cache.latest('loans', session_id)
+            loans = fallback[1] if fallback is not None else pd.DataFrame(columns=LOAN_COLUMNS)
+
+    engine = shared_cache.get_or_create(('time_range_engine', version), dashboard.get_time_range_engine, session_id)
+
+    # Time range selector
     st.sidebar.markdown("---")
     st.sidebar.markdown('<h4 style="color: white;">📊 Dashboard Controls</h4>', unsafe_allow_html=True)
     current_year = datetime.now().year
-    selected_year = st.sidebar.selectbox(
-        "Select Year",
-        options=list(range(current_year-5, current_year+1)),
-        index=5
-    )
-    
-    # Set default values (removed settings section for simplicity)
-    noi_target = 50000
-    occupancy_target = 95.0
-    
+    available_years = sorted(set(engine.years()) | {current_year})
+
+    range_mode = st.sidebar.selectbox("Time Range", options=RANGE_MODES)
+    selected_year = current_year
+    custom_start = custom_end = None
+    if range_mode in ("Calendar Year", "Year to Date"):
+        selected_year = st.sidebar.selectbox(
+            "Select Year",
+            options=available_years,
+            index=len(available_years) - 1
+        )
+    elif range_mode == "Custom Range":
+        month_options = engine.months() or [pd.Timestamp(datetime.now().replace(day=1))]
+        custom_start, custom_end = st.sidebar.select_slider(
+            "Select Months",
+            options=month_options,
+            value=(month_options[max(len(month_options) - 12, 0)], month_options[-1]),
+            format_func=lambda m: m.strftime('%b %Y')
+        )
+
+    range_start, range_end = engine.resolve(range_mode, year=selected_year, start=custom_start, end=custom_end)
+    st.sidebar.caption(f"Showing {range_start.strftime('%b %Y')} – {range_end.strftime('%b %Y')}")
+
+    # Alert thresholds: rules come from alert_rules.json (or the defaults) and can be tuned per session
+    alert_rules = []
+    with st.sidebar.expander("🚨 Alert Rules"):
+        for rule in load_rules():
+            threshold = st.number_input(f"{rule.name} ({rule.op})", value=rule.threshold,
+                                        key=f"alert_threshold_{rule.name}")
+            if threshold != rule.threshold:
+                rule = AlertRule(**dict(rule.to_dict(), threshold=threshold))
+            alert_rules.append(rule)
+
+    # Valuation assumptions, shared by the portfolio value KPI and the valuation table
+    with st.sidebar.expander("💰 Valuation Assumptions"):
+        defaults = ValuationAssumptions()
+        percent = lambda label, value, key, minimum=0.0: st.number_input(
+            label, min_value=minimum, value=value * 100, step=0.25, format="%.2f", key=key) / 100
+        valuation_assumptions = ValuationAssumptions(
+            cap_rate=percent("Cap Rate (%)", defaults.cap_rate, 'valuation_cap_rate', 0.25),
+            exit_cap_rate=percent("Exit Cap Rate (%)", defaults.exit_cap_rate, 'valuation_exit_cap_rate', 0.25),
+            discount_rate=percent("Discount Rate (%)", defaults.discount_rate, 'valuation_discount_rate'),
+            hold_years=st.number_input("Hold (years)", min_value=1, max_value=30, value=defaults.hold_years,
+                                       key='valuation_hold_years'),
+            rent_growth=percent("Rent Growth (%/yr)", defaults.rent_growth, 'valuation_rent_growth', -50.0),
+            expense_growth=percent("Expense Growth (%/yr)", defaults.expense_growth, 'valuation_expense_growth',
+                                   -50.0),
+            ltv=percent("LTV (%)", defaults.ltv, 'valuation_ltv'),
+            loan_rate=percent("Loan Rate (%)", defaults.loan_rate, 'valuation_loan_rate')
+        )
+
+    # Index for floating-rate loans in dbo.Loans
+    with st.sidebar.expander("🏦 Debt"):
+        index_rate = st.number_input("Floating Index Rate (%)", min_value=0.0, value=DEFAULT_INDEX_RATE * 100,
+                                     step=0.25, format="%.2f", key='debt_index_rate') / 100
+
     # Refresh button
     if st.sidebar.button("🔄 Refresh Data"):
+        invalidate_cached_data()
         st.rerun()
     
     # Main content with tabs
-    tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
-        "Performance Overview",
-        "Portfolio Analysis",
-        "Financial Trends",
-        "Property Details",
-        "Data Management",
-        "Monthly Financials"
-    ])
+    tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs(TAB_NAMES)
     
     try:
         # Get data
-        with st.spinner("Loading dashboard data..."):
-            kpis = dashboard.get_portfolio_kpis(selected_year)
-            monthly_data = dashboard.get_monthly_performance(selected_year)
+        if dashboard.cube is not None:
+            kpis = dashboard.cube.kpis(range_start, range_end)
+        else:
+            kpis = engine.kpis(range_start, range_end)
+            kpis['total_portfolio_value'] = dashboard.get_portfolio_value()
+        monthly_data = engine.window(range_start, range_end)
+
+        # Mark-to-market values from T12 NOI at the end of the selected range
+        valuations = pd.DataFrame()
+        if dashboard.cube is not None and dashboard.cube.month_count:
+            rolling_engine = shared_cache.get_or_create(
+                ('rolling_engine', version), lambda: RollingEngine(dashboard.cube), session_id
+            )
+            valuations = shared_cache.get_or_create(
+                ('valuation', version, range_end, assumptions_key(valuation_assumptions)),
+                lambda: ValuationEngine(rolling_engine, valuation_assumptions).value(range_end),
+                session_id
+            )
+        valuation_summary = ValuationEngine.summary(valuations)
+
+        # Loan schedules replace typed-in debt service for properties with loans
+        debt_engine = None
+        debt_kpis = {}
+        if dashboard.cube is not None:
+            debt_engine = shared_cache.get_or_create(
+                ('debt_engine', version, index_rate), lambda: DebtEngine(loans, dashboard.cube, index_rate),
+                session_id
+            )
+            debt_kpis = debt_engine.kpis(range_start, range_end)
+        range_label = f"{range_start.strftime('%Y%m')}_{range_end.strftime('%Y%m')}"
         
         # Tab 1: Performance Overview
-        with tab1:
+        with tab1, timed_section(TAB_NAMES[0]):
             # Alerts
-            alert_html = dashboard.create_alerts(kpis)
+            alert_feed = pd.DataFrame()
+            if dashboard.cube is not None:
+                alert_engine = shared_cache.get_or_create(
+                    ('alert_engine', version, rules_key(alert_rules)),
+                    lambda: AlertEngine(dashboard.cube, alert_rules),
+                    session_id
+                )
+                alert_feed = alert_engine.feed(range_start, range_end)
+            alert_html = dashboard.create_alerts(alert_feed)
             if alert_html:
                 st.markdown(alert_html, unsafe_allow_html=True)
             
@@ -844,11 +1521,20 @@ def main():
             col1, col2, col3, col4 = st.columns(4)
             
             with col1:
-                st.metric(
-                    label="Portfolio Value",
-                    value=f"${kpis.get('total_portfolio_value', 0):,.0f}",
-                    delta="On Track"
-                )
+                if valuations.empty:
+                    st.metric(
+                        label="Portfolio Value",
+                        value=f"${kpis.get('total_portfolio_value', 0):,.0f}",
+                        delta="At Cost"
+                    )
+                else:
+                    value_change = valuation_summary['direct_cap_value'] - valuation_summary['cost_basis']
+                    st.metric(
+                        label="Portfolio Value",
+                        value=f"${valuation_summary['direct_cap_value']:,.0f}",
+                        delta=f"${value_change:,.0f} vs cost",
+                        delta_color="normal" if value_change >= 0 else "inverse"
+                    )
             
             with col2:
                 noi_comparison = kpis.get('total_noi', 0) - kpis.get('prev_noi', 0)
@@ -887,6 +1573,9 @@ def main():
                     st.metric("Total Revenue", f"${kpis.get('total_revenue', 0):,.0f}")
                     st.metric("Total Expenses", f"${kpis.get('total_expenses', 0):,.0f}")
                     st.metric("Net Operating Income", f"${kpis.get('total_noi', 0):,.0f}")
+                    if debt_kpis:
+                        st.metric("Debt Service", f"${debt_kpis['debt_service']:,.0f}")
+                        st.metric("Cash Flow", f"${debt_kpis['cash_flow']:,.0f}")
                     st.metric("Properties", f"{kpis.get('property_count', 0)}")
             
             with col2:
@@ -896,53 +1585,175 @@ def main():
                     st.metric("Revenue Change", f"{kpis.get('revenue_variance', 0):+.1f}%")
                     st.metric("Avg Vacancy", f"{kpis.get('avg_vacancy', 0):.1f}%")
                     st.metric("Performance", "Strong" if kpis.get('noi_variance', 0) > 5 else "Stable")
+                    if debt_kpis:
+                        st.metric("DSCR", "–" if debt_kpis['dscr'] is None else f"{debt_kpis['dscr']:.2f}x")
+                        st.metric("Debt Yield", "–" if debt_kpis['debt_yield'] is None
+                                  else f"{debt_kpis['debt_yield']:.1f}%")
+
+            # Full ranked alert feed for the selected range
+            if not alert_feed.empty:
+                with st.expander(f"🚨 Alert Feed ({len(alert_feed):,})"):
+                    severities = st.multiselect("Severity", options=['critical', 'warning', 'info'],
+                                                default=['critical', 'warning', 'info'])
+                    shown = alert_feed[alert_feed['Severity'].isin(severities)]
+                    st.dataframe(
+                        shown[['PropertyName', 'ReportingMonth', 'Severity', 'Rule', 'Message']].head(500),
+                        use_container_width=True, hide_index=True
+                    )
         
         # Tab 2: Portfolio Analysis
-        with tab2:
+        with tab2, timed_section(TAB_NAMES[1]):
             st.markdown('<div class="section">', unsafe_allow_html=True)
             st.subheader("📊 Monthly Performance Trends")
             
             if not monthly_data.empty:
                 # Create dual-axis chart
-                fig = make_subplots(
-                    rows=2, cols=1,
-                    subplot_titles=('Revenue & Expenses', 'NOI & Cash Flow'),
-                    vertical_spacing=0.15
-                )
-                
-                # Revenue & Expenses
-                fig.add_trace(
-                    go.Scatter(x=monthly_data['ReportingMonth'], y=monthly_data['Revenue'],
-                             name='Revenue', line=dict(color='#0C223A', width=3)),
-                    row=1, col=1
-                )
-                fig.add_trace(
-                    go.Scatter(x=monthly_data['ReportingMonth'], y=monthly_data['Expenses'],
-                             name='Expenses', line=dict(color='#F47C20', width=3)),
-                    row=1, col=1
+                fig = cached_view('performance_figure', range_label, lambda: monthly_performance_figure(monthly_data))
+                st.plotly_chart(fig, use_container_width=True)
+            else:
+                st.warning("No monthly data available for the selected time range")
+
+            # Valuation of every property from T12 NOI under the sidebar assumptions
+            if not valuations.empty:
+                st.markdown(f"#### 🏷️ Property Valuations – T12 to {range_end.strftime('%b %Y')}")
+                col1, col2, col3, col4 = st.columns(4)
+                col1.metric("Direct Cap Value", f"${valuation_summary['direct_cap_value']:,.0f}")
+                col2.metric("DCF Value", f"${valuation_summary['dcf_value']:,.0f}")
+                col3.metric("Unlevered IRR", f"{valuation_summary['unlevered_irr']:.1f}%")
+                col4.metric("Levered IRR", f"{valuation_summary['levered_irr']:.1f}%")
+                st.dataframe(
+                    valuations.drop(columns=['PropertyID']).style.format({
+                        'PurchasePrice': '${:,.0f}', 'T12 NOI': '${:,.0f}', 'Cap Rate': '{:.2%}',
+                        'Direct Cap Value': '${:,.0f}', 'DCF Value': '${:,.0f}', 'Value vs Cost %': '{:+.1f}%',
+                        'Unlevered IRR': '{:.1f}%', 'Levered IRR': '{:.1f}%', 'Equity Multiple': '{:.2f}x',
+                        'Year 1 DSCR': '{:.2f}x'
+                    }, na_rep='–'),
+                    use_container_width=True, hide_index=True
                 )
-                
-                # NOI & Cash Flow
-                fig.add_trace(
-                    go.Bar(x=monthly_data['ReportingMonth'], y=monthly_data['NOI'],
-                          name='NOI', marker_color='#0C223A'),
-                    row=2, col=1
+
+                # What-if grids over two or three assumptions, centred on the sidebar values
+                st.markdown("#### 🎯 Sensitivity Analysis")
+                axis_names = list(SENSITIVITY_AXES)
+                axis_label = lambda name: SENSITIVITY_AXES[name][0]
+                col1, col2, col3, col4, col5 = st.columns(5)
+                with col1:
+                    row_axis = st.selectbox("Rows", axis_names, index=0, format_func=axis_label,
+                                            key='sensitivity_rows')
+                with col2:
+                    column_options = [name for name in axis_names if name != row_axis]
+                    column_axis = st.selectbox("Columns", column_options, index=len(column_options) - 1,
+                                               format_func=axis_label, key='sensitivity_columns')
+                with col3:
+                    third_options = [None] + [name for name in axis_names if name not in (row_axis, column_axis)]
+                    third_axis = st.selectbox("Third Axis", third_options,
+                                              format_func=lambda name: 'None' if name is None else axis_label(name),
+                                              key='sensitivity_third')
+                with col4:
+                    sensitivity_metric = st.selectbox("Metric", list(SENSITIVITY_METRICS), key='sensitivity_metric')
+                with col5:
+                    scope_names = dict(zip(valuations['PropertyID'], valuations['PropertyName']))
+                    sensitivity_scope = st.selectbox("Scope", [None] + list(scope_names),
+                                                     format_func=lambda pid: 'Portfolio' if pid is None
+                                                     else scope_names[pid],
+                                                     key='sensitivity_scope')
+
+                valuation_key = assumptions_key(valuation_assumptions)
+                grid = shared_cache.get_or_create(
+                    ('sensitivity_grid', version, range_end, valuation_key),
+                    lambda: SensitivityGrid(ValuationEngine(rolling_engine, valuation_assumptions), range_end),
+                    session_id
                 )
-                fig.add_trace(
-                    go.Scatter(x=monthly_data['ReportingMonth'], y=monthly_data['CashFlow'],
-                             name='Cash Flow', line=dict(color='#F47C20', width=2)),
-                    row=2, col=1
+                axes = {name: axis_values(name, grid.engine)
+                        for name in (row_axis, column_axis, third_axis) if name is not None}
+                if any(np.any(values <= 0) for name, values in axes.items() if name == 'exit_cap_rate'):
+                    st.warning("Raise the exit cap rate above 0.75% to run a grid over it")
+                else:
+                    frames = shared_cache.get_or_create(
+                        ('sensitivity', version, range_end, valuation_key, grid_key(axes), sensitivity_metric,
+                         sensitivity_scope),
+                        lambda: grid.table(axes, sensitivity_metric, sensitivity_scope),
+                        session_id
+                    )
+                    value_format = SENSITIVITY_METRICS[sensitivity_metric]
+                    scope_label = 'Portfolio' if sensitivity_scope is None else scope_names[sensitivity_scope]
+                    heatmap_columns = st.columns(min(len(frames), 3))
+                    for i, frame in enumerate(frames):
+                        with heatmap_columns[i % len(heatmap_columns)]:
+                            title = frame.attrs.get('slice', f"{scope_label} – {sensitivity_metric}")
+                            st.plotly_chart(sensitivity_heatmap(frame, value_format, title),
+                                            use_container_width=True)
+
+            # LP/GP split of each property's (and the fund's) monthly cash flow
+            if debt_engine is not None and dashboard.cube.month_count:
+                st.markdown("#### 💸 LP Distribution Waterfall")
+                with st.expander("Waterfall Terms"):
+                    col1, col2, col3, col4 = st.columns(4)
+                    term = lambda label, value, key, maximum=100.0: st.number_input(
+                        label, min_value=0.0, max_value=maximum, value=value, step=0.5, format="%.1f", key=key) / 100
+                    with col1:
+                        pref_rate = term("Preferred Return (%)", 8.0, 'waterfall_pref')
+                        return_capital_first = st.checkbox("Return capital before pref", key='waterfall_capital_first')
+                    with col2:
+                        carried_interest = term("Carried Interest (%)", 20.0, 'waterfall_carry', 95.0)
+                        catch_up = term("GP Catch-up (%)", 100.0, 'waterfall_catch_up')
+                    with col3:
+                        gp_coinvest = term("GP Co-invest (%)", 10.0, 'waterfall_coinvest')
+                        include_sale = st.checkbox("Include sale at direct-cap value", value=True,
+                                                   key='waterfall_sale') and not valuations.empty
+                    with col4:
+                        tier_hurdle = term("Tier 2 Hurdle IRR (%)", 12.0, 'waterfall_hurdle')
+                        tier_promote = term("Tier 2 Promote (%)", 30.0, 'waterfall_promote', 95.0)
+                    compare_prefs = st.multiselect("Compare preferred returns (%)", [6.0, 7.0, 8.0, 9.0, 10.0, 12.0],
+                                                   key='waterfall_compare')
+
+                pref_options = [pref_rate] + [p / 100 for p in compare_prefs if abs(p / 100 - pref_rate) > 1e-9]
+                scenarios = [WaterfallTerms(pref_rate=pref, carried_interest=carried_interest, catch_up=catch_up,
+                                            gp_coinvest=gp_coinvest, promote_tiers=[(tier_hurdle, tier_promote)],
+                                            return_capital_first=return_capital_first)
+                             for pref in pref_options]
+                scenario_names = [f"{pref:.1%} pref" for pref in pref_options]
+                exit_key = assumptions_key(valuation_assumptions) if include_sale else None
+
+                def build_waterfall():
+                    exit_values = valuations.set_index('PropertyID')['Direct Cap Value'] if include_sale else None
+                    flows = entity_cash_flows(debt_engine, exit_values, ltv=valuation_assumptions.ltv)
+                    result = run_waterfall(flows['contributions'], flows['distributions'], scenarios)
+                    return {'summary': waterfall_summary(flows, result, scenario_names), 'months': flows['months'],
+                            'fund_lp': result['lp_distributions'][:, 0], 'fund_gp': result['gp_distributions'][:, 0]}
+
+                waterfall = shared_cache.get_or_create(
+                    ('waterfall', version, index_rate, terms_key(scenarios), exit_key, range_end), build_waterfall,
+                    session_id
                 )
-                
-                fig.update_layout(height=600, showlegend=True, hovermode='x unified')
-                st.plotly_chart(fig, use_container_width=True)
-            else:
-                st.warning("No monthly data available for the selected year")
-            
+                waterfall_format = {
+                    'LP Contributed': '${:,.0f}', 'LP Distributed': '${:,.0f}', 'LP IRR': '{:.1f}%',
+                    'LP Multiple': '{:.2f}x', 'GP Contributed': '${:,.0f}', 'GP Distributed': '${:,.0f}',
+                    'GP Promote': '${:,.0f}', 'GP IRR': '{:.1f}%', 'GP Multiple': '{:.2f}x'
+                }
+                summary = waterfall['summary']
+                st.dataframe(summary[summary['EntityID'] == FUND_ID].drop(columns=['EntityID', 'Entity'])
+                             .style.format(waterfall_format, na_rep='–'),
+                             use_container_width=True, hide_index=True)
+
+                fig_waterfall = go.Figure()
+                fig_waterfall.add_trace(go.Scatter(x=waterfall['months'], y=waterfall['fund_lp'][0].cumsum(),
+                                                   name='LP', line=dict(color='#0C223A', width=3)))
+                fig_waterfall.add_trace(go.Scatter(x=waterfall['months'], y=waterfall['fund_gp'][0].cumsum(),
+                                                   name='GP', line=dict(color='#F47C20', width=3)))
+                fig_waterfall.update_layout(title=f"Fund Cumulative Distributions – {scenario_names[0]}",
+                                            height=350, hovermode='x unified')
+                st.plotly_chart(fig_waterfall, use_container_width=True)
+
+                with st.expander("By Property"):
+                    by_property = summary[(summary['EntityID'] != FUND_ID) & (summary['Scenario'] == scenario_names[0])]
+                    st.dataframe(by_property.drop(columns=['EntityID', 'Scenario'])
+                                 .style.format(waterfall_format, na_rep='–'),
+                                 use_container_width=True, hide_index=True)
+
             st.markdown('</div>', unsafe_allow_html=True)
         
         # Tab 3: Financial Trends
-        with tab3:
+        with tab3, timed_section(TAB_NAMES[2]):
             st.markdown('<div class="section">', unsafe_allow_html=True)
             st.subheader("📈 Financial Trends Analysis")
             
@@ -951,32 +1762,162 @@ def main():
                 
                 with col1:
                     # Vacancy trend
-                    fig_vac = px.line(monthly_data, x='ReportingMonth', y='Vacancy',
-                                    title='Vacancy Rate Trend',
-                                    color_discrete_sequence=['#0C223A'])
-                    fig_vac.add_hline(y=5.0, line_dash="dash", 
-                                    line_color="red", annotation_text="Target")
-                    fig_vac.update_layout(height=350)
+                    fig_vac = cached_view('vacancy_figure', range_label, lambda: vacancy_trend_figure(monthly_data))
                     st.plotly_chart(fig_vac, use_container_width=True)
                 
                 with col2:
                     # NOI margin
-                    monthly_data['NOI_Margin'] = (monthly_data['NOI'] / monthly_data['Revenue'] * 100)
-                    fig_margin = px.bar(monthly_data, x='ReportingMonth', y='NOI_Margin',
-                                      title='NOI Margin %',
-                                      color_discrete_sequence=['#F47C20'])
-                    fig_margin.update_layout(height=350)
+                    fig_margin = cached_view('margin_figure', range_label, lambda: noi_margin_figure(monthly_data))
                     st.plotly_chart(fig_margin, use_container_width=True)
-            
+
+                # Month-over-month / year-over-year changes for the window
+                noi_deltas = engine.window_deltas('NOI', range_start, range_end)
+                col1, col2 = st.columns(2)
+
+                with col1:
+                    fig_delta = go.Figure()
+                    fig_delta.add_trace(go.Bar(x=noi_deltas['ReportingMonth'], y=noi_deltas['MoM_Pct'],
+                                               name='MoM %', marker_color='#0C223A'))
+                    fig_delta.add_trace(go.Bar(x=noi_deltas['ReportingMonth'], y=noi_deltas['YoY_Pct'],
+                                               name='YoY %', marker_color='#F47C20'))
+                    fig_delta.update_layout(title='NOI Change %', height=350, barmode='group')
+                    st.plotly_chart(fig_delta, use_container_width=True)
+
+                with col2:
+                    # Rolling 3-month NOI over the same window
+                    rolling_noi = pd.DataFrame({
+                        'ReportingMonth': pd.to_datetime(engine.months()),
+                        'Rolling3M_NOI': engine.rolling('NOI', 3)
+                    })
+                    rolling_noi = rolling_noi[rolling_noi['ReportingMonth'].between(range_start, range_end)]
+                    fig_rolling = px.line(rolling_noi, x='ReportingMonth', y='Rolling3M_NOI',
+                                          title='Rolling 3-Month NOI',
+                                          color_discrete_sequence=['#0C223A'])
+                    fig_rolling.update_layout(height=350)
+                    st.plotly_chart(fig_rolling, use_container_width=True)
+
+            # Year-over-year overlay across every loaded year
+            overlay = engine.yoy_overlay('NOI')
+            if not overlay.empty:
+                fig_overlay = go.Figure()
+                for year in overlay.columns:
+                    fig_overlay.add_trace(go.Scatter(
+                        x=[datetime(2000, m, 1).strftime('%b') for m in overlay.index],
+                        y=overlay[year], name=str(year), mode='lines+markers'
+                    ))
+                fig_overlay.update_layout(title='NOI by Month – Year-over-Year', height=400,
+                                          hovermode='x unified')
+                st.plotly_chart(fig_overlay, use_container_width=True)
+
+            # Trailing-twelve and annualized trailing-three figures, kept current on writes
+            if dashboard.cube is not None and dashboard.cube.month_count:
+                st.markdown(f"#### 📊 Trailing T12 / T3 – {range_end.strftime('%b %Y')}")
+                rolling_series = rolling_engine.portfolio_series('NOI', range_start, range_end)
+                if not rolling_series.empty:
+                    fig_t12 = go.Figure()
+                    fig_t12.add_trace(go.Scatter(x=rolling_series['ReportingMonth'], y=rolling_series['T12'],
+                                                 name='T12 NOI', mode='lines+markers', line=dict(color='#0C223A')))
+                    fig_t12.add_trace(go.Scatter(x=rolling_series['ReportingMonth'], y=rolling_series['T3'],
+                                                 name='T3 NOI (annualized)', mode='lines',
+                                                 line=dict(color='#F47C20', dash='dash')))
+                    fig_t12.update_layout(title='Portfolio T12 vs Annualized T3 NOI', height=350,
+                                          hovermode='x unified')
+                    st.plotly_chart(fig_t12, use_container_width=True)
+
+                t12_table = rolling_engine.table(range_end)
+                if not t12_table.empty:
+                    money = {column: '${:,.0f}' for column in t12_table.columns
+                             if column.startswith(('T12 ', 'T3 ')) and not column.endswith(('Occupancy', 'Months'))}
+                    st.dataframe(
+                        t12_table.drop(columns=['PropertyID']).style.format(dict(money, **{
+                            'T12 Occupancy': '{:.1f}%', 'T3 Occupancy': '{:.1f}%', 'T3 vs T12 %': '{:+.1f}%'
+                        }), na_rep='–'),
+                        use_container_width=True, hide_index=True
+                    )
+
+            # Monte Carlo bands from each property's own drift and volatility
+            if dashboard.cube is not None and dashboard.cube.month_count:
+                st.markdown("#### 🎲 Projections")
+                col1, col2, col3, col4, col5 = st.columns(5)
+                with col1:
+                    projection_metric = st.selectbox("Metric", PROJECTION_METRICS, key='projection_metric')
+                with col2:
+                    projection_names = dict(zip(dashboard.cube.property_ids, dashboard.cube.property_names))
+                    projection_scope = st.selectbox("Scope", [None] + sorted(projection_names,
+                                                                             key=projection_names.get),
+                                                    format_func=lambda pid: 'Portfolio' if pid is None
+                                                    else projection_names[pid],
+                                                    key='projection_scope')
+                with col3:
+                    projection_horizon = st.selectbox("Horizon (months)", [12, 24, 36, 60], index=1,
+                                                      key='projection_horizon')
+                with col4:
+                    projection_paths = st.selectbox("Paths", [500, 1000, 5000, 10000], index=1,
+                                                    key='projection_paths')
+                with col5:
+                    projection_seed = st.number_input("Seed", min_value=0, value=0, step=1, key='projection_seed')
+
+                projection = shared_cache.get_or_create(
+                    ('projection', version, projection_horizon, projection_paths, int(projection_seed)),
+                    lambda: project(dashboard.cube, paths=projection_paths, horizon=projection_horizon,
+                                    seed=int(projection_seed)),
+                    session_id
+                )
+                scope_label = 'Portfolio' if projection_scope is None else projection_names[projection_scope]
+                fig_projection = projection_band_figure(
+                    history_frame(dashboard.cube, projection_metric, projection_scope),
+                    band_frame(projection, projection_metric, projection_scope),
+                    projection_metric, title=f"{scope_label} {projection_metric} – simulated percentiles"
+                )
+                st.plotly_chart(fig_projection, use_container_width=True)
+                stats = projection['stats']
+                st.caption(f"{stats['paths']:,} paths x {stats['properties']:,} properties in "
+                           f"{stats['seconds']:.1f}s ({stats['paths_per_second']:,.0f} property-paths/s, "
+                           f"{stats['workers']} worker{'s' if stats['workers'] != 1 else ''})")
+
+            # Largest property x line item movers for the last month of the selected range
+            if dashboard.cube is not None and dashboard.cube.month_count:
+                st.markdown(f"#### 🔍 Top Movers – {range_end.strftime('%b %Y')}")
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    comparison = st.selectbox("Compare", options=list(COMPARISONS), index=1)
+                with col2:
+                    rank_by = st.radio("Rank by", options=['dollar', 'percent'], horizontal=True,
+                                       format_func=lambda v: '$ Change' if v == 'dollar' else '% Change')
+                with col3:
+                    top_n = st.slider("Show", min_value=5, max_value=50, value=15, step=5)
+
+                movers = shared_cache.get_or_create(
+                    ('movers', version, range_end, comparison, rank_by, top_n),
+                    lambda: VarianceEngine(dashboard.cube).movers(range_end, comparison, rank_by, top_n),
+                    session_id
+                )
+                if movers.empty:
+                    st.info("No comparable data for this month")
+                else:
+                    st.dataframe(
+                        movers.drop(columns=['PropertyID', 'ReportingMonth']).style.format({
+                            'Current': '${:,.0f}', 'Base': '${:,.0f}', 'Change': '${:+,.0f}', 'Change %': '{:+.1f}%'
+                        }, na_rep='–'),
+                        use_container_width=True, hide_index=True
+                    )
+
             st.markdown('</div>', unsafe_allow_html=True)
         
         # Tab 4: Property Details
-        with tab4:
+        with tab4, timed_section(TAB_NAMES[3]):
             st.markdown('<div class="section">', unsafe_allow_html=True)
             st.subheader("🏢 Property Portfolio Details")
             
             # Fetch property details
-            property_data = dashboard.get_property_details(selected_year)
+            property_data = shared_cache.get_or_create(
+                ('property_details', version, range_start, range_end),
+                lambda: dashboard.get_property_details(range_start, range_end),
+                session_id
+            )
+            if debt_engine is not None and not property_data.empty:
+                property_data = property_data.merge(debt_engine.property_metrics(range_start, range_end),
+                                                    on='PropertyID', how='left')
             
             if not property_data.empty:
                 # Summary metrics
@@ -1029,29 +1970,164 @@ def main():
                                         st.metric("NOI", f"${property['TotalNOI']:,.0f}", 
                                                 delta_color=noi_color)
                                     
-                                    # NOI Margin if revenue > 0
-                                    if property['TotalRevenue'] > 0:
-                                        noi_margin = (property['TotalNOI'] / property['TotalRevenue']) * 100
-                                        st.metric("NOI Margin", f"{noi_margin:.1f}%")
+                                    # Ratios stored with each monthly row; blank where they are undefined
+                                    ratio_cols = st.columns(3)
+                                    with ratio_cols[0]:
+                                        st.metric("NOI Margin", "–" if pd.isna(property['NOIMargin'])
+                                                  else f"{property['NOIMargin']:.1f}%")
+                                    with ratio_cols[1]:
+                                        st.metric("NOI / Unit / Month", "–" if pd.isna(property['NOIPerUnit'])
+                                                  else f"${property['NOIPerUnit']:,.0f}")
+                                    with ratio_cols[2]:
+                                        st.metric("Avg Occupancy", "–" if pd.isna(property['AvgOccupancy'])
+                                                  else f"{property['AvgOccupancy']:.1f}%")
+
+                                    # Debt, from loan schedules where the property has loans
+                                    if 'DebtService' in property and property['DebtService'] > 0:
+                                        source = "loan schedule" if property['DebtModeled'] else "reported"
+                                        st.markdown(f"**Debt ({source}):**")
+                                        debt_cols = st.columns(3)
+                                        with debt_cols[0]:
+                                            st.metric("Debt Service", f"${property['DebtService']:,.0f}")
+                                        with debt_cols[1]:
+                                            st.metric("DSCR", f"{property['DSCR']:.2f}x")
+                                        with debt_cols[2]:
+                                            st.metric("Debt Yield", "–" if pd.isna(property['DebtYield'])
+                                                      else f"{property['DebtYield']:.1f}%")
+                                        if property['Loans'] > 0:
+                                            st.caption(f"{int(property['Loans'])} loan(s), balance "
+                                                       f"${property['LoanBalance']:,.0f}, next maturity "
+                                                       f"{property['NextMaturity']:%b %Y}")
                                     
                                     st.markdown("---")
                 
+                # Amortization schedule of any loan
+                if debt_engine is not None and not debt_engine.loans.empty:
+                    with st.expander(f"🏦 Loan Schedules ({len(debt_engine.loans):,} loans)"):
+                        names = dict(zip(dashboard.cube.property_ids, dashboard.cube.property_names))
+                        loan_labels = {
+                            row.LoanID: f"{names.get(row.PropertyID, row.PropertyID)} – {row.LoanName or 'Loan'} "
+                                        f"({row.RateType})"
+                            for row in debt_engine.loans.itertuples(index=False)
+                        }
+                        loan_id = st.selectbox("Loan", list(loan_labels), format_func=loan_labels.get,
+                                               key='debt_schedule_loan')
+                        st.dataframe(
+                            debt_engine.schedule(loan_id).style.format({
+                                'PaymentMonth': '{:%b %Y}', 'Rate': '{:.3f}%', 'Interest': '${:,.2f}',
+                                'Principal': '${:,.2f}', 'DebtService': '${:,.2f}', 'Balloon': '${:,.2f}',
+                                'EndingBalance': '${:,.2f}'
+                            }),
+                            use_container_width=True, hide_index=True
+                        )
+
                 # Export option
                 st.markdown("### Export Property Data")
-                csv = property_data.to_csv(index=False)
-                st.download_button(
-                    label="📥 Download Property Details as CSV",
-                    data=csv,
-                    file_name=f"property_details_{selected_year}.csv",
-                    mime='text/csv'
+                render_export_controls(
+                    "Property Details", "property_details", lambda: property_data,
+                    data_key=range_label, file_stem=f"property_details_{range_label}"
                 )
             else:
-                st.warning("No property data available for the selected year.")
+                st.warning("No property data available for the selected time range.")
+
+            # Rent roll as of the end of the range; it has its own change counter, so financial
+            # imports leave it cached and rent roll imports leave the financial views cached
+            st.markdown("### 🏘️ Rent Roll")
+            as_of = min(pd.Timestamp.today().normalize(), pd.Timestamp(range_end) + pd.offsets.MonthEnd(0))
+            rent_roll_version = dashboard.get_data_version('RentRoll') if connected else None
+            rent_roll = None
+            if connected:
+                rent_roll = shared_cache.get(('rent_roll', rent_roll_version, as_of), session_id)
+                if rent_roll is None:
+                    with st.spinner("Loading rent roll..."):
+                        rent_roll_results = dashboard.load_rent_roll(scheduler, as_of, cancel_check=rerun_requested)
+                    if any(result.cancelled for result in rent_roll_results.values()):
+                        dashboard.disconnect_from_database()
+                        st.stop()
+                    if all(result.ok for result in rent_roll_results.values()):
+                        rent_roll = shared_cache.put(('rent_roll', rent_roll_version, as_of), {
+                            'summary': rent_roll_results['rent roll summary'].value,
+                            'unit_mix': rent_roll_results['unit mix'].value,
+                            'expirations': rent_roll_results['lease expirations'].value
+                        }, session_id)
+                    else:
+                        failed = next(result for result in rent_roll_results.values() if not result.ok)
+                        reason = "timed out" if failed.timed_out else str(failed.error)
+                        st.info(f"Rent roll unavailable ({reason}). It needs dbo.Units and dbo.Tenants.")
+            if rent_roll is None and not connected:
+                fallback = shared_cache.latest('rent_roll', session_id)
+                rent_roll = fallback[1] if fallback is not None else None
+
+            if rent_roll is not None and not rent_roll['summary'].empty:
+                t12_noi = pd.Series(dtype=float)
+                if dashboard.cube is not None and dashboard.cube.month_count:
+                    t12_table = rolling_engine.table(range_end, items=['NOI'])
+                    if not t12_table.empty:
+                        t12_noi = t12_table.set_index('PropertyID')['T12 NOI']
+                per_unit = rentroll.per_unit_noi(rent_roll['summary'], rent_roll['unit_mix'], t12_noi)
+                summary = per_unit['summary']
+                names = dict(zip(dashboard.cube.property_ids, dashboard.cube.property_names)) \
+                    if dashboard.cube is not None else {}
+                summary.insert(1, 'Property', summary['PropertyID'].map(names).fillna(summary['PropertyID'].astype(str)))
+
+                units = summary['Units'].sum()
+                occupied = summary['OccupiedUnits'].sum()
+                market = summary['OccupiedMarketRent'].sum()
+                in_place = summary['InPlaceRent'].sum()
+                rr_cols = st.columns(4)
+                with rr_cols[0]:
+                    st.metric("Physical Occupancy", f"{occupied / units * 100:.1f}%" if units else "–",
+                              help=f"{int(occupied):,} of {int(units):,} units as of {as_of:%b %d, %Y}")
+                with rr_cols[1]:
+                    st.metric("Avg In-Place Rent", f"${in_place / occupied:,.0f}" if occupied else "–")
+                with rr_cols[2]:
+                    st.metric("Loss to Lease", f"${market - in_place:,.0f}/mo",
+                              f"{(market - in_place) / market * 100:.1f}% of market" if market else None,
+                              delta_color="off")
+                with rr_cols[3]:
+                    st.metric("Month-to-Month", f"{int(summary['MonthToMonth'].sum()):,}")
+
+                st.dataframe(
+                    summary[['Property', 'Units', 'OccupiedUnits', 'Occupancy', 'AvgMarketRent', 'AvgInPlaceRent',
+                             'LossToLease', 'LossToLeasePct', 'MonthToMonth', 'NOI per Unit']]
+                    .sort_values('Property').style.format({
+                        'Occupancy': '{:.1f}%', 'AvgMarketRent': '${:,.0f}', 'AvgInPlaceRent': '${:,.0f}',
+                        'LossToLease': '${:,.0f}', 'LossToLeasePct': '{:.1f}%', 'NOI per Unit': '${:,.0f}'
+                    }, na_rep='–'),
+                    use_container_width=True, hide_index=True
+                )
+
+                rr_options = [None] + summary.sort_values('Property')['PropertyID'].tolist()
+                rr_property = st.selectbox("Rent roll for", rr_options, key='rent_roll_property',
+                                           format_func=lambda pid: "All properties" if pid is None else names.get(pid, pid))
+                mix_col, ladder_col = st.columns(2)
+                with mix_col:
+                    st.markdown("**Unit Mix**")
+                    mix = per_unit['unit_mix']
+                    if rr_property is not None:
+                        mix = mix[mix['PropertyID'] == rr_property]
+                    else:
+                        mix = rentroll.portfolio_unit_mix(mix)
+                    st.dataframe(mix[['UnitType', 'Units', 'Occupancy', 'AvgSquareFeet', 'AvgMarketRent',
+                                      'AvgInPlaceRent', 'LossToLeasePct', 'NOI per Unit']].style.format({
+                        'Occupancy': '{:.1f}%', 'AvgSquareFeet': '{:,.0f}', 'AvgMarketRent': '${:,.0f}',
+                        'AvgInPlaceRent': '${:,.0f}', 'LossToLeasePct': '{:.1f}%', 'NOI per Unit': '${:,.0f}'
+                    }, na_rep='–'), use_container_width=True, hide_index=True)
+                with ladder_col:
+                    st.markdown("**Lease Expirations**")
+                    ladder = rentroll.expiration_ladder(rent_roll['expirations'], as_of, rr_property)
+                    fig_ladder = px.bar(ladder, x='Bucket', y='Leases', hover_data={'MonthlyRent': ':$,.0f',
+                                                                                    'PctOfLeases': ':.1f'})
+                    fig_ladder.update_layout(height=350, xaxis_title=None, xaxis={'categoryorder': 'array',
+                                                                                  'categoryarray': ladder['Bucket']})
+                    st.plotly_chart(fig_ladder, use_container_width=True)
+            elif rent_roll is not None:
+                st.info("No units in the rent roll yet.")
             
             st.markdown('</div>', unsafe_allow_html=True)
         
         # Tab 5: Data Management
-        with tab5:
+        with tab5, timed_section(TAB_NAMES[4]):
             st.markdown('<div class="section">', unsafe_allow_html=True)
             st.subheader("📋 Monthly Performance Data")
             
@@ -1064,6 +2140,8 @@ def main():
                 for col in ['Revenue', 'Expenses', 'NOI', 'CashFlow']:
                     display_data[col] = display_data[col].apply(lambda x: f"${x:,.2f}")
                 display_data['Vacancy'] = display_data['Vacancy'].apply(lambda x: f"{x:.1f}%")
+                display_data['NOI_Margin'] = display_data['NOI_Margin'].apply(
+                    lambda x: "–" if pd.isna(x) else f"{x:.1f}%")
                 
                 st.dataframe(display_data, use_container_width=True, height=400)
                 
@@ -1071,42 +2149,36 @@ def main():
                 col1, col2 = st.columns(2)
                 
                 with col1:
-                    csv = monthly_data.to_csv(index=False)
-                    st.download_button(
-                        label="📊 Download Monthly Data (CSV)",
-                        data=csv,
-                        file_name=f"monthly_performance_{selected_year}.csv",
-                        mime="text/csv"
+                    st.markdown("**📊 Monthly Data**")
+                    render_export_controls(
+                        "Monthly Data", "monthly_data", lambda: monthly_data,
+                        data_key=range_label, file_stem=f"monthly_performance_{range_label}"
                     )
                 
                 with col2:
-                    if st.button("📋 Export KPI Summary"):
-                        kpi_df = pd.DataFrame([kpis])
-                        csv_kpi = kpi_df.to_csv(index=False)
-                        st.download_button(
-                            label="Download KPI Summary",
-                            data=csv_kpi,
-                            file_name=f"kpi_summary_{datetime.now().strftime('%Y%m%d')}.csv",
-                            mime="text/csv"
-                        )
+                    st.markdown("**📋 KPI Summary**")
+                    render_export_controls(
+                        "KPI Summary", "kpi_summary", lambda: pd.DataFrame([kpis]),
+                        data_key=range_label, file_stem=f"kpi_summary_{datetime.now().strftime('%Y%m%d')}"
+                    )
             
             st.markdown('</div>', unsafe_allow_html=True)
         
         # Tab 6: Monthly Financials
-        with tab6:
+        with tab6, timed_section(TAB_NAMES[5]):
             st.markdown('<div class="section">', unsafe_allow_html=True)
             st.subheader("💰 Monthly Financials Management")
             
-            # Get property list for dropdowns
-            properties = dashboard.get_property_list()
+            # Property list was prefetched with the other dashboard queries
             if not properties:
                 st.error("No properties found in database. Please add properties first.")
                 st.markdown('</div>', unsafe_allow_html=True)
                 return
             
             # Create tabs within Monthly Financials
-            finance_tab1, finance_tab2, finance_tab3, finance_tab4 = st.tabs([
-                "📝 Manual Entry", "📁 CSV Import", "📊 Financial History", "🗑️ Data Management"
+            finance_tab1, finance_tab2, finance_tab3, finance_tab4, finance_tab5 = st.tabs([
+                "📝 Manual Entry", "📁 CSV Import", "📊 Financial History", "🗑️ Data Management",
+                "🏘️ Rent Roll Import"
             ])
             
             # Manual Entry Tab
@@ -1230,6 +2302,7 @@ def main():
                         
                         if dashboard.import_monthly_financials(property_id, reporting_month, financial_data):
                             st.success(f"✅ Financial data saved successfully for {selected_property} - {reporting_month}")
+                            after_data_write(dashboard)
                             st.rerun()
                         else:
                             st.error("❌ Failed to save financial data")
@@ -1263,8 +2336,10 @@ def main():
                     template_df = pd.DataFrame(template_data)
                     st.dataframe(template_df, use_container_width=True)
                     
-                    # Download template
-                    csv_template = template_df.to_csv(index=False)
+                    # Download template (the template never changes, so it is built once per session)
+                    csv_template = st.session_state.get('csv_template')
+                    if csv_template is None:
+                        csv_template = st.session_state.csv_template = template_df.to_csv(index=False)
                     st.download_button(
                         label="📥 Download CSV Template",
                         data=csv_template,
@@ -1286,73 +2361,38 @@ def main():
                         st.write("📊 **File Preview:**")
                         st.dataframe(df.head(), use_container_width=True)
                         
-                        # Validate required columns
-                        required_cols = ['PropertyID', 'ReportingMonth']
-                        missing_cols = [col for col in required_cols if col not in df.columns]
+                        # Validate required columns, PropertyIDs and months in one pass
+                        valid_property_ids = [pid for pid, pname in properties]
+                        try:
+                            import_df, rejected_df = prepare_financial_frame(df, valid_property_ids)
+                        except ValueError as e:
+                            st.error(f"❌ {str(e)}")
+                            import_df = None
                         
-                        if missing_cols:
-                            st.error(f"❌ Missing required columns: {missing_cols}")
-                        else:
+                        if import_df is not None:
                             # Show import summary
-                            st.write(f"**Records to import:** {len(df)}")
-                            
-                            # Validate PropertyIDs
-                            valid_property_ids = [pid for pid, pname in properties]
-                            invalid_properties = df[~df['PropertyID'].isin(valid_property_ids)]
+                            st.write(f"**Records to import:** {len(import_df)}")
                             
-                            if not invalid_properties.empty:
-                                st.warning(f"⚠️ Found {len(invalid_properties)} records with invalid PropertyIDs")
-                                st.dataframe(invalid_properties[['PropertyID', 'ReportingMonth']], use_container_width=True)
+                            if not rejected_df.empty:
+                                st.warning(f"⚠️ Found {len(rejected_df)} records that cannot be imported")
+                                st.dataframe(rejected_df[['PropertyID', 'ReportingMonth', 'Reason']], use_container_width=True)
                             
                             if st.button("🚀 Import Financial Data", type="primary"):
-                                success_count = 0
-                                error_count = 0
-                                
-                                progress_bar = st.progress(0)
-                                status_text = st.empty()
-                                
-                                for index, row in df.iterrows():
-                                    if row['PropertyID'] in valid_property_ids:
-                                        try:
-                                            # Convert row to dict and handle NaN values
-                                            financial_data = row.to_dict()
-                                            for key, value in financial_data.items():
-                                                if pd.isna(value):
-                                                    financial_data[key] = 0
-                                            
-                                            # Parse date
-                                            reporting_date = pd.to_datetime(row['ReportingMonth']).date()
-                                            
-                                            if dashboard.import_monthly_financials(
-                                                row['PropertyID'], 
-                                                reporting_date, 
-                                                financial_data
-                                            ):
-                                                success_count += 1
-                                            else:
-                                                error_count += 1
-                                        except Exception as e:
-                                            st.error(f"Error processing row {index + 1}: {str(e)}")
-                                            error_count += 1
-                                    else:
-                                        error_count += 1
-                                    
-                                    # Update progress
-                                    progress = (index + 1) / len(df)
-                                    progress_bar.progress(progress)
-                                    status_text.text(f"Processing record {index + 1} of {len(df)}")
+                                try:
+                                    # Only rows whose content hash changed are written
+                                    with st.spinner("Importing financial data..."):
+                                        counts = dashboard.import_financial_frame(import_df, file_path=uploaded_file.name)
+                                except Exception as e:
+                                    st.error(f"❌ Error importing financial data: {str(e)}")
+                                    counts = None
                                 
                                 # Show results
-                                progress_bar.empty()
-                                status_text.empty()
-                                
-                                if success_count > 0:
-                                    st.success(f"✅ Successfully imported {success_count} records")
-                                if error_count > 0:
-                                    st.error(f"❌ Failed to import {error_count} records")
-                                
-                                if success_count > 0:
-                                    st.rerun()
+                                if counts is not None:
+                                    st.success(f"✅ {counts['new']} new, {counts['updated']} updated, "
+                                               f"{counts['unchanged']} unchanged records")
+                                    if counts['new'] or counts['updated']:
+                                        after_data_write(dashboard)
+                                        st.rerun()
                     
                     except Exception as e:
                         st.error(f"❌ Error reading CSV file: {str(e)}")
@@ -1375,10 +2415,14 @@ def main():
                 
                 with col2:
                     if st.button("🔄 Refresh History"):
+                        invalidate_cached_data()
                         st.rerun()
                 
-                # Get financial history
-                history_df = dashboard.get_financial_history(filter_property_id)
+                # Get financial history (the unfiltered history was prefetched)
+                if filter_property_id is None:
+                    history_df = all_history
+                else:
+                    history_df = dashboard.get_financial_history(filter_property_id)
                 
                 if not history_df.empty:
                     # Summary metrics
@@ -1392,8 +2436,8 @@ def main():
                     with summary_col3:
                         st.metric("Total NOI", f"${history_df['NOI'].sum():,.0f}")
                     with summary_col4:
-                        avg_occupancy = history_df['Occupancy'].mean() if 'Occupancy' in history_df.columns else 0
-                        st.metric("Avg Occupancy", f"{avg_occupancy:.1f}%")
+                        avg_occupancy = history_df['OccupancyPct'].mean()
+                        st.metric("Avg Occupancy", "–" if pd.isna(avg_occupancy) else f"{avg_occupancy:.1f}%")
                     
                     # Display data table
                     st.markdown("#### 📋 Financial Records")
@@ -1414,16 +2458,20 @@ def main():
                     
                     if 'Occupancy' in display_history.columns:
                         display_history['Occupancy'] = display_history['Occupancy'].apply(lambda x: f"{x:.1f}%")
+
+                    # Stored ratios are NULL where undefined (no revenue, no unit count)
+                    for col in ['VacancyPct', 'OccupancyPct', 'NOIMargin', 'ExpenseRatio']:
+                        display_history[col] = display_history[col].apply(lambda x: "–" if pd.isna(x) else f"{x:.1f}%")
+                    for col in ['RevenuePerUnit', 'NOIPerUnit']:
+                        display_history[col] = display_history[col].apply(lambda x: "–" if pd.isna(x) else f"${x:,.2f}")
                     
                     st.dataframe(display_history, use_container_width=True, height=400)
                     
                     # Export option
-                    csv_export = history_df.to_csv(index=False)
-                    st.download_button(
-                        label="📥 Export Financial History",
-                        data=csv_export,
-                        file_name=f"financial_history_{datetime.now().strftime('%Y%m%d')}.csv",
-                        mime="text/csv"
+                    render_export_controls(
+                        "Financial History", "financial_history", lambda: history_df,
+                        data_key=filter_property_id,
+                        file_stem=f"financial_history_{datetime.now().strftime('%Y%m%d')}"
                     )
                 else:
                     st.info("No financial history found for the selected criteria.")
@@ -1432,8 +2480,8 @@ def main():
             with finance_tab4:
                 st.markdown("#### Data Management & Cleanup")
                 
-                # Get all financial records for management
-                all_records = dashboard.get_financial_history()
+                # All financial records were prefetched with the other dashboard queries
+                all_records = all_history
                 
                 if not all_records.empty:
                     st.markdown("#### 🗑️ Delete Financial Records")
@@ -1492,6 +2540,7 @@ def main():
                                 
                                 if deleted_count > 0:
                                     st.success(f"✅ Successfully deleted {deleted_count} record(s)")
+                                    after_data_write(dashboard)
                                     st.rerun()
                                 else:
                                     st.error("❌ Failed to delete records")
@@ -1501,6 +2550,127 @@ def main():
                 
                 else:
                     st.info("No financial records found in the database.")
+
+                # Reconciliation scan over the whole table, run on demand and shared per data version
+                st.markdown("#### 🔍 Data Quality")
+                st.caption("Checks every stored row: TotalIncome, TotalExpenses, NOI and CashFlow against their "
+                           "line items, Vacancy stored as a percent, occupancy range, negative amounts, "
+                           "duplicate and missing months, and outlier months per property.")
+                quality_key = ('data_quality', version)
+                if st.button("Run data-quality scan", key='run_quality_scan'):
+                    with st.spinner("Scanning MonthlyFinancials..."):
+                        scan_results = scheduler.run({name: (task, 120) for name, task in quality.scan_tasks().items()},
+                                                     cancel_check=rerun_requested)
+                    if any(result.cancelled for result in scan_results.values()):
+                        dashboard.disconnect_from_database()
+                        st.stop()
+                    failed_scans = [result for result in scan_results.values() if not result.ok]
+                    for result in failed_scans:
+                        reason = "timed out" if result.timed_out else str(result.error)
+                        st.error(f"❌ Data-quality scan '{result.name}' failed: {reason}")
+                    if not failed_scans:
+                        issues = pd.concat([result.value for result in scan_results.values()], ignore_index=True)
+                        shared_cache.put(quality_key, issues.reindex(columns=quality.ISSUE_COLUMNS), session_id)
+
+                issues = shared_cache.get(quality_key, session_id)
+                if issues is not None:
+                    property_names = {pid: pname for pid, pname in properties}
+                    fixes = quality.fix_list(issues, property_names)
+                    if fixes.empty:
+                        st.success("✅ No data-quality issues found")
+                    else:
+                        quality_summary = quality.summary(issues)
+                        st.dataframe(quality_summary[quality_summary['Issues'] > 0], use_container_width=True,
+                                     hide_index=True)
+                        st.markdown(f"**Fix list** ({len(fixes):,} issues, highest priority first)")
+                        st.dataframe(fixes.head(500).style.format({
+                            'ReportingMonth': '{:%Y-%m}', 'Stored': '{:,.2f}', 'Expected': '{:,.2f}',
+                            'Impact': '{:,.2f}', 'FinancialID': '{:.0f}'
+                        }, na_rep='–'), use_container_width=True, hide_index=True)
+                        render_export_controls("Fix List", "data_quality", lambda: fixes,
+                                               data_key=version, file_stem=f"data_quality_{version}")
+
+                        fixable = quality_summary[quality_summary['AutoFix'] & (quality_summary['Issues'] > 0)]
+                        if not fixable.empty:
+                            chosen_fixes = st.multiselect("Auto-correct", fixable['Check'].tolist(),
+                                                          default=fixable['Check'].tolist(), key='quality_fixes',
+                                                          help="Totals are rebuilt from their line items; "
+                                                               "percent vacancy becomes a dollar loss")
+                            confirm_fixes = st.checkbox("I have reviewed the fix list", key='confirm_quality_fixes')
+                            if st.button("🛠️ Apply fixes", disabled=not (chosen_fixes and confirm_fixes)):
+                                try:
+                                    with st.spinner("Correcting rows..."):
+                                        fixed = dashboard.fix_data_quality(chosen_fixes)
+                                except Exception as e:
+                                    st.error(f"❌ Error applying fixes: {str(e)}")
+                                    fixed = None
+                                if fixed is not None:
+                                    st.success(f"✅ Corrected {fixed['rows']:,} rows")
+                                    if fixed['rows']:
+                                        after_data_write(dashboard)
+                                        st.rerun()
+
+            # Rent Roll Import Tab
+            with finance_tab5:
+                st.markdown("#### Rent Roll Import")
+                st.caption("One row per unit, as exported by the property manager (CSV or XLSX). Columns are "
+                           "matched by name: unit, unit type/floor plan, beds, sq ft, market rent, tenant, "
+                           "lease start/end, rent and move-out. Units vacant on the as-of date move their "
+                           "current tenant out; units missing from the file are left unchanged.")
+                rent_roll_file = st.file_uploader("Choose rent roll file", type=["csv", "xlsx"],
+                                                  key='rent_roll_upload')
+                rr_cols = st.columns(2)
+                with rr_cols[0]:
+                    rent_roll_as_of = st.date_input("Rent roll as of", value=datetime.now().date(),
+                                                    key='rent_roll_as_of')
+                with rr_cols[1]:
+                    property_names = {pid: pname for pid, pname in properties}
+                    rent_roll_property = st.selectbox(
+                        "Property (for files without a property column)", [None] + list(property_names),
+                        format_func=lambda pid: "From file" if pid is None else property_names[pid],
+                        key='rent_roll_import_property'
+                    )
+
+                if rent_roll_file is not None:
+                    try:
+                        loaded = load_rent_roll(rent_roll_file, property_ids={pname: pid for pid, pname in properties},
+                                                valid_property_ids=list(property_names),
+                                                property_id=rent_roll_property)
+                    except (ValueError, ImportError) as e:
+                        st.error(f"❌ {str(e)}")
+                        loaded = None
+
+                    if loaded is not None:
+                        rent_roll_rows = loaded['frame']
+                        st.write(f"**Units to import:** {len(rent_roll_rows):,} across "
+                                 f"{rent_roll_rows['PropertyID'].nunique():,} properties "
+                                 f"({loaded['rows'] / loaded['parse_seconds']:,.0f} rows/s parsed)"
+                                 if loaded['parse_seconds'] > 0 else f"**Units to import:** {len(rent_roll_rows):,}")
+                        st.caption("Columns used: " + ", ".join(f"{field} ← '{header}'"
+                                                                for field, header in loaded['columns'].items()))
+                        st.dataframe(rent_roll_rows.head(), use_container_width=True, hide_index=True)
+                        if not loaded['rejected'].empty:
+                            st.warning(f"⚠️ Found {len(loaded['rejected']):,} rows that cannot be imported")
+                            st.dataframe(loaded['rejected'].head(100), use_container_width=True, hide_index=True)
+
+                        if not rent_roll_rows.empty and st.button("🚀 Import Rent Roll", type="primary"):
+                            try:
+                                with st.spinner("Applying rent roll..."):
+                                    applied = dashboard.import_rent_roll(rent_roll_rows, as_of=rent_roll_as_of)
+                            except Exception as e:
+                                st.error(f"❌ Error importing rent roll: {str(e)}")
+                                applied = None
+
+                            if applied is not None:
+                                st.success(
+                                    f"✅ Units: {applied['units_inserted']:,} new, {applied['units_updated']:,} updated. "
+                                    f"Leases: {applied['leases_inserted']:,} new, {applied['leases_updated']:,} "
+                                    f"updated, {applied['move_outs']:,} move-outs "
+                                    f"({applied['units_per_second']:,.0f} units/s)"
+                                )
+                                for failure in applied['failed']:
+                                    st.error(f"❌ Property {property_names.get(failure['property_id'], failure['property_id'])}: "
+                                             f"{failure['error']}")
             
             st.markdown('</div>', unsafe_allow_html=True)
         
@@ -1510,17 +2680,27 @@ def main():
             with st.expander("Show Debug Data"):
                 st.write("**KPIs:**", kpis)
                 st.write("**Monthly Data Shape:**", monthly_data.shape if not monthly_data.empty else "No data")
-                st.write("**Session State:**", dict(st.session_state))
+                st.write("**Data Version:**", st.session_state.get('data_version'))
+                st.write("**Query Timings:**", {name: f"{r.elapsed:.3f}s" for name, r in query_results.items()})
+                st.write("**Connection Pool:**", scheduler.pool.stats())
+                st.write("**Circuit Breaker:**", scheduler.breaker.stats())
+                st.write("**Query Attempts:**", {name: r.attempts for name, r in query_results.items()})
+                st.write("**Tab Render Times (ms):**", {name: round((end - start) * 1000, 1) for name, (start, end)
+                                                        in st.session_state.get(RENDER_TIMINGS_KEY, {}).items()})
+                if 'export_cache' in st.session_state:
+                    st.write("**Export Cache:**", st.session_state.export_cache.stats())
+                cache_stats = shared_cache.stats()
+                st.write(f"**Shared Cache:** {cache_stats['used_bytes'] / 1024 ** 2:,.1f} MB of "
+                         f"{cache_stats['budget_bytes'] / 1024 ** 2:,.0f} MB, {cache_stats['entries']} entries, "
+                         f"{cache_stats['hits']} hits, {cache_stats['misses']} misses, {cache_stats['evictions']} evictions")
+                st.dataframe(shared_cache.stats_frame(), use_container_width=True, hide_index=True)
+                st.write("**Session State:**", {key: type(value).__name__ for key, value in st.session_state.items()})
     
     except Exception as e:
         st.error(f"Error loading dashboard data: {str(e)}")
         if debug_mode:
             st.write("**Full error details:**")
             st.exception(e)
-    
-    finally:
-        # Clean up database connection
-        dashboard.disconnect_from_database()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+# Dashboard palette
+PRIMARY_COLOR = '#0C223A'
+ACCENT_COLOR = '#F47C20'
+
+
+def monthly_performance_figure(monthly_data: pd.DataFrame, height: int = 600) -> go.Figure:
+    """Revenue & Expenses over NOI & Cash Flow, as shown on Portfolio Analysis"""
+    fig = make_subplots(
+        rows=2, cols=1,
+        subplot_titles=('Revenue & Expenses', 'NOI & Cash Flow'),
+        vertical_spacing=0.15
+    )
+
+    # Revenue & Expenses
+    fig.add_trace(
+        go.Scatter(x=monthly_data['ReportingMonth'], y=monthly_data['Revenue'],
+                   name='Revenue', line=dict(color=PRIMARY_COLOR, width=3)),
+        row=1, col=1
+    )
+    fig.add_trace(
+        go.Scatter(x=monthly_data['ReportingMonth'], y=monthly_data['Expenses'],
+                   name='Expenses', line=dict(color=ACCENT_COLOR, width=3)),
+        row=1, col=1
+    )
+
+    # NOI & Cash Flow
+    fig.add_trace(
+        go.Bar(x=monthly_data['ReportingMonth'], y=monthly_data['NOI'],
+               name='NOI', marker_color=PRIMARY_COLOR),
+        row=2, col=1
+    )
+    fig.add_trace(
+        go.Scatter(x=monthly_data['ReportingMonth'], y=monthly_data['CashFlow'],
+                   name='Cash Flow', line=dict(color=ACCENT_COLOR, width=2)),
+        row=2, col=1
+    )
+
+    fig.update_layout(height=height, showlegend=True, hovermode='x unified')
+    return fig
+
+
+def vacancy_trend_figure(monthly_data: pd.DataFrame, target: float = 5.0, height: int = 350) -> go.Figure:
+    """Vacancy rate line with the target drawn as a dashed rule"""
+    fig = px.line(monthly_data, x='ReportingMonth', y='Vacancy',
+                  title='Vacancy Rate Trend',
+                  color_discrete_sequence=[PRIMARY_COLOR])
+    fig.add_hline(y=target, line_dash="dash",
+                  line_color="red", annotation_text="Target")
+    fig.update_layout(height=height)
+    return fig
+
+
+def noi_margin_figure(monthly_data: pd.DataFrame, height: int = 350) -> go.Figure:
+    """NOI margin % bars; uses an existing NOI_Margin column when present"""
+    if 'NOI_Margin' not in monthly_data.columns:
+        revenue = monthly_data['Revenue'].to_numpy(dtype=float)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            margin = np.where(revenue != 0, monthly_data['NOI'].to_numpy(dtype=float) / revenue * 100, np.nan)
+        monthly_data = monthly_data.assign(NOI_Margin=margin)
+
+    fig = px.bar(monthly_data, x='ReportingMonth', y='NOI_Margin',
+                 title='NOI Margin %',
+                 color_discrete_sequence=[ACCENT_COLOR])
+    fig.update_layout(height=height)
+    return fig
+
+
+def sensitivity_heatmap(frame: pd.DataFrame, value_format: str, title: str = '', height: int = 350) -> go.Figure:
+    """Sensitivity grid as an annotated heatmap; rows and columns keep the frame's axis labels"""
+    text = [[value_format.format(v) if np.isfinite(v) else '–' for v in row] for row in frame.to_numpy()]
+    fig = go.Figure(go.Heatmap(
+        z=frame.to_numpy(), x=list(frame.columns), y=list(frame.index),
+        text=text, texttemplate='%{text}', colorscale='RdYlGn', showscale=False,
+        hovertemplate=f'{frame.index.name} %{{y}}<br>{frame.columns.name} %{{x}}<br>%{{text}}<extra></extra>'
+    ))
+    fig.update_layout(title=title, height=height, xaxis_title=frame.columns.name, yaxis_title=frame.index.name,
+                      xaxis_type='category', yaxis_type='category')
+    return fig
+
+
+def projection_band_figure(history: pd.DataFrame, bands: pd.DataFrame, metric: str, title: str = '',
+                           height: int = 400) -> go.Figure:
+    """Actuals followed by the simulated median with P25-P75 and P5-P95 bands"""
+    fig = go.Figure()
+    for lower, upper, opacity, name in (('P5', 'P95', 0.15, 'P5–P95'), ('P25', 'P75', 0.3, 'P25–P75')):
+        fig.add_trace(go.Scatter(x=bands['ReportingMonth'], y=bands[upper], mode='lines',
+                                 line=dict(width=0), showlegend=False, hoverinfo='skip'))
+        fig.add_trace(go.Scatter(x=bands['ReportingMonth'], y=bands[lower], mode='lines', line=dict(width=0),
+                                 fill='tonexty', fillcolor=f'rgba(244, 124, 32, {opacity})', name=name))
+    fig.add_trace(go.Scatter(x=bands['ReportingMonth'], y=bands['P50'], name='Median',
+                             line=dict(color=ACCENT_COLOR, width=2, dash='dash')))
+    fig.add_trace(go.Scatter(x=history['ReportingMonth'], y=history[metric], name='Actual',
+                             line=dict(color=PRIMARY_COLOR, width=3)))
+    fig.update_layout(title=title, height=height, hovermode='x unified')
+    return fig
@@ -0,0 +1,343 @@
+import copy
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Tuple
+from derived import DERIVED_COLUMNS, derive_metrics
+from timeseries import month_ordinal, ordinal_to_timestamp
+
+# Line items stored per property-month in dbo.MonthlyFinancials
+LINE_ITEMS = [
+    'GrossRent', 'Vacancy', 'OtherIncome', 'TotalIncome',
+    'RepairsMaintenance', 'Utilities', 'PropertyManagement',
+    'PropertyTaxes', 'Insurance', 'Marketing', 'Administrative',
+    'TotalExpenses', 'NOI', 'DebtService', 'CashFlow', 'Occupancy'
+]
+
+ITEM_INDEX = {name: i for i, name in enumerate(LINE_ITEMS)}
+
+# Ratios stored per row alongside the line items; NaN where the stored value is NULL
+METRIC_INDEX = {name: i for i, name in enumerate(DERIVED_COLUMNS)}
+
+ROLLUP_AXES = {'property': 0, 'month': 1, 'line_item': 2}
+
+
+class FinancialCube:
+    """Dense property x month x line item array built once from MonthlyFinancials"""
+
+    def __init__(self, records: pd.DataFrame, properties: pd.DataFrame):
+        # Property axis
+        properties = properties if properties is not None else pd.DataFrame()
+        self.property_ids = np.asarray(properties.get('PropertyID', []), dtype=np.int64)
+        self.property_names = list(properties.get('PropertyName', []))
+        self.purchase_prices = np.asarray(properties.get('PurchasePrice', []), dtype=float)
+        self.unit_counts = np.asarray(properties.get('UnitCount', []), dtype=float)
+        self.property_index = {int(pid): i for i, pid in enumerate(self.property_ids)}
+
+        # Month axis
+        self.start_ordinal = 0
+        self.values = np.zeros((len(self.property_ids), 0, len(LINE_ITEMS)))
+        self.mask = np.zeros((len(self.property_ids), 0), dtype=bool)
+        self.financial_ids = np.zeros((len(self.property_ids), 0), dtype=np.int64)
+        self.metrics = np.full((len(self.property_ids), 0, len(DERIVED_COLUMNS)), np.nan)
+
+        if records is None or records.empty:
+            return
+
+        # Records for properties missing from dbo.Properties still get a slot
+        for pid in pd.unique(records['PropertyID']):
+            self._ensure_property(int(pid))
+
+        ordinals = pd.to_datetime(records['ReportingMonth']).map(month_ordinal).to_numpy()
+        self.start_ordinal = int(ordinals.min())
+        shape = (len(self.property_ids), int(ordinals.max()) - self.start_ordinal + 1)
+        self.values = np.zeros(shape + (len(LINE_ITEMS),))
+        self.mask = np.zeros(shape, dtype=bool)
+        self.financial_ids = np.zeros(shape, dtype=np.int64)
+        self.metrics = np.full(shape + (len(DERIVED_COLUMNS),), np.nan)
+
+        p_idx = records['PropertyID'].map(self.property_index).to_numpy()
+        m_idx = ordinals - self.start_ordinal
+        # NULL line items stay NaN; readers skip them (nansum, per-item counts) rather than read 0
+        self.values[p_idx, m_idx, :] = records[LINE_ITEMS].to_numpy(dtype=float)
+        self.mask[p_idx, m_idx] = True
+        if 'FinancialID' in records.columns:
+            self.financial_ids[p_idx, m_idx] = records['FinancialID'].to_numpy(dtype=np.int64)
+        # Records read without the stored ratios (synthetic data, older exports) get them derived here
+        if not set(DERIVED_COLUMNS) <= set(records.columns):
+            records = derive_metrics(records, self._unit_count_map())
+        self.metrics[p_idx, m_idx, :] = records[DERIVED_COLUMNS].to_numpy(dtype=float)
+
+    @property
+    def shape(self) -> Tuple[int, int, int]:
+        return self.values.shape
+
+    @property
+    def month_count(self) -> int:
+        return self.values.shape[1]
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.values, self.mask, self.financial_ids, self.metrics, self.property_ids, self.purchase_prices,
+                  self.unit_counts)
+        return sum(array.nbytes for array in arrays) + sum(len(str(name)) for name in self.property_names)
+
+    def months(self) -> List[pd.Timestamp]:
+        return [ordinal_to_timestamp(self.start_ordinal + i) for i in range(self.month_count)]
+
+    def _unit_count_map(self) -> Dict[int, float]:
+        return {int(pid): float(units) for pid, units in zip(self.property_ids, self.unit_counts)}
+
+    def copy(self) -> 'FinancialCube':
+        """A copy sharing no arrays, lists or indexes with this cube"""
+        clone = copy.copy(self)
+        for name, value in vars(self).items():
+            if isinstance(value, (np.ndarray, list, dict)):
+                setattr(clone, name, value.copy())
+        return clone
+
+    # Axis management
+    def covers(self, property_id: int, reporting_month) -> bool:
+        """Whether a property-month already has a slot, so writing it reshapes nothing"""
+        position = month_ordinal(reporting_month) - self.start_ordinal
+        return int(property_id) in self.property_index and 0 <= position < self.month_count
+
+    def _ensure_property(self, property_id: int, name: str = None) -> int:
+        """Return the ordinal for a property, appending a new slot if needed"""
+        if property_id in self.property_index:
+            return self.property_index[property_id]
+
+        ordinal = len(self.property_ids)
+        self.property_index[property_id] = ordinal
+        self.property_ids = np.append(self.property_ids, property_id)
+        self.property_names.append(name or f"Property {property_id}")
+        self.purchase_prices = np.append(self.purchase_prices, 0.0)
+        self.unit_counts = np.append(self.unit_counts, 0.0)
+
+        months = self.month_count
+        self.values = np.concatenate([self.values, np.zeros((1, months, len(LINE_ITEMS)))], axis=0)
+        self.mask = np.concatenate([self.mask, np.zeros((1, months), dtype=bool)], axis=0)
+        self.financial_ids = np.concatenate([self.financial_ids, np.zeros((1, months), dtype=np.int64)], axis=0)
+        self.metrics = np.concatenate([self.metrics, np.full((1, months, len(DERIVED_COLUMNS)), np.nan)], axis=0)
+        return ordinal
+
+    def _ensure_month(self, ordinal: int) -> int:
+        """Return the month position for an ordinal, widening the month axis if needed"""
+        if self.month_count == 0:
+            self.start_ordinal = ordinal
+
+        before = max(self.start_ordinal - ordinal, 0)
+        after = max(ordinal - (self.start_ordinal + self.month_count - 1), 0) if self.month_count else 1
+        if before or after:
+            self.values = np.pad(self.values, ((0, 0), (before, after), (0, 0)))
+            self.mask = np.pad(self.mask, ((0, 0), (before, after)))
+            self.financial_ids = np.pad(self.financial_ids, ((0, 0), (before, after)))
+            self.metrics = np.pad(self.metrics, ((0, 0), (before, after), (0, 0)), constant_values=np.nan)
+            self.start_ordinal -= before
+        return ordinal - self.start_ordinal
+
+    def _month_slice(self, start=None, end=None) -> slice:
+        """Translate an optional [start, end] month window to positions on the month axis"""
+        lo = 0 if start is None else month_ordinal(start) - self.start_ordinal
+        hi = self.month_count if end is None else month_ordinal(end) - self.start_ordinal + 1
+        return slice(min(max(lo, 0), self.month_count), min(max(hi, 0), self.month_count))
+
+    # Slicing and rollups
+    def slice(self, property_id: int = None, start=None, end=None, items: List[str] = None):
+        """Return (values, mask) views for a property / month window / line items"""
+        months = self._month_slice(start, end)
+        if property_id is not None:
+            p = self.property_index[int(property_id)]
+            properties = slice(p, p + 1)
+        else:
+            properties = slice(None)
+
+        values = self.values[properties, months, :]
+        if items is not None:
+            values = values[..., [ITEM_INDEX[item] for item in items]]
+        return values, self.mask[properties, months]
+
+    def rollup(self, by: str = 'property', items: List[str] = None, start=None, end=None,
+               how: str = 'sum') -> pd.DataFrame:
+        """Aggregate over every axis except `by` ('property', 'month' or 'line_item')"""
+        items = items or LINE_ITEMS
+        values, mask = self.slice(start=start, end=end, items=items)
+        masked = np.where(mask[..., None], values, np.nan)
+
+        keep = ROLLUP_AXES[by]
+        axes = tuple(axis for axis in range(3) if axis != keep)
+        if how == 'mean':
+            counts = np.sum(~np.isnan(masked), axis=axes)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                result = np.where(counts > 0, np.nansum(masked, axis=axes) / counts, np.nan)
+        elif how == 'count':
+            result = np.sum(~np.isnan(masked), axis=axes)
+        else:
+            result = np.nansum(masked, axis=axes)
+
+        if by == 'property':
+            return pd.DataFrame(result, index=pd.Index(self.property_ids, name='PropertyID'), columns=items)
+        if by == 'month':
+            months = self.months()[self._month_slice(start, end)]
+            return pd.DataFrame(result, index=pd.Index(months, name='ReportingMonth'), columns=items)
+        return pd.DataFrame({'Value': result}, index=pd.Index(items, name='LineItem'))
+
+    # Incremental updates
+    def update(self, property_id: int, reporting_month, data: Dict, financial_id: int = None):
+        """Write one property-month row, with the derived ratios it was stored with, after a database write"""
+        p = self._ensure_property(int(property_id))
+        m = self._ensure_month(month_ordinal(reporting_month))
+        # NULL line items are NaN, as when the cube is loaded
+        self.values[p, m, :] = [np.nan if pd.isna(data.get(item)) else float(data[item]) for item in LINE_ITEMS]
+        if not all(column in data for column in DERIVED_COLUMNS):
+            data = derive_metrics(pd.DataFrame([dict(data, PropertyID=int(property_id))]),
+                                  self._unit_count_map()).iloc[0]
+        self.metrics[p, m, :] = np.array([data[column] for column in DERIVED_COLUMNS], dtype=float)
+        self.mask[p, m] = True
+        if financial_id is not None:
+            self.financial_ids[p, m] = int(financial_id)
+
+    def remove(self, financial_id: int) -> Optional[Tuple[int, pd.Timestamp]]:
+        """Clear the cell holding a deleted FinancialID; returns its (PropertyID, month), or None if absent"""
+        positions = np.argwhere(self.financial_ids == int(financial_id))
+        if len(positions) == 0:
+            return None
+        p, m = positions[0]
+        self.values[p, m, :] = 0
+        self.metrics[p, m, :] = np.nan
+        self.mask[p, m] = False
+        self.financial_ids[p, m] = 0
+        return int(self.property_ids[p]), ordinal_to_timestamp(self.start_ordinal + int(m))
+
+    # Dashboard views
+    def _window_arrays(self, start=None, end=None):
+        """Masked values (NaN outside valid rows) and mask for a month window"""
+        months = self._month_slice(start, end)
+        mask = self.mask[:, months]
+        return np.where(mask[..., None], self.values[:, months, :], np.nan), mask, months
+
+    def _window_metric(self, name: str, start=None, end=None) -> np.ndarray:
+        """One stored ratio over a month window, NaN outside valid rows"""
+        months = self._month_slice(start, end)
+        return np.where(self.mask[:, months], self.metrics[:, months, METRIC_INDEX[name]], np.nan)
+
+    @staticmethod
+    def _mean(values: np.ndarray, axis=None, empty: float = 0.0):
+        """NaN-skipping mean, `empty` where nothing was stored (like ISNULL(AVG(...), 0))"""
+        counts = np.sum(~np.isnan(values), axis=axis)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(counts > 0, np.nansum(values, axis=axis) / counts, empty)
+
+    @staticmethod
+    def _margin(noi, revenue):
+        """NOI margin of summed totals, NaN without positive revenue"""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(revenue > 0, noi / revenue * 100, np.nan)
+
+    def monthly_series(self) -> pd.DataFrame:
+        """Portfolio monthly aggregates shaped like get_monthly_series"""
+        masked, mask, _ = self._window_arrays()
+        present = mask.any(axis=0)
+        totals = np.nansum(masked, axis=0)
+        vacancy = self._window_metric('VacancyPct')
+
+        df = pd.DataFrame({
+            'ReportingMonth': pd.to_datetime(self.months()),
+            'Revenue': totals[:, ITEM_INDEX['TotalIncome']],
+            'Expenses': totals[:, ITEM_INDEX['TotalExpenses']],
+            'NOI': totals[:, ITEM_INDEX['NOI']],
+            'CashFlow': totals[:, ITEM_INDEX['CashFlow']],
+            'VacancySum': np.nansum(vacancy, axis=0),
+            'VacancyCount': np.sum(~np.isnan(vacancy), axis=0),
+            'PropertyCount': mask.sum(axis=0)
+        })
+        return df[present].reset_index(drop=True)
+
+    def monthly_performance(self, start=None, end=None) -> pd.DataFrame:
+        """Monthly portfolio performance shaped like get_monthly_performance"""
+        masked, mask, months = self._window_arrays(start, end)
+        present = mask.any(axis=0)
+        totals = np.nansum(masked, axis=0)
+        revenue, noi = totals[:, ITEM_INDEX['TotalIncome']], totals[:, ITEM_INDEX['NOI']]
+
+        df = pd.DataFrame({
+            'ReportingMonth': pd.to_datetime(self.months()[months]),
+            'Revenue': revenue,
+            'Expenses': totals[:, ITEM_INDEX['TotalExpenses']],
+            'NOI': noi,
+            'CashFlow': totals[:, ITEM_INDEX['CashFlow']],
+            'Vacancy': self._mean(self._window_metric('VacancyPct', start, end), axis=0),
+            'NOI_Margin': self._margin(noi, revenue)
+        })
+        return df[present].reset_index(drop=True)
+
+    def portfolio_value(self) -> float:
+        return float(np.nansum(self.purchase_prices))
+
+    def _window_totals(self, start, end) -> Dict:
+        masked, mask, _ = self._window_arrays(start, end)
+        totals = np.nansum(masked, axis=(0, 1))
+        return {
+            'revenue': float(totals[ITEM_INDEX['TotalIncome']]),
+            'expenses': float(totals[ITEM_INDEX['TotalExpenses']]),
+            'noi': float(totals[ITEM_INDEX['NOI']]),
+            'vacancy': float(self._mean(self._window_metric('VacancyPct', start, end))),
+            'property_count': int(mask.any(axis=1).sum())
+        }
+
+    def last_reported(self, start, end) -> Optional[pd.Timestamp]:
+        """Latest month in [start, end] with any property reporting, or None"""
+        months = self._month_slice(start, end)
+        positions = np.flatnonzero(self.mask[:, months].any(axis=0))
+        if len(positions) == 0:
+            return None
+        return ordinal_to_timestamp(self.start_ordinal + months.start + int(positions[-1]))
+
+    def kpis(self, start, end) -> Dict:
+        """Portfolio KPIs for a window, compared with the same window a year earlier"""
+        current = self._window_totals(start, end)
+        # Compare like for like: a partly reported window is matched with the same months a year earlier
+        reported_end = self.last_reported(start, end) or pd.Timestamp(end)
+        previous = self._window_totals(pd.Timestamp(start) - pd.DateOffset(years=1),
+                                       reported_end - pd.DateOffset(years=1))
+
+        current_noi, prev_noi = current['noi'], previous['noi']
+        current_revenue, prev_revenue = current['revenue'], previous['revenue']
+        noi_variance = ((current_noi - prev_noi) / prev_noi * 100) if prev_noi != 0 else 0
+        revenue_variance = ((current_revenue - prev_revenue) / prev_revenue * 100) if prev_revenue != 0 else 0
+
+        return {
+            'total_portfolio_value': self.portfolio_value(),
+            'total_revenue': current_revenue,
+            'total_expenses': current['expenses'],
+            'total_noi': current_noi,
+            'avg_vacancy': current['vacancy'],
+            'property_count': current['property_count'],
+            'noi_variance': noi_variance,
+            'revenue_variance': revenue_variance,
+            'prev_noi': prev_noi,
+            'prev_revenue': prev_revenue
+        }
+
+    def property_details(self, start, end) -> pd.DataFrame:
+        """Per-property window totals shaped like get_property_details"""
+        masked, mask, _ = self._window_arrays(start, end)
+        totals = np.nansum(masked, axis=1)
+        revenue, noi = totals[:, ITEM_INDEX['TotalIncome']], totals[:, ITEM_INDEX['NOI']]
+
+        df = pd.DataFrame({
+            'PropertyID': self.property_ids,
+            'PropertyName': self.property_names,
+            'PurchasePrice': self.purchase_prices,
+            # A property without a UnitCount shows 0 units rather than casting NaN to int
+            'TotalUnits': np.nan_to_num(self.unit_counts).astype(np.int64),
+            'TotalRevenue': revenue,
+            'TotalExpenses': totals[:, ITEM_INDEX['TotalExpenses']],
+            'TotalNOI': noi,
+            'AvgVacancy': self._mean(self._window_metric('VacancyPct', start, end), axis=1),
+            'AvgOccupancy': self._mean(self._window_metric('OccupancyPct', start, end), axis=1, empty=np.nan),
+            'NOIMargin': self._margin(noi, revenue),
+            'RevenuePerUnit': self._mean(self._window_metric('RevenuePerUnit', start, end), axis=1, empty=np.nan),
+            'NOIPerUnit': self._mean(self._window_metric('NOIPerUnit', start, end), axis=1, empty=np.nan),
+            'MonthsReported': mask.sum(axis=1)
+        })
+        return df.sort_values('PropertyName', kind='stable').reset_index(drop=True)
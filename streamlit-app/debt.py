@@ -0,0 +1,230 @@
+from typing import Dict, Union
+
+import numpy as np
+import pandas as pd
+
+from cube import FinancialCube, ITEM_INDEX
+from timeseries import month_ordinal, ordinal_to_timestamp
+
+RATE_TYPES = ('Fixed', 'Floating')
+
+# Index for floating loans when no forward curve is given (annual, decimal)
+DEFAULT_INDEX_RATE = 0.043
+
+# dbo.Loans columns, in query order
+LOAN_COLUMNS = ['LoanID', 'PropertyID', 'LoanName', 'OriginalBalance', 'OriginationDate', 'TermMonths',
+                'AmortizationMonths', 'InterestOnlyMonths', 'RateType', 'InterestRate', 'Spread',
+                'RateFloor', 'RateCap']
+
+
+def loan_rates(loans: pd.DataFrame, ordinals: np.ndarray, index_rates: Union[float, pd.Series]) -> np.ndarray:
+    """Annual note rate per loan x month [loan, month].
+
+    Fixed loans carry InterestRate throughout. Floating loans pay index + Spread, bounded
+    below by RateFloor and above by RateCap (the cap of a purchased rate cap, or the loan's
+    own lifetime cap). `index_rates` is a flat rate or a forward curve indexed by month;
+    months past the end of the curve hold its last rate.
+    """
+    if isinstance(index_rates, pd.Series):
+        curve = pd.Series(index_rates.to_numpy(dtype=float),
+                          index=[month_ordinal(month) for month in index_rates.index]).sort_index()
+        index = curve.reindex(ordinals, method='ffill').bfill().to_numpy()
+    else:
+        index = np.full(len(ordinals), float(index_rates))
+
+    floating = (loans['RateType'] == 'Floating').to_numpy()[:, None]
+    fixed = loans['InterestRate'].to_numpy(dtype=float)[:, None]
+    spread = np.nan_to_num(loans['Spread'].to_numpy(dtype=float))[:, None]
+    floor = np.nan_to_num(loans['RateFloor'].to_numpy(dtype=float), nan=-np.inf)[:, None]
+    cap = np.nan_to_num(loans['RateCap'].to_numpy(dtype=float), nan=np.inf)[:, None]
+    return np.where(floating, np.clip(index[None, :] + spread, floor, cap), np.nan_to_num(fixed))
+
+
+def amortization_schedules(principal: np.ndarray, rates: np.ndarray, first_payment: np.ndarray,
+                           term: np.ndarray, amortization: np.ndarray,
+                           interest_only: np.ndarray) -> Dict[str, np.ndarray]:
+    """Monthly schedules for every loan at once; each array is [loan, month].
+
+    Month t is payment number t - first_payment (0-based) for each loan. Interest-only months
+    pay interest alone; after them the balance amortizes over what is left of the amortization
+    term, re-sized each month so floating loans follow their rate. Loans with no amortization
+    are interest-only to maturity. Whatever is left at the last payment is the balloon.
+    'active' is 1 in the months from the first payment to maturity and 0 elsewhere.
+    """
+    loans, months = rates.shape
+    monthly = rates / 12
+    balance = np.asarray(principal, dtype=float).copy()
+    out = {name: np.zeros((loans, months)) for name in ('rate', 'interest', 'principal', 'balloon', 'balance', 'active')}
+
+    for t in range(months):
+        k = t - first_payment
+        active = (k >= 0) & (k < term) & (balance > 0)
+        r = monthly[:, t]
+        interest = np.where(active, balance * r, 0.0)
+
+        remaining = amortization - (k - interest_only)
+        amortizing = active & (amortization > 0) & (k >= interest_only) & (remaining > 0)
+        with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+            level = np.where(r > 0, balance * r / (1 - (1 + r) ** -np.maximum(remaining, 1)),
+                             balance / np.maximum(remaining, 1))
+        principal_paid = np.where(amortizing, np.minimum(level - interest, balance), 0.0)
+        balance = balance - principal_paid
+
+        balloon = np.where(active & (k == term - 1), balance, 0.0)
+        balance = balance - balloon
+
+        out['rate'][:, t] = np.where(active, rates[:, t], np.nan)
+        out['interest'][:, t] = interest
+        out['principal'][:, t] = principal_paid
+        out['balloon'][:, t] = balloon
+        # Outstanding from the origination month (k == -1) until repaid
+        out['balance'][:, t] = np.where(k >= 0, balance, np.where(k == -1, principal, 0.0))
+        out['active'][:, t] = (k >= 0) & (k < term)
+    out['debt_service'] = out['interest'] + out['principal']
+    return out
+
+
+class DebtEngine:
+    """Loan schedules from dbo.Loans, rolled up to the cube's property x month grid.
+
+    Properties with loans get modeled debt service in the months one of their loans is paying;
+    other months and properties keep the DebtService typed into MonthlyFinancials, so partially
+    modeled portfolios (and history before an origination or after a payoff) still add up. Cash flow, DSCR and debt
+    yield are derived from the cube's NOI and that debt service.
+    """
+
+    def __init__(self, loans: pd.DataFrame, cube: FinancialCube,
+                 index_rates: Union[float, pd.Series] = DEFAULT_INDEX_RATE):
+        self.cube = cube
+        self.loans = loans.reset_index(drop=True) if loans is not None else pd.DataFrame(columns=LOAN_COLUMNS)
+        self.schedules: Dict[str, np.ndarray] = {}
+        self.start_ordinal = 0
+        if self.loans.empty:
+            return
+
+        originated = np.array([month_ordinal(date) for date in self.loans['OriginationDate']])
+        term = self.loans['TermMonths'].to_numpy(dtype=np.int64)
+        self.start_ordinal = int(originated.min()) + 1
+        ordinals = np.arange(self.start_ordinal, int((originated + term).max()) + 1)
+        self.schedules = amortization_schedules(
+            self.loans['OriginalBalance'].to_numpy(dtype=float),
+            loan_rates(self.loans, ordinals, index_rates),
+            originated + 1 - self.start_ordinal,
+            term,
+            np.nan_to_num(self.loans['AmortizationMonths'].to_numpy(dtype=float)).astype(np.int64),
+            np.nan_to_num(self.loans['InterestOnlyMonths'].to_numpy(dtype=float)).astype(np.int64)
+        )
+        self.maturities = [ordinal_to_timestamp(ordinal) for ordinal in originated + term]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(array.nbytes for array in self.schedules.values()) + int(self.loans.memory_usage(deep=True).sum())
+
+    def _on_cube_grid(self, name: str, months: slice) -> np.ndarray:
+        """A schedule summed per property onto the cube's [property, month] window"""
+        ordinals = self.cube.start_ordinal + np.arange(self.cube.month_count)[months]
+        result = np.zeros((len(self.cube.property_ids), len(ordinals)))
+        if not self.schedules:
+            return result
+        rows = self.loans['PropertyID'].map(self.cube.property_index).to_numpy(dtype=float)
+        known = ~np.isnan(rows)
+        columns = ordinals - self.start_ordinal
+        inside = (columns >= 0) & (columns < self.schedules[name].shape[1])
+        values = np.zeros((len(self.loans), len(ordinals)))
+        values[:, inside] = self.schedules[name][:, columns[inside]]
+        np.add.at(result, rows[known].astype(np.int64), values[known])
+        return result
+
+    @property
+    def modeled(self) -> np.ndarray:
+        """Properties whose debt service comes from loan schedules [property]"""
+        return np.isin(self.cube.property_ids, self.loans['PropertyID'].to_numpy())
+
+    def monthly(self, start=None, end=None) -> Dict[str, np.ndarray]:
+        """NOI, debt service, cash flow and ending loan balance per property and month in a window"""
+        months = self.cube._month_slice(start, end)
+        mask = self.cube.mask[:, months]
+        values = np.where(mask[..., None], np.nan_to_num(self.cube.values[:, months, :]), 0.0)
+        typed = values[..., ITEM_INDEX['DebtService']]
+        modeled = self._on_cube_grid('active', months) > 0
+        debt_service = np.where(modeled, self._on_cube_grid('debt_service', months), typed)
+        noi = values[..., ITEM_INDEX['NOI']]
+        return {
+            'mask': mask,
+            'noi': noi,
+            'debt_service': debt_service,
+            'interest': self._on_cube_grid('interest', months),
+            # Balance each month's interest accrued on: before that month's principal and balloon
+            'opening_balance': sum(self._on_cube_grid(name, months) for name in ('balance', 'principal', 'balloon')),
+            'cash_flow': noi - debt_service,
+            'balance': self._on_cube_grid('balance', months)
+        }
+
+    def property_metrics(self, start, end) -> pd.DataFrame:
+        """Per-property debt service, cash flow, DSCR and debt yield for a window"""
+        monthly = self.monthly(start, end)
+        reported = monthly['mask'].sum(axis=1)
+        noi = monthly['noi'].sum(axis=1)
+        debt_service = monthly['debt_service'].sum(axis=1)
+        balance = monthly['balance'][:, -1] if monthly['balance'].shape[1] else np.zeros(len(noi))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            dscr = np.where(debt_service > 0, noi / debt_service, np.nan)
+            annual_noi = np.where(reported > 0, noi * 12 / reported, np.nan)
+            debt_yield = np.where(balance > 0, annual_noi / balance * 100, np.nan)
+
+        loan_counts = self.loans.groupby('PropertyID').size() if not self.loans.empty else pd.Series(dtype=int)
+        next_maturity = (pd.Series(self.maturities, index=self.loans['PropertyID']).groupby(level=0).min()
+                         if not self.loans.empty else pd.Series(dtype='datetime64[ns]'))
+        ids = pd.Series(self.cube.property_ids)
+        return pd.DataFrame({
+            'PropertyID': self.cube.property_ids,
+            'Loans': ids.map(loan_counts).fillna(0).astype(np.int64).to_numpy(),
+            'LoanBalance': balance,
+            'DebtService': debt_service,
+            'CashFlow': noi - debt_service,
+            'DSCR': dscr,
+            'DebtYield': debt_yield,
+            'NextMaturity': ids.map(next_maturity).to_numpy(),
+            'DebtModeled': self.modeled
+        })
+
+    def kpis(self, start, end) -> Dict:
+        """Portfolio debt service, DSCR, debt yield, balance and weighted note rate for a window"""
+        monthly = self.monthly(start, end)
+        noi = float(monthly['noi'].sum())
+        debt_service = float(monthly['debt_service'].sum())
+        ending = monthly['balance'][:, -1] if monthly['balance'].shape[1] else np.zeros(len(monthly['noi']))
+        balance = float(ending.sum())
+        interest = float(monthly['interest'][:, -1].sum()) if monthly['interest'].shape[1] else 0.0
+        opening = float(monthly['opening_balance'][:, -1].sum()) if monthly['opening_balance'].shape[1] else 0.0
+        # Debt yield pairs the balance with the NOI of the same properties: those with a modeled balance
+        levered = self.modeled & (ending > 0)
+        levered_noi = float(monthly['noi'][levered].sum())
+        months = int(monthly['mask'][levered].any(axis=0).sum())
+        return {
+            'debt_service': debt_service,
+            'cash_flow': noi - debt_service,
+            'dscr': noi / debt_service if debt_service > 0 else None,
+            'debt_yield': levered_noi * 12 / months / balance * 100 if balance > 0 and months else None,
+            'loan_balance': balance,
+            # Last month's interest over the balance it accrued on, annualized
+            'weighted_rate': interest * 12 / opening * 100 if opening > 0 else None
+        }
+
+    def schedule(self, loan_id: int) -> pd.DataFrame:
+        """Month-by-month schedule of one loan from first payment to maturity"""
+        position = np.flatnonzero(self.loans['LoanID'].to_numpy() == int(loan_id))
+        if len(position) == 0 or not self.schedules:
+            return pd.DataFrame()
+        row = position[0]
+        active = ~np.isnan(self.schedules['rate'][row])
+        ordinals = self.start_ordinal + np.flatnonzero(active)
+        return pd.DataFrame({
+            'PaymentMonth': [ordinal_to_timestamp(ordinal) for ordinal in ordinals],
+            'Rate': self.schedules['rate'][row, active] * 100,
+            'Interest': self.schedules['interest'][row, active],
+            'Principal': self.schedules['principal'][row, active],
+            'DebtService': self.schedules['debt_service'][row, active],
+            'Balloon': self.schedules['balloon'][row, active],
+            'EndingBalance': self.schedules['balance'][row, active]
+        })
@@ -0,0 +1,125 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Dollar difference below which a stored total still reconciles with its line items
+DEFAULT_TOLERANCE = 1.0
+
+EXPENSE_COLUMNS = ['RepairsMaintenance', 'Utilities', 'PropertyManagement', 'PropertyTaxes', 'Insurance',
+                   'Marketing', 'Administrative']
+
+# Stored values with NULLs as zero (n), whether Vacancy holds a percent (p), and what each total
+# should be once that is corrected (e). Shared by the quality scan, its fixes and the derived
+# ratios so all three agree.
+RECONCILE = f"""
+CROSS APPLY (SELECT ISNULL(mf.GrossRent, 0) AS GrossRent, ISNULL(mf.Vacancy, 0) AS Vacancy,
+                    ISNULL(mf.OtherIncome, 0) AS OtherIncome, ISNULL(mf.TotalIncome, 0) AS TotalIncome,
+                    ISNULL(mf.TotalExpenses, 0) AS TotalExpenses, ISNULL(mf.NOI, 0) AS NOI,
+                    ISNULL(mf.DebtService, 0) AS DebtService, ISNULL(mf.CashFlow, 0) AS CashFlow,
+                    mf.Occupancy,
+                    {' + '.join(f'ISNULL(mf.{column}, 0)' for column in EXPENSE_COLUMNS)} AS LineExpenses) n
+CROSS APPLY (SELECT CASE WHEN n.Vacancy > 0 AND n.Vacancy <= 100 AND n.GrossRent > 100 * n.Vacancy
+                          AND (ABS(n.TotalIncome - (n.GrossRent * (1 - n.Vacancy / 100) + n.OtherIncome)) <= @Tolerance
+                               OR (n.Occupancy > 1 AND n.Occupancy <= 100
+                                   AND ABS(n.Vacancy - (100 - n.Occupancy)) <= 0.5))
+                     THEN 1 ELSE 0 END AS VacancyIsPercent) p
+CROSS APPLY (SELECT CASE WHEN p.VacancyIsPercent = 1 THEN ROUND(n.GrossRent * n.Vacancy / 100, 2)
+                         ELSE n.Vacancy END AS Vacancy) v
+CROSS APPLY (SELECT n.GrossRent - v.Vacancy + n.OtherIncome AS TotalIncome,
+                    n.LineExpenses AS TotalExpenses,
+                    n.GrossRent - v.Vacancy + n.OtherIncome - n.LineExpenses AS NOI,
+                    n.GrossRent - v.Vacancy + n.OtherIncome - n.LineExpenses - n.DebtService AS CashFlow) e
+"""
+
+# Ratios stored next to each MonthlyFinancials row, computed once when the row is written.
+# Percentages run 0-100. VacancyPct is economic vacancy (the loss over GrossRent), read as-is
+# when Vacancy was entered as a percent. Margins are NULL unless TotalIncome is positive and
+# per-unit figures are NULL unless the property has a UnitCount.
+DERIVED_COLUMNS = ['VacancyPct', 'OccupancyPct', 'NOIMargin', 'ExpenseRatio', 'RevenuePerUnit', 'NOIPerUnit']
+PER_UNIT_COLUMNS = ['RevenuePerUnit', 'NOIPerUnit']
+DERIVED_DECIMALS = 4
+
+
+def _clip_percent(expression: str) -> str:
+    return f"CASE WHEN {expression} < 0 THEN 0 WHEN {expression} > 100 THEN 100 ELSE {expression} END"
+
+
+# The same definitions in T-SQL over RECONCILE's aliases plus the property (pr), so
+# backfilled, fixed and imported rows agree
+DERIVED_SQL: Dict[str, str] = {
+    'VacancyPct': _clip_percent("CASE WHEN p.VacancyIsPercent = 1 THEN CAST(n.Vacancy AS FLOAT) "
+                                "WHEN n.GrossRent > 0 THEN CAST(n.Vacancy AS FLOAT) / n.GrossRent * 100 END"),
+    'OccupancyPct': _clip_percent("CASE WHEN n.Occupancy > 0 AND n.Occupancy <= 1 THEN CAST(n.Occupancy AS FLOAT) * 100 "
+                                  "ELSE CAST(n.Occupancy AS FLOAT) END"),
+    'NOIMargin': "CASE WHEN n.TotalIncome > 0 THEN CAST(n.NOI AS FLOAT) / n.TotalIncome * 100 END",
+    'ExpenseRatio': "CASE WHEN n.TotalIncome > 0 THEN CAST(n.TotalExpenses AS FLOAT) / n.TotalIncome * 100 END",
+    'RevenuePerUnit': "CASE WHEN pr.UnitCount > 0 THEN CAST(n.TotalIncome AS FLOAT) / pr.UnitCount END",
+    'NOIPerUnit': "CASE WHEN pr.UnitCount > 0 THEN CAST(n.NOI AS FLOAT) / pr.UnitCount END",
+}
+
+REFRESH_STATEMENT = """
+UPDATE mf SET {assignments}
+FROM dbo.MonthlyFinancials mf
+LEFT JOIN dbo.Properties pr ON pr.PropertyID = mf.PropertyID
+{reconcile}
+WHERE {scope};
+"""
+
+
+def refresh_statement(scope: str = '1 = 1', columns: List[str] = None) -> str:
+    """Set-based recompute of the derived columns for rows matching `scope`; expects @Tolerance declared"""
+    assignments = ', '.join(f"{column} = ROUND({DERIVED_SQL[column]}, {DERIVED_DECIMALS})"
+                            for column in columns or DERIVED_COLUMNS)
+    return REFRESH_STATEMENT.format(assignments=assignments, reconcile=RECONCILE, scope=scope)
+
+
+def derive_metrics(frame: pd.DataFrame, unit_counts: Dict[int, float]) -> pd.DataFrame:
+    """Derived columns for MonthlyFinancials rows (PropertyID plus line items), aligned to the frame's index"""
+    def column(name: str, fill=0.0) -> np.ndarray:
+        if name not in frame.columns:
+            return np.full(len(frame), fill)
+        values = pd.to_numeric(frame[name], errors='coerce').to_numpy(dtype=float)
+        return values if fill is None else np.nan_to_num(values, nan=fill)
+
+    gross_rent, vacancy, other_income = column('GrossRent'), column('Vacancy'), column('OtherIncome')
+    income, expenses, noi = column('TotalIncome'), column('TotalExpenses'), column('NOI')
+    occupancy = column('Occupancy', fill=np.nan)
+    units = frame['PropertyID'].map(lambda pid: unit_counts.get(int(pid))).to_numpy(dtype=float)
+
+    # Mirrors RECONCILE's VacancyIsPercent: a small Vacancy that only reconciles as a percent
+    with np.errstate(invalid='ignore', divide='ignore'):
+        vacancy_is_percent = ((vacancy > 0) & (vacancy <= 100) & (gross_rent > 100 * vacancy)
+                             & ((np.abs(income - (gross_rent * (1 - vacancy / 100) + other_income)) <= DEFAULT_TOLERANCE)
+                                | ((occupancy > 1) & (occupancy <= 100) & (np.abs(vacancy - (100 - occupancy)) <= 0.5))))
+        vacancy_pct = np.where(vacancy_is_percent, vacancy,
+                               np.where(gross_rent > 0, vacancy / gross_rent * 100, np.nan))
+        occupancy_pct = np.where((occupancy > 0) & (occupancy <= 1), occupancy * 100, occupancy)
+        units = np.where(units > 0, units, np.nan)
+        derived = pd.DataFrame({
+            'VacancyPct': np.clip(vacancy_pct, 0, 100),
+            'OccupancyPct': np.clip(occupancy_pct, 0, 100),
+            'NOIMargin': np.where(income > 0, noi / income * 100, np.nan),
+            'ExpenseRatio': np.where(income > 0, expenses / income * 100, np.nan),
+            'RevenuePerUnit': income / units,
+            'NOIPerUnit': noi / units
+        }, index=frame.index)
+    return derived.round(DERIVED_DECIMALS)
+
+
+def with_derived_metrics(frame: pd.DataFrame, unit_counts: Dict[int, float]) -> pd.DataFrame:
+    """The frame with its derived columns (re)computed"""
+    return frame.drop(columns=DERIVED_COLUMNS, errors='ignore').join(derive_metrics(frame, unit_counts))
+
+
+def derive_row(property_id: int, data: Dict, unit_count: Optional[float]) -> Dict:
+    """Derived columns for a single row, as {column: value or None}"""
+    frame = pd.DataFrame([dict(data, PropertyID=int(property_id))])
+    derived = derive_metrics(frame, {int(property_id): unit_count}).iloc[0]
+    return {column: None if pd.isna(derived[column]) else float(derived[column]) for column in DERIVED_COLUMNS}
+
+
+def sql_values(data: Dict) -> List[Optional[float]]:
+    """Derived column values of a row in DERIVED_COLUMNS order, with NaN as NULL"""
+    return [None if data.get(column) is None or pd.isna(data.get(column)) else float(data.get(column))
+            for column in DERIVED_COLUMNS]
@@ -0,0 +1,201 @@
+import gzip
+import io
+import tempfile
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Union
+
+import pandas as pd
+
+# Optional writers: Parquet needs pyarrow, XLSX needs openpyxl
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+# Format name -> (file extension, MIME type)
+EXPORT_FORMATS = {
+    'CSV': ('csv', 'text/csv'),
+    'CSV (gzip)': ('csv.gz', 'application/gzip'),
+    'Parquet': ('parquet', 'application/vnd.apache.parquet'),
+    'Excel (XLSX)': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+}
+
+DEFAULT_CHUNK_ROWS = 50_000
+EXCEL_MAX_ROWS = 1_048_575  # sheet limit minus the header row
+SPOOL_MAX_BYTES = 16 * 1024 * 1024
+
+ExportSource = Union[pd.DataFrame, Iterable[pd.DataFrame]]
+
+
+def available_formats() -> List[str]:
+    """Export formats whose writer dependencies are installed"""
+    formats = ['CSV', 'CSV (gzip)']
+    if pq is not None:
+        formats.append('Parquet')
+    if openpyxl is not None:
+        formats.append('Excel (XLSX)')
+    return formats
+
+
+def iter_chunks(source: ExportSource, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Iterable[pd.DataFrame]:
+    """Yield a DataFrame in row chunks, or pass an iterator of chunks straight through"""
+    if isinstance(source, pd.DataFrame):
+        # An empty frame still yields once so the header/schema gets written
+        for start in range(0, max(len(source), 1), chunk_rows):
+            yield source.iloc[start:start + chunk_rows]
+    else:
+        yield from source
+
+
+def _write_csv(chunks: Iterable[pd.DataFrame], fileobj, compress: bool) -> int:
+    raw = gzip.GzipFile(fileobj=fileobj, mode='wb') if compress else fileobj
+    text = io.TextIOWrapper(raw, encoding='utf-8', newline='')
+    rows = 0
+    header = True
+    for chunk in chunks:
+        chunk.to_csv(text, index=False, header=header)
+        header = False
+        rows += len(chunk)
+    text.flush()
+    text.detach()
+    if compress:
+        raw.close()
+    return rows
+
+
+def _write_parquet(chunks: Iterable[pd.DataFrame], fileobj, schema=None) -> int:
+    writer = None
+    rows = 0
+    try:
+        for chunk in chunks:
+            # Every chunk is written with one schema: the full frame's if known, else the first chunk's
+            if writer is not None:
+                schema = writer.schema
+            table = pa.Table.from_pandas(chunk, preserve_index=False, schema=schema)
+            if writer is None:
+                writer = pq.ParquetWriter(fileobj, table.schema, compression='snappy')
+            writer.write_table(table)
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def _write_xlsx(chunks: Iterable[pd.DataFrame], fileobj, sheet_name: str) -> int:
+    # Write-only workbooks stream rows instead of holding every cell object in memory
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet(sheet_name[:31])
+    rows = 0
+    header = True
+    for chunk in chunks:
+        if header:
+            sheet.append([str(column) for column in chunk.columns])
+            header = False
+        rows += len(chunk)
+        if rows > EXCEL_MAX_ROWS:
+            raise ValueError(f"Export has more than {EXCEL_MAX_ROWS:,} rows; use CSV or Parquet instead")
+        values = chunk.astype(object).where(chunk.notna(), None)
+        for row in values.itertuples(index=False, name=None):
+            sheet.append(list(row))
+    workbook.save(fileobj)
+    return rows
+
+
+def write_export(source: ExportSource, fmt: str, fileobj, chunk_rows: int = DEFAULT_CHUNK_ROWS,
+                 sheet_name: str = 'Data') -> int:
+    """Stream `source` into `fileobj` in the requested format; returns the row count"""
+    chunks = iter_chunks(source, chunk_rows)
+    if fmt == 'CSV':
+        return _write_csv(chunks, fileobj, compress=False)
+    if fmt == 'CSV (gzip)':
+        return _write_csv(chunks, fileobj, compress=True)
+    if fmt == 'Parquet':
+        if pq is None:
+            raise ImportError("Parquet export requires pyarrow")
+        schema = pa.Schema.from_pandas(source, preserve_index=False) if isinstance(source, pd.DataFrame) else None
+        return _write_parquet(chunks, fileobj, schema)
+    if fmt == 'Excel (XLSX)':
+        if openpyxl is None:
+            raise ImportError("XLSX export requires openpyxl")
+        return _write_xlsx(chunks, fileobj, sheet_name)
+    raise ValueError(f"Unknown export format: {fmt}")
+
+
+class ExportArtifact:
+    """A generated export file and the metadata needed to serve it"""
+
+    def __init__(self, data: bytes, fmt: str, rows: int, build_seconds: float):
+        self.data = data
+        self.fmt = fmt
+        self.rows = rows
+        self.build_seconds = build_seconds
+
+    @property
+    def extension(self) -> str:
+        return EXPORT_FORMATS[self.fmt][0]
+
+    @property
+    def mime(self) -> str:
+        return EXPORT_FORMATS[self.fmt][1]
+
+    @property
+    def size(self) -> int:
+        return len(self.data)
+
+
+def build_artifact(source: ExportSource, fmt: str, chunk_rows: int = DEFAULT_CHUNK_ROWS,
+                   sheet_name: str = 'Data') -> ExportArtifact:
+    """Generate an export through a spooled temp file so large files spill to disk while writing"""
+    started = time.perf_counter()
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES) as spool:
+        rows = write_export(source, fmt, spool, chunk_rows=chunk_rows, sheet_name=sheet_name)
+        spool.seek(0)
+        data = spool.read()
+    return ExportArtifact(data, fmt, rows, time.perf_counter() - started)
+
+
+class ExportCache:
+    """Keep generated artifacts until the data key they were built from changes"""
+
+    def __init__(self, max_entries: int = 16):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, ExportArtifact]" = OrderedDict()
+
+    def get(self, name: str, fmt: str, data_key: Hashable) -> Optional[ExportArtifact]:
+        key = (name, fmt, data_key)
+        artifact = self._entries.get(key)
+        if artifact is not None:
+            self._entries.move_to_end(key)
+        return artifact
+
+    def build(self, name: str, fmt: str, data_key: Hashable, source_fn: Callable[[], ExportSource],
+              **kwargs) -> ExportArtifact:
+        """Generate (or reuse) the artifact; `source_fn` is only called on a cache miss"""
+        artifact = self.get(name, fmt, data_key)
+        if artifact is not None:
+            return artifact
+
+        # Artifacts built from older data for this export are now stale
+        for key in [k for k in self._entries if k[0] == name and k[2] != data_key]:
+            del self._entries[key]
+
+        artifact = build_artifact(source_fn(), fmt, **kwargs)
+        self._entries[(name, fmt, data_key)] = artifact
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return artifact
+
+    def stats(self) -> Dict:
+        return {
+            'entries': len(self._entries),
+            'bytes': sum(artifact.size for artifact in self._entries.values())
+        }
@@ -0,0 +1,246 @@
+"""Monte Carlo projections of NOI, cash flow and DSCR from each property's monthly history.
+
+    python projections.py --properties 2000 --paths 1000 --horizon 24 --workers 4
+
+Run directly it benchmarks the simulation on a synthetic portfolio and prints property-paths
+per second, so different worker counts and shard sizes can be compared.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from cube import FinancialCube, ITEM_INDEX
+
+# Simulated line items; NOI and cash flow are derived, debt service is held at its current level
+SIMULATED_ITEMS = ['TotalIncome', 'TotalExpenses']
+METRICS = ['NOI', 'CashFlow', 'DSCR']
+PERCENTILES = [5, 25, 50, 75, 95]
+
+LOOKBACK_MONTHS = 36
+START_MONTHS = 3
+MIN_OBSERVATIONS = 6
+
+# Normal draws per shard (properties x paths x months x items); bounds worker memory
+SHARD_DRAWS = 4_000_000
+# Below this many draws in total the pool costs more to start than it saves
+POOL_THRESHOLD_DRAWS = 20_000_000
+
+
+def estimate_parameters(cube: FinancialCube, lookback: int = LOOKBACK_MONTHS) -> Dict[str, np.ndarray]:
+    """Monthly log drift and volatility per property and simulated item, plus starting levels.
+
+    Drift and volatility come from month-over-month log changes over the last `lookback`
+    months; properties with fewer than MIN_OBSERVATIONS changes borrow the portfolio median.
+    Starting levels are the average of each property's last START_MONTHS reported months.
+    """
+    months = slice(max(cube.month_count - lookback, 0), cube.month_count)
+    mask = cube.mask[:, months]
+    index = [ITEM_INDEX[item] for item in SIMULATED_ITEMS]
+    values = cube.values[:, months, :][..., index]
+    valid = mask[..., None] & (values > 0)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        logs = np.where(valid, np.log(np.where(valid, values, 1.0)), np.nan)
+        changes = np.diff(logs, axis=1)
+        counts = np.sum(~np.isnan(changes), axis=1)
+        drift = np.nanmean(changes, axis=1)
+        volatility = np.nanstd(changes, axis=1, ddof=1)
+
+        # Income/expense correlation from months where both changed
+        both = ~np.isnan(changes).any(axis=2)
+        centred = np.where(both[..., None], changes - drift[:, None, :], 0.0)
+        covariance = np.sum(centred[..., 0] * centred[..., 1], axis=1) / np.maximum(both.sum(axis=1) - 1, 1)
+        correlation = covariance / (volatility[:, 0] * volatility[:, 1])
+
+    enough = counts >= MIN_OBSERVATIONS
+    for k in range(len(SIMULATED_ITEMS)):
+        fallback = enough[:, k] & np.isfinite(volatility[:, k])
+        drift_fill = np.median(drift[fallback, k]) if fallback.any() else 0.0
+        volatility_fill = np.median(volatility[fallback, k]) if fallback.any() else 0.0
+        drift[~fallback, k] = drift_fill
+        volatility[~fallback, k] = volatility_fill
+    correlation = np.clip(np.nan_to_num(np.where(enough.all(axis=1), correlation, 0.0)), -0.99, 0.99)
+
+    # Average of the last START_MONTHS reported months, counting back from the latest
+    reported = np.cumsum(mask[:, ::-1], axis=1)[:, ::-1]
+    recent = mask & (reported <= START_MONTHS)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        start = np.nansum(np.where(recent[..., None], cube.values[:, months, :], np.nan), axis=1) / recent.sum(axis=1)[:, None]
+    start = np.nan_to_num(start)
+
+    return {
+        'property_ids': np.asarray(cube.property_ids),
+        'drift': drift,
+        'volatility': volatility,
+        'correlation': correlation,
+        'income': start[:, ITEM_INDEX['TotalIncome']],
+        'expenses': start[:, ITEM_INDEX['TotalExpenses']],
+        'debt_service': start[:, ITEM_INDEX['DebtService']]
+    }
+
+
+def simulate_shard(job: Dict) -> Dict:
+    """Simulate every path for one shard of properties; returns per-property bands and path totals.
+
+    Each property draws from its own generator seeded with (seed, PropertyID), so results do
+    not depend on how properties are sharded or how many workers ran them.
+    """
+    paths, horizon, seed = job['paths'], job['horizon'], job['seed']
+    params = job['params']
+    count = len(params['property_ids'])
+
+    shocks = np.empty((count, paths, horizon, 2))
+    for i, property_id in enumerate(params['property_ids']):
+        np.random.default_rng([seed, int(property_id)]).standard_normal((paths, horizon, 2), out=shocks[i])
+
+    # Correlate the expense shock with the income shock
+    rho = params['correlation'][:, None, None]
+    shocks[..., 1] = rho * shocks[..., 0] + np.sqrt(1 - rho ** 2) * shocks[..., 1]
+
+    steps = params['drift'][:, None, None, :] + params['volatility'][:, None, None, :] * shocks
+    growth = np.exp(np.cumsum(steps, axis=2, out=steps))
+    income = params['income'][:, None, None] * growth[..., 0]
+    expenses = params['expenses'][:, None, None] * growth[..., 1]
+    debt_service = params['debt_service'][:, None, None]
+
+    noi = income - expenses
+
+    # Debt service is fixed per property, so cash flow and DSCR are monotone in NOI and their
+    # percentiles follow from the NOI percentiles without sorting the paths again
+    noi_bands = np.moveaxis(np.percentile(noi, PERCENTILES, axis=1), 0, -1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        dscr_bands = np.where(debt_service > 0, noi_bands / debt_service, np.nan)
+    bands = {'NOI': noi_bands, 'CashFlow': noi_bands - debt_service, 'DSCR': dscr_bands}
+    return {
+        'rows': job['rows'],
+        'bands': bands,
+        'totals': {'NOI': noi.sum(axis=0), 'DebtService': np.broadcast_to(debt_service, noi.shape).sum(axis=0)}
+    }
+
+
+def project(cube: FinancialCube, paths: int = 1000, horizon: int = 24, seed: int = 0,
+            workers: Optional[int] = None, lookback: int = LOOKBACK_MONTHS) -> Dict:
+    """Percentile bands per property and for the portfolio over the next `horizon` months.
+
+    Properties are split into shards of at most SHARD_DRAWS normal draws. Large runs fan the
+    shards out across a process pool; the portfolio bands come from summing each path across
+    properties, so they reflect diversification rather than adding up property percentiles.
+    """
+    started = time.perf_counter()
+    params = estimate_parameters(cube, lookback)
+    rows = np.flatnonzero(params['income'] > 0)
+    shard_size = max(1, SHARD_DRAWS // (paths * horizon * 2))
+    jobs = []
+    for lo in range(0, len(rows), shard_size):
+        shard = rows[lo:lo + shard_size]
+        jobs.append({'rows': shard, 'paths': paths, 'horizon': horizon, 'seed': seed,
+                     'params': {name: values[shard] for name, values in params.items()}})
+
+    draws = len(rows) * paths * horizon * 2
+    if workers is None:
+        workers = (os.cpu_count() or 1) if draws >= POOL_THRESHOLD_DRAWS else 1
+    workers = min(workers, max(len(jobs), 1))
+    if workers == 1:
+        results = [simulate_shard(job) for job in jobs]
+    else:
+        # Spawned workers stay safe when the caller is a multithreaded Streamlit process
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            results = list(executor.map(simulate_shard, jobs))
+
+    properties = len(params['property_ids'])
+    bands = {name: np.full((properties, horizon, len(PERCENTILES)), np.nan) for name in METRICS}
+    noi_total = np.zeros((paths, horizon))
+    debt_service_total = np.zeros((paths, horizon))
+    for result in results:
+        for name in METRICS:
+            bands[name][result['rows']] = result['bands'][name]
+        noi_total += result['totals']['NOI']
+        debt_service_total += result['totals']['DebtService']
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        portfolio_dscr = np.where(debt_service_total > 0, noi_total / debt_service_total, np.nan)
+    portfolio = {
+        'NOI': np.percentile(noi_total, PERCENTILES, axis=0).T,
+        'CashFlow': np.percentile(noi_total - debt_service_total, PERCENTILES, axis=0).T,
+        'DSCR': np.nanpercentile(portfolio_dscr, PERCENTILES, axis=0).T if len(rows) else
+        np.full((horizon, len(PERCENTILES)), np.nan)
+    }
+
+    last = cube.months()[-1] if cube.month_count else pd.Timestamp.today().normalize()
+    seconds = time.perf_counter() - started
+    return {
+        'months': pd.date_range(pd.Timestamp(last) + pd.offsets.MonthBegin(1), periods=horizon, freq='MS'),
+        'property_ids': params['property_ids'],
+        'bands': bands,
+        'portfolio': portfolio,
+        'stats': {'properties': len(rows), 'paths': paths, 'horizon': horizon, 'seed': seed,
+                  'workers': workers, 'shards': len(jobs), 'seconds': seconds,
+                  'paths_per_second': len(rows) * paths / seconds if seconds > 0 else 0.0}
+    }
+
+
+def band_frame(projection: Dict, metric: str = 'NOI', property_id: Optional[int] = None) -> pd.DataFrame:
+    """Chart-ready percentile bands: ReportingMonth plus one P<n> column per percentile"""
+    if property_id is None:
+        values = projection['portfolio'][metric]
+    else:
+        row = np.flatnonzero(projection['property_ids'] == property_id)
+        values = projection['bands'][metric][row[0]] if len(row) else np.full(
+            (len(projection['months']), len(PERCENTILES)), np.nan)
+    df = pd.DataFrame(values, columns=[f'P{p}' for p in PERCENTILES])
+    df.insert(0, 'ReportingMonth', projection['months'])
+    return df
+
+
+def history_frame(cube: FinancialCube, metric: str = 'NOI', property_id: Optional[int] = None,
+                  months: int = LOOKBACK_MONTHS) -> pd.DataFrame:
+    """Actual monthly values of a projected metric, for drawing in front of the bands"""
+    window = slice(max(cube.month_count - months, 0), cube.month_count)
+    rows = slice(None) if property_id is None else [cube.property_index[int(property_id)]]
+    mask = cube.mask[rows, window]
+    values = np.where(mask[..., None], np.nan_to_num(cube.values[rows, window, :]), 0.0).sum(axis=0)
+    noi, debt_service = values[:, ITEM_INDEX['NOI']], values[:, ITEM_INDEX['DebtService']]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        series = {'NOI': noi, 'CashFlow': values[:, ITEM_INDEX['CashFlow']],
+                  'DSCR': np.where(debt_service > 0, noi / debt_service, np.nan)}[metric]
+    df = pd.DataFrame({'ReportingMonth': pd.to_datetime(cube.months()[window]), metric: series})
+    return df[mask.any(axis=0)].reset_index(drop=True)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark Monte Carlo projections on a synthetic portfolio")
+    parser.add_argument('--properties', type=int, default=500)
+    parser.add_argument('--months', type=int, default=36, help="Months of synthetic history")
+    parser.add_argument('--paths', type=int, default=1000)
+    parser.add_argument('--horizon', type=int, default=24, help="Months to project")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, os.cpu_count() or 1],
+                        help="Worker counts to compare")
+    args = parser.parse_args(argv)
+
+    from seed import synthetic_properties, synthetic_financials
+
+    rng = np.random.default_rng(args.seed)
+    properties = synthetic_properties(args.properties, rng)
+    properties.insert(0, 'PropertyID', np.arange(1, args.properties + 1))
+    financials = synthetic_financials(properties['PropertyID'].to_numpy(), properties['UnitCount'].to_numpy(),
+                                      args.months, pd.Timestamp.today().normalize().replace(day=1), rng)
+    cube = FinancialCube(financials, properties)
+
+    runs = []
+    for workers in args.workers:
+        result = project(cube, paths=args.paths, horizon=args.horizon, seed=args.seed, workers=workers)
+        runs.append(result['stats'])
+    print(json.dumps({'runs': runs}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
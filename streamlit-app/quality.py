@@ -0,0 +1,256 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from derived import DEFAULT_TOLERANCE, EXPENSE_COLUMNS, RECONCILE, refresh_statement
+
+# Robust z-score (median / MAD) above which a month is an outlier for its property
+DEFAULT_OUTLIER_Z = 6.0
+OUTLIER_MIN_MONTHS = 6
+OUTLIER_ITEMS = ['TotalIncome', 'TotalExpenses', 'NOI']
+
+SEVERITIES = ['critical', 'high', 'medium', 'low']
+
+# Check -> (severity, suggested fix). Every check is one predicate over the whole table.
+CHECKS: Dict[str, Tuple[str, str]] = {
+    'duplicate_month': ('critical', "Delete the older row(s) for this property-month"),
+    'noi_mismatch': ('critical', "Set NOI = TotalIncome - TotalExpenses"),
+    'total_income_mismatch': ('high', "Set TotalIncome = GrossRent - Vacancy + OtherIncome"),
+    'total_expenses_mismatch': ('high', "Set TotalExpenses to the sum of the expense line items"),
+    'vacancy_stored_as_percent': ('high', "Convert Vacancy from a percent to a dollar loss (GrossRent x %)"),
+    'missing_months': ('high', "Import the missing month(s) for this property"),
+    'cash_flow_mismatch': ('medium', "Set CashFlow = NOI - DebtService"),
+    'vacancy_exceeds_gross_rent': ('medium', "Check Vacancy and GrossRent against the source report"),
+    'occupancy_as_fraction': ('medium', "Convert Occupancy from a fraction to a percent"),
+    'occupancy_out_of_range': ('medium', "Check Occupancy against the source report"),
+    'negative_line_item': ('medium', "Check the sign of the line item against the source report"),
+    'outlier': ('low', "Confirm the month against the source report"),
+}
+
+# Corrections applied in this order, so totals are rebuilt from already-corrected line items
+AUTO_FIXES = ['vacancy_stored_as_percent', 'occupancy_as_fraction', 'total_income_mismatch',
+              'total_expenses_mismatch', 'noi_mismatch', 'cash_flow_mismatch']
+
+AMOUNT_COLUMNS = ['GrossRent', 'Vacancy', 'OtherIncome'] + EXPENSE_COLUMNS
+
+# Check -> (field, stored, expected, predicate) over RECONCILE's aliases
+ROW_CHECKS: Dict[str, Tuple[str, str, str, str]] = {
+    'vacancy_stored_as_percent': ('Vacancy', 'n.Vacancy', 'v.Vacancy', 'p.VacancyIsPercent = 1'),
+    'occupancy_as_fraction': ('Occupancy', 'n.Occupancy', 'n.Occupancy * 100',
+                              'n.Occupancy > 0 AND n.Occupancy <= 1'),
+    'total_income_mismatch': ('TotalIncome', 'n.TotalIncome', 'e.TotalIncome',
+                              'ABS(n.TotalIncome - e.TotalIncome) > @Tolerance'),
+    'total_expenses_mismatch': ('TotalExpenses', 'n.TotalExpenses', 'e.TotalExpenses',
+                                'ABS(n.TotalExpenses - e.TotalExpenses) > @Tolerance'),
+    'noi_mismatch': ('NOI', 'n.NOI', 'e.NOI', 'ABS(n.NOI - e.NOI) > @Tolerance'),
+    'cash_flow_mismatch': ('CashFlow', 'n.CashFlow', 'e.CashFlow', 'ABS(n.CashFlow - e.CashFlow) > @Tolerance'),
+    'vacancy_exceeds_gross_rent': ('Vacancy', 'v.Vacancy', 'n.GrossRent', 'v.Vacancy > n.GrossRent'),
+    'occupancy_out_of_range': ('Occupancy', 'n.Occupancy', 'NULL', 'n.Occupancy < 0 OR n.Occupancy > 100'),
+    'negative_line_item': (
+        'CASE ' + ' '.join(f"WHEN mf.{column} < 0 THEN '{column}'" for column in AMOUNT_COLUMNS) + ' END',
+        'CASE ' + ' '.join(f"WHEN mf.{column} < 0 THEN mf.{column}" for column in AMOUNT_COLUMNS) + ' END',
+        'NULL',
+        ' OR '.join(f'mf.{column} < 0' for column in AMOUNT_COLUMNS)
+    ),
+}
+
+ISSUE_COLUMNS = ['FinancialID', 'PropertyID', 'ReportingMonth', 'Check', 'Field', 'Stored', 'Expected']
+
+ROW_CHECKS_QUERY = """
+SET NOCOUNT ON;
+DECLARE @Tolerance FLOAT = ?;
+SELECT mf.FinancialID, mf.PropertyID, mf.ReportingMonth, c.[Check], c.Field,
+       CAST(c.Stored AS FLOAT) AS Stored, CAST(c.Expected AS FLOAT) AS Expected
+FROM dbo.MonthlyFinancials mf
+{reconcile}
+CROSS APPLY (VALUES
+{checks}
+) c([Check], Failed, Field, Stored, Expected)
+WHERE c.Failed = 1
+"""
+
+# One row per gap: the first missing month and how many follow it
+MISSING_MONTHS_QUERY = """
+SET NOCOUNT ON;
+WITH months AS (
+    SELECT PropertyID, DATEFROMPARTS(YEAR(ReportingMonth), MONTH(ReportingMonth), 1) AS Month
+    FROM dbo.MonthlyFinancials
+    GROUP BY PropertyID, DATEFROMPARTS(YEAR(ReportingMonth), MONTH(ReportingMonth), 1)
+), gaps AS (
+    SELECT PropertyID, Month, LAG(Month) OVER (PARTITION BY PropertyID ORDER BY Month) AS PreviousMonth
+    FROM months
+)
+SELECT CAST(NULL AS INT) AS FinancialID, PropertyID, DATEADD(MONTH, 1, PreviousMonth) AS ReportingMonth,
+       'missing_months' AS [Check], 'ReportingMonth' AS Field,
+       CAST(DATEDIFF(MONTH, PreviousMonth, Month) - 1 AS FLOAT) AS Stored, CAST(NULL AS FLOAT) AS Expected
+FROM gaps
+WHERE DATEDIFF(MONTH, PreviousMonth, Month) > 1
+"""
+
+# Every row but the newest for a property-month (the dashboard would count each of them)
+DUPLICATES_QUERY = """
+SET NOCOUNT ON;
+WITH ranked AS (
+    SELECT FinancialID, PropertyID, ReportingMonth,
+           ROW_NUMBER() OVER (PARTITION BY PropertyID, YEAR(ReportingMonth), MONTH(ReportingMonth)
+                              ORDER BY FinancialID DESC) AS Position,
+           COUNT(*) OVER (PARTITION BY PropertyID, YEAR(ReportingMonth), MONTH(ReportingMonth)) AS Copies
+    FROM dbo.MonthlyFinancials
+)
+SELECT FinancialID, PropertyID, ReportingMonth, 'duplicate_month' AS [Check], 'ReportingMonth' AS Field,
+       CAST(Copies AS FLOAT) AS Stored, CAST(NULL AS FLOAT) AS Expected
+FROM ranked
+WHERE Position > 1
+"""
+
+OUTLIERS_QUERY = """
+SET NOCOUNT ON;
+DECLARE @OutlierZ FLOAT = ?, @MinMonths INT = ?;
+WITH items AS (
+    SELECT mf.FinancialID, mf.PropertyID, mf.ReportingMonth, i.Item, CAST(i.Value AS FLOAT) AS Value
+    FROM dbo.MonthlyFinancials mf
+    CROSS APPLY (VALUES {items}) i(Item, Value)
+    WHERE i.Value IS NOT NULL
+), medians AS (
+    SELECT *, PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY Value) OVER (PARTITION BY PropertyID, Item) AS Median,
+           COUNT(*) OVER (PARTITION BY PropertyID, Item) AS Months
+    FROM items
+), deviations AS (
+    SELECT *, PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY ABS(Value - Median))
+                  OVER (PARTITION BY PropertyID, Item) AS Mad
+    FROM medians
+)
+SELECT FinancialID, PropertyID, ReportingMonth, 'outlier' AS [Check], Item AS Field, Value AS Stored,
+       Median AS Expected
+FROM deviations
+WHERE Months >= @MinMonths AND Mad > 0 AND 0.6745 * ABS(Value - Median) / Mad > @OutlierZ
+"""
+
+# Fixes run in AUTO_FIXES order in one transaction; corrected rows lose their RowHash so the
+# next import of their month rewrites them rather than trusting the stale hash
+FIX_STATEMENT = """
+UPDATE mf SET {field} = {expected}, RowHash = NULL
+OUTPUT inserted.FinancialID INTO @Fixed (FinancialID)
+FROM dbo.MonthlyFinancials mf
+{reconcile}
+WHERE {predicate}
+  AND (@PropertyIDs IS NULL OR mf.PropertyID IN (SELECT CAST(value AS INT) FROM STRING_SPLIT(@PropertyIDs, ',')));
+INSERT INTO @Counts VALUES ('{check}', @@ROWCOUNT);
+"""
+
+
+def row_checks_query() -> str:
+    # Field is a column name, or an expression naming the column (negative_line_item)
+    label = lambda field: f"'{field}'" if field.isidentifier() else field
+    checks = ',\n'.join(
+        f"    ('{name}', CASE WHEN {predicate} THEN 1 ELSE 0 END, {label(field)}, {stored}, {expected})"
+        for name, (field, stored, expected, predicate) in ROW_CHECKS.items()
+    )
+    return ROW_CHECKS_QUERY.format(reconcile=RECONCILE, checks=checks)
+
+
+def scan_tasks(tolerance: float = DEFAULT_TOLERANCE, outlier_z: float = DEFAULT_OUTLIER_Z) -> Dict:
+    """Scan queries as {name: fn(conn)}; each is one set-based statement over the whole table"""
+    items = ', '.join(f"('{item}', mf.{item})" for item in OUTLIER_ITEMS)
+    return {
+        'reconciliation': lambda conn: pd.read_sql(row_checks_query(), conn, params=[float(tolerance)]),
+        'missing months': lambda conn: pd.read_sql(MISSING_MONTHS_QUERY, conn),
+        'duplicates': lambda conn: pd.read_sql(DUPLICATES_QUERY, conn),
+        'outliers': lambda conn: pd.read_sql(OUTLIERS_QUERY.format(items=items), conn,
+                                             params=[float(outlier_z), OUTLIER_MIN_MONTHS]),
+    }
+
+
+def scan(conn, tolerance: float = DEFAULT_TOLERANCE, outlier_z: float = DEFAULT_OUTLIER_Z) -> pd.DataFrame:
+    """Run every check on one connection and return the combined issue rows"""
+    frames = [task(conn) for task in scan_tasks(tolerance, outlier_z).values()]
+    return pd.concat(frames, ignore_index=True).reindex(columns=ISSUE_COLUMNS)
+
+
+def fix_list(issues: pd.DataFrame, property_names: Optional[Dict] = None) -> pd.DataFrame:
+    """Issues ordered for fixing: by severity, then check, then dollars at stake, then property and month.
+
+    Missing months rank by how many months are missing; outliers by distance from the median.
+    """
+    if issues.empty:
+        return pd.DataFrame(columns=['Priority', 'Severity', 'Check', 'PropertyID', 'Property', 'ReportingMonth',
+                                     'Field', 'Stored', 'Expected', 'Impact', 'Fix', 'AutoFix', 'FinancialID'])
+    df = issues.copy()
+    df['ReportingMonth'] = pd.to_datetime(df['ReportingMonth'])
+    df['Severity'] = df['Check'].map(lambda check: CHECKS[check][0])
+    df['Fix'] = df['Check'].map(lambda check: CHECKS[check][1])
+    df['AutoFix'] = df['Check'].isin(AUTO_FIXES)
+    df['Impact'] = np.where(df['Check'] == 'missing_months', df['Stored'], (df['Stored'] - df['Expected']).abs())
+    df['Property'] = df['PropertyID'].map(property_names or {}).fillna(df['PropertyID'].astype(str))
+    df['_severity'] = df['Severity'].map({severity: rank for rank, severity in enumerate(SEVERITIES)})
+    df['_check'] = df['Check'].map({check: rank for rank, check in enumerate(CHECKS)})
+    df = df.sort_values(['_severity', '_check', 'Impact', 'Property', 'ReportingMonth'],
+                        ascending=[True, True, False, True, True], na_position='last', kind='stable')
+    df.insert(0, 'Priority', np.arange(1, len(df) + 1))
+    return df[['Priority', 'Severity', 'Check', 'PropertyID', 'Property', 'ReportingMonth', 'Field', 'Stored',
+               'Expected', 'Impact', 'Fix', 'AutoFix', 'FinancialID']].reset_index(drop=True)
+
+
+def summary(issues: pd.DataFrame) -> pd.DataFrame:
+    """Issue counts per check with severity, affected properties and whether it can be auto-fixed"""
+    counts = issues.groupby('Check').agg(Issues=('Check', 'size'), Properties=('PropertyID', 'nunique'))
+    df = pd.DataFrame({'Check': list(CHECKS)}).merge(counts, left_on='Check', right_index=True, how='left')
+    df[['Issues', 'Properties']] = df[['Issues', 'Properties']].fillna(0).astype(np.int64)
+    df['Severity'] = df['Check'].map(lambda check: CHECKS[check][0])
+    df['AutoFix'] = df['Check'].isin(AUTO_FIXES)
+    df['Fix'] = df['Check'].map(lambda check: CHECKS[check][1])
+    return df[['Check', 'Severity', 'Issues', 'Properties', 'AutoFix', 'Fix']]
+
+
+def apply_fixes(conn, checks: Iterable[str], tolerance: float = DEFAULT_TOLERANCE,
+                property_ids: Optional[List[int]] = None) -> Dict:
+    """Correct every row failing the chosen auto-fixable checks in one transaction.
+
+    Totals are rebuilt from their line items, as the T12 ingest does, so a row fixed for one
+    check reconciles on every identity, and its derived ratios are recomputed. Bumps the
+    MonthlyFinancials data version when anything changed. Returns rows fixed per check, the
+    distinct rows touched and the new version.
+    """
+    chosen = [check for check in AUTO_FIXES if check in set(checks)]
+    unknown = set(checks) - set(AUTO_FIXES)
+    if unknown:
+        raise ValueError(f"Checks without an automatic fix: {sorted(unknown)}")
+    if not chosen:
+        return {'fixed': {}, 'rows': 0, 'data_version': None}
+
+    # One delimited parameter scopes every statement, however many properties are chosen
+    scope = ','.join(str(pid) for pid in sorted({int(pid) for pid in property_ids})) if property_ids else None
+    statements = [FIX_STATEMENT.format(field=ROW_CHECKS[check][0], expected=ROW_CHECKS[check][2],
+                                       reconcile=RECONCILE, predicate=f'({ROW_CHECKS[check][3]})', check=check)
+                  for check in chosen]
+    batch = f"""
+    SET NOCOUNT ON;
+    DECLARE @Tolerance FLOAT = ?, @PropertyIDs NVARCHAR(MAX) = ?;
+    DECLARE @Fixed TABLE (FinancialID INT);
+    DECLARE @Counts TABLE ([Check] VARCHAR(40), Fixed INT);
+    {''.join(statements)}
+    {refresh_statement('mf.FinancialID IN (SELECT FinancialID FROM @Fixed)')}
+    DECLARE @Rows INT = (SELECT COUNT(DISTINCT FinancialID) FROM @Fixed);
+    DECLARE @Version BIGINT = NULL;
+    IF @Rows > 0
+    BEGIN
+        UPDATE dbo.DataVersion SET Version = Version + 1, UpdatedAt = SYSUTCDATETIME()
+        WHERE Name = 'MonthlyFinancials';
+        SET @Version = (SELECT Version FROM dbo.DataVersion WHERE Name = 'MonthlyFinancials');
+    END
+    SELECT [Check], Fixed, @Rows AS RowsFixed, @Version AS Version FROM @Counts;
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute(batch, (float(tolerance), scope))
+        results = cursor.fetchall()
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return {
+        'fixed': {row[0]: int(row[1]) for row in results},
+        'rows': int(results[0][2]) if results else 0,
+        'data_version': int(results[0][3]) if results and results[0][3] is not None else None
+    }
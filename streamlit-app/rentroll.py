@@ -0,0 +1,159 @@
+"""Unit-level rent roll analytics over dbo.Units and dbo.Tenants.
+
+The tables are not created by this app on the production database, so the queries assume
+these columns (seed.py creates them this way for local databases):
+
+    dbo.Units   UnitID, PropertyID, UnitNumber, UnitType, Bedrooms, SquareFeet, MarketRent
+    dbo.Tenants TenantID, UnitID, TenantName, LeaseStart, LeaseEnd, MonthlyRent, MoveOutDate
+
+A unit is occupied on a date when a tenant's lease has started and the tenant has not moved
+out; a lease past its LeaseEnd with no move-out is month-to-month. Rents are monthly. Every
+aggregate is one grouped statement over all properties, so results are cached per rent roll
+version and sliced per property in memory.
+"""
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+# Tenants in place on @AsOf, the latest lease per unit
+CURRENT_LEASES = """
+SET NOCOUNT ON;
+DECLARE @AsOf DATE = ?;
+WITH current_leases AS (
+    SELECT t.UnitID, t.MonthlyRent, t.LeaseEnd,
+           ROW_NUMBER() OVER (PARTITION BY t.UnitID ORDER BY t.LeaseStart DESC, t.TenantID DESC) AS LeaseRank
+    FROM dbo.Tenants t
+    WHERE t.LeaseStart <= @AsOf AND (t.MoveOutDate IS NULL OR t.MoveOutDate > @AsOf)
+)
+"""
+
+SUMMARY_QUERY = CURRENT_LEASES + """
+SELECT u.PropertyID,
+       COUNT(*) AS Units,
+       COUNT(c.UnitID) AS OccupiedUnits,
+       SUM(CAST(u.SquareFeet AS BIGINT)) AS SquareFeet,
+       SUM(u.MarketRent) AS MarketRent,
+       SUM(CASE WHEN c.UnitID IS NOT NULL THEN u.MarketRent END) AS OccupiedMarketRent,
+       SUM(c.MonthlyRent) AS InPlaceRent,
+       SUM(CASE WHEN c.LeaseEnd < @AsOf THEN 1 ELSE 0 END) AS MonthToMonth
+FROM dbo.Units u
+LEFT JOIN current_leases c ON c.UnitID = u.UnitID AND c.LeaseRank = 1
+GROUP BY u.PropertyID
+"""
+
+UNIT_MIX_QUERY = CURRENT_LEASES + """
+SELECT u.PropertyID, ISNULL(u.UnitType, 'Unknown') AS UnitType,
+       COUNT(*) AS Units,
+       COUNT(c.UnitID) AS OccupiedUnits,
+       AVG(CAST(u.SquareFeet AS FLOAT)) AS AvgSquareFeet,
+       AVG(u.MarketRent) AS AvgMarketRent,
+       AVG(c.MonthlyRent) AS AvgInPlaceRent,
+       SUM(CASE WHEN c.UnitID IS NOT NULL THEN u.MarketRent END) AS OccupiedMarketRent,
+       SUM(c.MonthlyRent) AS InPlaceRent
+FROM dbo.Units u
+LEFT JOIN current_leases c ON c.UnitID = u.UnitID AND c.LeaseRank = 1
+GROUP BY u.PropertyID, ISNULL(u.UnitType, 'Unknown')
+"""
+
+# MonthsOut -1 is month-to-month (past LeaseEnd); leases beyond the ladder collect in the last bucket
+EXPIRATION_QUERY = CURRENT_LEASES + """
+SELECT u.PropertyID, b.MonthsOut, COUNT(*) AS Leases, SUM(c.MonthlyRent) AS MonthlyRent
+FROM current_leases c
+JOIN dbo.Units u ON u.UnitID = c.UnitID
+CROSS APPLY (SELECT CASE
+    WHEN c.LeaseEnd IS NULL OR c.LeaseEnd < @AsOf THEN -1
+    WHEN DATEDIFF(MONTH, @AsOf, c.LeaseEnd) > {horizon} THEN {horizon} + 1
+    ELSE DATEDIFF(MONTH, @AsOf, c.LeaseEnd) END AS MonthsOut) b
+WHERE c.LeaseRank = 1
+GROUP BY u.PropertyID, b.MonthsOut
+"""
+
+EXPIRATION_HORIZON_MONTHS = 24
+
+
+def rent_metrics(df: pd.DataFrame) -> pd.DataFrame:
+    """Occupancy and loss-to-lease columns from unit/rent sums"""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        df['Occupancy'] = np.where(df['Units'] > 0, df['OccupiedUnits'] / df['Units'] * 100, np.nan)
+        df['LossToLease'] = df['OccupiedMarketRent'].fillna(0) - df['InPlaceRent'].fillna(0)
+        df['LossToLeasePct'] = np.where(df['OccupiedMarketRent'] > 0,
+                                        df['LossToLease'] / df['OccupiedMarketRent'] * 100, np.nan)
+    return df
+
+
+def query_summary(conn, as_of) -> pd.DataFrame:
+    """Per-property units, occupancy, market vs in-place rent and loss-to-lease"""
+    df = pd.read_sql(SUMMARY_QUERY, conn, params=[pd.Timestamp(as_of).date()])
+    df = rent_metrics(df)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        df['AvgMarketRent'] = np.where(df['Units'] > 0, df['MarketRent'] / df['Units'], np.nan)
+        df['AvgInPlaceRent'] = np.where(df['OccupiedUnits'] > 0, df['InPlaceRent'] / df['OccupiedUnits'], np.nan)
+    return df
+
+
+def query_unit_mix(conn, as_of) -> pd.DataFrame:
+    """Per property x unit type: count, occupancy, average size and market vs in-place rent"""
+    return rent_metrics(pd.read_sql(UNIT_MIX_QUERY, conn, params=[pd.Timestamp(as_of).date()]))
+
+
+def query_expirations(conn, as_of, horizon: int = EXPIRATION_HORIZON_MONTHS) -> pd.DataFrame:
+    """Lease expiration ladder: leases and monthly rent expiring per month out, per property"""
+    query = EXPIRATION_QUERY.format(horizon=int(horizon))
+    return pd.read_sql(query, conn, params=[pd.Timestamp(as_of).date()])
+
+
+def expiration_ladder(expirations: pd.DataFrame, as_of, property_id=None,
+                      horizon: int = EXPIRATION_HORIZON_MONTHS) -> pd.DataFrame:
+    """Chart-ready ladder with every bucket present: MTM, each month out, then beyond the horizon"""
+    if property_id is not None:
+        expirations = expirations[expirations['PropertyID'] == property_id]
+    totals = expirations.groupby('MonthsOut')[['Leases', 'MonthlyRent']].sum()
+    buckets = np.arange(-1, horizon + 2)
+    totals = totals.reindex(buckets, fill_value=0)
+
+    start = pd.Timestamp(as_of).to_period('M')
+    labels = ['MTM'] + [(start + int(m)).strftime('%b %Y') for m in buckets[1:-1]] + [f'{horizon}+ mo']
+    share = totals['Leases'] / totals['Leases'].sum() * 100 if totals['Leases'].sum() else totals['Leases'] * 0.0
+    return pd.DataFrame({'Bucket': labels, 'MonthsOut': buckets, 'Leases': totals['Leases'].to_numpy(),
+                         'MonthlyRent': totals['MonthlyRent'].to_numpy(dtype=float),
+                         'PctOfLeases': share.to_numpy(dtype=float)})
+
+
+def portfolio_unit_mix(unit_mix: pd.DataFrame) -> pd.DataFrame:
+    """Unit mix across all properties; NOI per unit averages over the units of properties with NOI"""
+    noi = unit_mix['NOI per Unit'] if 'NOI per Unit' in unit_mix else pd.Series(np.nan, index=unit_mix.index)
+    df = unit_mix.assign(AllocatedNOI=noi * unit_mix['Units'], NOIUnits=unit_mix['Units'].where(noi.notna(), 0),
+                         TotalSquareFeet=unit_mix['AvgSquareFeet'] * unit_mix['Units'],
+                         TotalMarketRent=unit_mix['AvgMarketRent'] * unit_mix['Units'])
+    df = df.groupby('UnitType', as_index=False).agg(
+        Units=('Units', 'sum'), OccupiedUnits=('OccupiedUnits', 'sum'), TotalSquareFeet=('TotalSquareFeet', 'sum'),
+        TotalMarketRent=('TotalMarketRent', 'sum'), OccupiedMarketRent=('OccupiedMarketRent', 'sum'),
+        InPlaceRent=('InPlaceRent', 'sum'), AllocatedNOI=('AllocatedNOI', 'sum'), NOIUnits=('NOIUnits', 'sum'))
+    df = rent_metrics(df)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        df['AvgSquareFeet'] = df['TotalSquareFeet'] / df['Units']
+        df['AvgMarketRent'] = df['TotalMarketRent'] / df['Units']
+        df['AvgInPlaceRent'] = np.where(df['OccupiedUnits'] > 0, df['InPlaceRent'] / df['OccupiedUnits'], np.nan)
+        df['NOI per Unit'] = np.where(df['NOIUnits'] > 0, df['AllocatedNOI'] / df['NOIUnits'], np.nan)
+    return df.drop(columns=['TotalSquareFeet', 'TotalMarketRent', 'AllocatedNOI', 'NOIUnits'])
+
+
+def per_unit_noi(summary: pd.DataFrame, unit_mix: pd.DataFrame, t12_noi: pd.Series) -> Dict[str, pd.DataFrame]:
+    """T12 NOI per unit and per occupied unit; by unit type, NOI is allocated by in-place rent share.
+
+    `t12_noi` maps PropertyID to T12 NOI (e.g. from the rolling engine).
+    """
+    summary = summary.copy()
+    summary['T12 NOI'] = summary['PropertyID'].map(t12_noi)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        summary['NOI per Unit'] = np.where(summary['Units'] > 0, summary['T12 NOI'] / summary['Units'], np.nan)
+        summary['NOI per Occupied Unit'] = np.where(summary['OccupiedUnits'] > 0,
+                                                    summary['T12 NOI'] / summary['OccupiedUnits'], np.nan)
+
+    mix = unit_mix.copy()
+    rent = mix.groupby('PropertyID')['InPlaceRent'].transform('sum')
+    with np.errstate(invalid='ignore', divide='ignore'):
+        allocated = mix['PropertyID'].map(t12_noi) * np.where(rent > 0, mix['InPlaceRent'].fillna(0) / rent, np.nan)
+        mix['NOI per Unit'] = np.where(mix['Units'] > 0, allocated / mix['Units'], np.nan)
+    return {'summary': summary, 'unit_mix': mix}
@@ -0,0 +1,399 @@
+import fnmatch
+import os
+import re
+import time
+from datetime import date
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+# dbo.Units / dbo.Tenants field -> export header patterns (fnmatch, case-insensitive, after
+# collapsing spaces, underscores, dashes and dots). Fields claim headers in this order, each taking
+# the first unused header for its earliest matching pattern, so specific fields come first.
+RENT_ROLL_COLUMNS: Dict[str, List[str]] = {
+    'PropertyID': ['propertyid', 'property id', 'prop id'],
+    'PropertyName': ['property', 'property name', 'propertyname', 'community', 'site'],
+    'UnitNumber': ['unitnumber', 'unit number', 'unit', 'unit #', 'unit no*', 'unit id', 'apt*', 'suite'],
+    'UnitType': ['unittype', 'unit type', 'floorplan', 'floor plan', 'plan', 'type', 'bd/ba'],
+    'Bedrooms': ['bedrooms', 'beds', 'bed*', 'br'],
+    'SquareFeet': ['squarefeet', 'square feet', 'sq*ft*', 'sf', 'size', 'area'],
+    'MarketRent': ['marketrent', 'market rent', 'market*'],
+    'MoveOutDate': ['moveoutdate', 'move*out*', 'vacate*'],
+    'LeaseStart': ['leasestart', 'lease start*', 'lease from', 'lease begin*', 'start date', 'move*in*'],
+    'LeaseEnd': ['leaseend', 'lease end*', 'lease to', 'lease exp*', 'expiration*', 'end date'],
+    'MonthlyRent': ['monthlyrent', 'monthly rent', 'rent', 'lease rent', 'actual rent', 'current rent',
+                    'contract rent', 'charges'],
+    'TenantName': ['tenantname', 'tenant*', 'resident*', 'lessee', 'name'],
+}
+
+UNIT_FIELDS = ['UnitNumber', 'UnitType', 'Bedrooms', 'SquareFeet', 'MarketRent']
+LEASE_FIELDS = ['TenantName', 'LeaseStart', 'LeaseEnd', 'MonthlyRent', 'MoveOutDate']
+STAGE_COLUMNS = ['PropertyID'] + UNIT_FIELDS + LEASE_FIELDS
+
+# Tenant names exports use for units without a lease
+VACANT_PATTERN = re.compile(r'^\s*(vacant|model|down|admin)\b', re.IGNORECASE)
+BEDROOM_PATTERN = re.compile(r'^\s*(\d)\s*(br|bd|bed|x|/|b\b)', re.IGNORECASE)
+STUDIO_PATTERN = re.compile(r'^\s*(studio|eff(iciency)?\b|s\d*$|0\s*(br|bd|x))', re.IGNORECASE)
+
+CHUNK_ROWS = 50_000
+STAGE_BATCH_ROWS = 50_000
+HEADER_SCAN_ROWS = 25
+
+STAGE_TABLE = """
+IF OBJECT_ID('tempdb..#RentRollStage') IS NOT NULL DROP TABLE #RentRollStage;
+CREATE TABLE #RentRollStage (
+    PropertyID INT NOT NULL,
+    UnitNumber NVARCHAR(20) NOT NULL,
+    UnitType NVARCHAR(20) NULL,
+    Bedrooms INT NULL,
+    SquareFeet INT NULL,
+    MarketRent DECIMAL(18,2) NULL,
+    TenantName NVARCHAR(200) NULL,
+    LeaseStart DATE NULL,
+    LeaseEnd DATE NULL,
+    MonthlyRent DECIMAL(18,2) NULL,
+    MoveOutDate DATE NULL,
+    PRIMARY KEY (PropertyID, UnitNumber)
+);
+"""
+
+# One property's diff, applied as set-based statements inside the caller's transaction.
+# Unit attributes missing from the file keep their stored values. Each staged unit's current
+# tenant (latest lease not yet moved out on @AsOf) is matched against the staged lease:
+#   same     - same tenant and LeaseStart; LeaseEnd, rent and move-out are updated if changed
+#   replace  - a newer lease, or the unit is now vacant; the current tenant moves out the day
+#              the new lease starts (or @AsOf) and the new lease is inserted
+#   keep     - the file is older than the stored lease (or vacant before a pre-lease); untouched
+#   none     - no current tenant; the staged lease, if any, is inserted
+# Units absent from the file are left as they are, so partial rent rolls are safe to load.
+APPLY_PROPERTY = """
+SET NOCOUNT ON;
+DECLARE @PropertyID INT = ?, @AsOf DATE = ?;
+DECLARE @UnitActions TABLE (Action NVARCHAR(10));
+DECLARE @MovedOut INT, @LeasesUpdated INT, @LeasesInserted INT;
+
+WITH target AS (SELECT * FROM dbo.Units WHERE PropertyID = @PropertyID)
+MERGE target AS u
+USING (SELECT * FROM #RentRollStage WHERE PropertyID = @PropertyID) AS s
+ON u.UnitNumber = s.UnitNumber
+WHEN MATCHED AND EXISTS (
+    SELECT COALESCE(s.UnitType, u.UnitType), COALESCE(s.Bedrooms, u.Bedrooms),
+           COALESCE(s.SquareFeet, u.SquareFeet), COALESCE(s.MarketRent, u.MarketRent)
+    EXCEPT SELECT u.UnitType, u.Bedrooms, u.SquareFeet, u.MarketRent) THEN
+    UPDATE SET UnitType = COALESCE(s.UnitType, u.UnitType), Bedrooms = COALESCE(s.Bedrooms, u.Bedrooms),
+               SquareFeet = COALESCE(s.SquareFeet, u.SquareFeet), MarketRent = COALESCE(s.MarketRent, u.MarketRent)
+WHEN NOT MATCHED BY TARGET THEN
+    INSERT (PropertyID, UnitNumber, UnitType, Bedrooms, SquareFeet, MarketRent)
+    VALUES (@PropertyID, s.UnitNumber, s.UnitType, s.Bedrooms, s.SquareFeet, s.MarketRent)
+OUTPUT $action INTO @UnitActions;
+
+IF OBJECT_ID('tempdb..#RentRollDiff') IS NOT NULL DROP TABLE #RentRollDiff;
+SELECT u.UnitID, s.TenantName, s.LeaseStart, s.LeaseEnd, s.MonthlyRent, s.MoveOutDate, c.TenantID,
+       CASE WHEN c.TenantID IS NULL THEN 'none'
+            WHEN s.LeaseStart = c.LeaseStart AND ISNULL(s.TenantName, N'') = ISNULL(c.TenantName, N'') THEN 'same'
+            WHEN ISNULL(s.LeaseStart, @AsOf) < c.LeaseStart THEN 'keep'
+            ELSE 'replace' END AS Match
+INTO #RentRollDiff
+FROM #RentRollStage s
+JOIN dbo.Units u ON u.PropertyID = s.PropertyID AND u.UnitNumber = s.UnitNumber
+OUTER APPLY (
+    SELECT TOP 1 t.TenantID, t.TenantName, t.LeaseStart
+    FROM dbo.Tenants t
+    WHERE t.UnitID = u.UnitID AND (t.MoveOutDate IS NULL OR t.MoveOutDate > @AsOf)
+    ORDER BY t.LeaseStart DESC, t.TenantID DESC
+) c
+WHERE s.PropertyID = @PropertyID;
+
+UPDATE t SET MoveOutDate = COALESCE(d.LeaseStart, @AsOf)
+FROM dbo.Tenants t JOIN #RentRollDiff d ON d.TenantID = t.TenantID
+WHERE d.Match = 'replace';
+SET @MovedOut = @@ROWCOUNT;
+
+UPDATE t SET LeaseEnd = COALESCE(d.LeaseEnd, t.LeaseEnd), MonthlyRent = COALESCE(d.MonthlyRent, t.MonthlyRent),
+             MoveOutDate = COALESCE(d.MoveOutDate, t.MoveOutDate)
+FROM dbo.Tenants t JOIN #RentRollDiff d ON d.TenantID = t.TenantID
+WHERE d.Match = 'same' AND EXISTS (
+    SELECT COALESCE(d.LeaseEnd, t.LeaseEnd), COALESCE(d.MonthlyRent, t.MonthlyRent),
+           COALESCE(d.MoveOutDate, t.MoveOutDate)
+    EXCEPT SELECT t.LeaseEnd, t.MonthlyRent, t.MoveOutDate);
+SET @LeasesUpdated = @@ROWCOUNT;
+
+INSERT INTO dbo.Tenants (UnitID, TenantName, LeaseStart, LeaseEnd, MonthlyRent, MoveOutDate)
+SELECT UnitID, TenantName, LeaseStart, LeaseEnd, MonthlyRent, MoveOutDate
+FROM #RentRollDiff
+WHERE LeaseStart IS NOT NULL AND Match IN ('none', 'replace');
+SET @LeasesInserted = @@ROWCOUNT;
+
+DECLARE @UnitsInserted INT = (SELECT COUNT(*) FROM @UnitActions WHERE Action = 'INSERT');
+DECLARE @UnitsUpdated INT = (SELECT COUNT(*) FROM @UnitActions WHERE Action = 'UPDATE');
+IF @UnitsInserted + @UnitsUpdated + @MovedOut + @LeasesUpdated + @LeasesInserted > 0
+    UPDATE dbo.DataVersion SET Version = Version + 1, UpdatedAt = SYSUTCDATETIME() WHERE Name = 'RentRoll';
+
+DECLARE @LeasesKept INT = (SELECT COUNT(*) FROM #RentRollDiff WHERE Match = 'keep');
+DROP TABLE #RentRollDiff;
+SELECT @UnitsInserted AS units_inserted, @UnitsUpdated AS units_updated,
+       @LeasesInserted AS leases_inserted, @LeasesUpdated AS leases_updated, @MovedOut AS move_outs,
+       @LeasesKept AS leases_kept;
+"""
+
+APPLY_COUNTS = ['units_inserted', 'units_updated', 'leases_inserted', 'leases_updated', 'move_outs', 'leases_kept']
+
+
+def _header_key(text) -> str:
+    return re.sub(r'[\s_\-.]+', ' ', str(text).strip().lower())
+
+
+def map_columns(headers: Iterable) -> Dict[str, str]:
+    """Rent roll field -> the export header it is read from"""
+    headers = [header for header in headers if header is not None and str(header).strip()]
+    keys = {header: _header_key(header) for header in headers}
+    mapping, used = {}, set()
+    for field, patterns in RENT_ROLL_COLUMNS.items():
+        # Patterns are in preference order: 'Lease Start' beats 'Move In' wherever the columns sit
+        header = next((header for pattern in patterns for header in headers
+                       if header not in used and fnmatch.fnmatchcase(keys[header], pattern)), None)
+        if header is not None:
+            mapping[field] = header
+            used.add(header)
+    return mapping
+
+
+def _is_excel(source) -> bool:
+    name = source if isinstance(source, str) else getattr(source, 'name', '')
+    return str(name).lower().endswith(('.xlsx', '.xlsm'))
+
+
+def iter_rent_roll_chunks(source, chunk_rows: int = CHUNK_ROWS, sheet: Optional[str] = None
+                          ) -> Iterator[pd.DataFrame]:
+    """Raw rent roll rows in chunks of `chunk_rows`, as text/cell values under the export's headers.
+
+    CSVs stream through pandas' chunked reader. Workbooks stream in openpyxl's read-only mode;
+    title rows above the header (property name, report date) are skipped by looking for the
+    first row whose cells map to a unit column.
+    """
+    if not _is_excel(source):
+        yield from pd.read_csv(source, dtype=str, chunksize=chunk_rows, skipinitialspace=True)
+        return
+
+    if openpyxl is None:
+        raise ImportError("Workbook rent rolls require openpyxl")
+    workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        worksheet = workbook[sheet] if sheet else workbook.worksheets[0]
+        header, rows = None, []
+        for row_number, row in enumerate(worksheet.iter_rows(values_only=True)):
+            if header is None:
+                if 'UnitNumber' in map_columns(row):
+                    header = [str(cell).strip() if cell is not None else f'column_{i}' for i, cell in enumerate(row)]
+                elif row_number >= HEADER_SCAN_ROWS:
+                    raise ValueError(f"No header row with a unit column in the first {HEADER_SCAN_ROWS} rows")
+                continue
+            if any(cell is not None and str(cell).strip() for cell in row):
+                rows.append(row[:len(header)])
+            if len(rows) >= chunk_rows:
+                yield pd.DataFrame(rows, columns=header)
+                rows = []
+        if header is None:
+            raise ValueError("No header row with a unit column found")
+        if rows:
+            yield pd.DataFrame(rows, columns=header)
+    finally:
+        workbook.close()
+
+
+def _text(series: pd.Series) -> pd.Series:
+    text = series.astype('string').str.strip()
+    return text.mask(text == '')
+
+
+def _money(series: pd.Series) -> pd.Series:
+    """'$1,234.50' and '(50.00)' style amounts as floats"""
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype(float)
+    text = _text(series).str.replace(r'[$,\s]', '', regex=True).str.replace(r'^\((.*)\)$', r'-\1', regex=True)
+    return pd.to_numeric(text, errors='coerce').astype(float)
+
+
+def _dates(series: pd.Series) -> pd.Series:
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.dt.normalize()
+    return pd.to_datetime(series, errors='coerce', format='mixed').dt.normalize()
+
+
+def normalize_unit_types(unit_types: pd.Series, bedrooms: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    """Unit types as 'Studio'/'1BR'/'2BR'..., and bedrooms filled in from the type where missing.
+
+    Floor plan codes that carry no bedroom count ('A1', 'Penthouse') are kept as exported.
+    """
+    text = _text(unit_types)
+    parsed = pd.to_numeric(text.str.extract(BEDROOM_PATTERN, expand=False)[0], errors='coerce')
+    parsed = parsed.mask(text.str.match(STUDIO_PATTERN).fillna(False).astype(bool), 0)
+    bedrooms = bedrooms.fillna(parsed)
+    labels = bedrooms.map(lambda beds: None if pd.isna(beds) else 'Studio' if beds == 0 else f'{int(beds)}BR')
+    normalized = labels.where(parsed.notna() | text.isna(), text.astype(object))
+    return normalized.where(normalized.notna(), None), bedrooms
+
+
+def normalize_rent_roll(chunk: pd.DataFrame, columns: Dict[str, str],
+                        property_ids: Optional[Dict[str, int]] = None,
+                        valid_property_ids: Optional[Iterable[int]] = None,
+                        property_id: Optional[int] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """One chunk of raw rows -> (staged rows in STAGE_COLUMNS, rejected rows with a Reason column).
+
+    The property comes from a PropertyID column, a property name looked up in `property_ids`
+    (case-insensitive), or `property_id` for single-property exports. Vacant, model and down
+    units keep their unit row but carry no lease.
+    """
+    raw = lambda field: chunk[columns[field]] if field in columns else pd.Series(np.nan, index=chunk.index)
+    frame = pd.DataFrame(index=chunk.index)
+
+    ids = pd.to_numeric(raw('PropertyID'), errors='coerce')
+    if 'PropertyName' in columns and property_ids:
+        lookup = {name.strip().lower(): pid for name, pid in property_ids.items()}
+        ids = ids.fillna(_text(raw('PropertyName')).str.lower().map(lookup).astype(float))
+    if property_id is not None:
+        ids = ids.fillna(float(property_id))
+    frame['PropertyID'] = ids
+
+    units = _text(raw('UnitNumber').astype(object).map(lambda v: str(int(v)) if isinstance(v, float) and v.is_integer() else v))
+    frame['UnitNumber'] = units
+    frame['Bedrooms'] = pd.to_numeric(raw('Bedrooms'), errors='coerce')
+    frame['UnitType'], frame['Bedrooms'] = normalize_unit_types(raw('UnitType'), frame['Bedrooms'])
+    frame['SquareFeet'] = _money(raw('SquareFeet')).round()
+    frame['MarketRent'] = _money(raw('MarketRent'))
+
+    names = _text(raw('TenantName'))
+    vacant = names.isna() | names.str.match(VACANT_PATTERN).fillna(False).astype(bool)
+    frame['TenantName'] = names.where(~vacant)
+    frame['LeaseStart'] = _dates(raw('LeaseStart')).where(~vacant)
+    frame['LeaseEnd'] = _dates(raw('LeaseEnd')).where(~vacant)
+    frame['MonthlyRent'] = _money(raw('MonthlyRent')).where(~vacant)
+    frame['MoveOutDate'] = _dates(raw('MoveOutDate')).where(~vacant)
+
+    reasons = pd.Series('', index=frame.index)
+    reasons[frame['PropertyID'].isna()] = 'unknown property'
+    if valid_property_ids is not None:
+        reasons[(reasons == '') & ~frame['PropertyID'].isin(list(valid_property_ids))] = 'unknown PropertyID'
+    reasons[(reasons == '') & frame['UnitNumber'].isna()] = 'missing unit number'
+    reasons[(reasons == '') & (frame['UnitNumber'].str.len() > 20).fillna(False)] = 'unit number too long'
+    reasons[(reasons == '') & ~vacant & frame['LeaseStart'].isna()] = 'invalid LeaseStart'
+    reasons[(reasons == '') & (frame['LeaseEnd'] < frame['LeaseStart'])] = 'LeaseEnd before LeaseStart'
+
+    rejected = chunk[reasons != ''].assign(Reason=reasons[reasons != ''])
+    valid = frame[reasons == ''].copy()
+    valid['PropertyID'] = valid['PropertyID'].astype(int)
+    return valid[STAGE_COLUMNS], rejected
+
+
+def load_rent_roll(source, property_ids: Optional[Dict[str, int]] = None,
+                   valid_property_ids: Optional[Iterable[int]] = None, property_id: Optional[int] = None,
+                   sheet: Optional[str] = None, chunk_rows: int = CHUNK_ROWS) -> Dict:
+    """Stream-parse one rent roll export into stage-ready rows; returns the frames plus timing.
+
+    Only normalized, typed columns are kept between chunks, so raw text never has to fit in
+    memory at once. A unit listed twice keeps its last row, like the financials import.
+    """
+    started = time.perf_counter()
+    columns, frames, rejected, rows = None, [], [], 0
+    for chunk in iter_rent_roll_chunks(source, chunk_rows, sheet):
+        if columns is None:
+            columns = map_columns(chunk.columns)
+            if 'UnitNumber' not in columns:
+                raise ValueError("No unit number column found")
+            if not {'PropertyID', 'PropertyName'} & set(columns) and property_id is None:
+                raise ValueError("No property column found; choose the property the rent roll belongs to")
+        rows += len(chunk)
+        valid, bad = normalize_rent_roll(chunk, columns, property_ids, valid_property_ids, property_id)
+        frames.append(valid)
+        if not bad.empty:
+            rejected.append(bad)
+
+    frame = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=STAGE_COLUMNS)
+    frame = frame.drop_duplicates(['PropertyID', 'UnitNumber'], keep='last').reset_index(drop=True)
+    name = source if isinstance(source, str) else getattr(source, 'name', 'upload')
+    return {
+        'file': os.path.basename(str(name)),
+        'columns': columns or {},
+        'frame': frame,
+        'rejected': pd.concat(rejected, ignore_index=True) if rejected else pd.DataFrame(),
+        'rows': rows,
+        'parse_seconds': time.perf_counter() - started
+    }
+
+
+def _stage_rows(frame: pd.DataFrame) -> List[Tuple]:
+    """Rows as driver-ready tuples: None for missing values, dates and ints as Python types"""
+    out = pd.DataFrame({
+        'PropertyID': frame['PropertyID'].astype(int).astype(object),
+        'UnitNumber': frame['UnitNumber'].astype(object),
+        'UnitType': frame['UnitType'].astype(object),
+        'Bedrooms': frame['Bedrooms'].astype('Int64').astype(object),
+        'SquareFeet': frame['SquareFeet'].astype('Int64').astype(object),
+        'MarketRent': frame['MarketRent'].round(2).astype(object),
+        'TenantName': frame['TenantName'].astype(object),
+        'LeaseStart': pd.to_datetime(frame['LeaseStart']).dt.date.astype(object),
+        'LeaseEnd': pd.to_datetime(frame['LeaseEnd']).dt.date.astype(object),
+        'MonthlyRent': frame['MonthlyRent'].round(2).astype(object),
+        'MoveOutDate': pd.to_datetime(frame['MoveOutDate']).dt.date.astype(object)
+    })
+    out = out.where(out.notna(), None)
+    return [tuple(int(v) if isinstance(v, np.integer) else v for v in row) for row in out.itertuples(index=False)]
+
+
+def apply_rent_roll(conn, frame: pd.DataFrame, as_of: Optional[date] = None) -> Dict:
+    """Stage the rows once, then diff and apply them one property (one transaction) at a time.
+
+    Every property's inserts, updates and move-outs are a handful of set-based statements, and
+    each committed property bumps the RentRoll data version. A failing property is rolled back
+    and reported without stopping the others.
+    """
+    as_of = pd.Timestamp(as_of or date.today()).date()
+    started = time.perf_counter()
+    cursor = conn.cursor()
+    cursor.fast_executemany = True
+    try:
+        cursor.execute(STAGE_TABLE)
+        rows = _stage_rows(frame)
+        insert = f"INSERT INTO #RentRollStage ({', '.join(STAGE_COLUMNS)}) VALUES ({', '.join('?' * len(STAGE_COLUMNS))})"
+        for i in range(0, len(rows), STAGE_BATCH_ROWS):
+            cursor.executemany(insert, rows[i:i + STAGE_BATCH_ROWS])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    stage_seconds = time.perf_counter() - started
+
+    totals = dict.fromkeys(APPLY_COUNTS, 0)
+    properties, failed = [], []
+    apply_started = time.perf_counter()
+    for property_id, units in frame.groupby('PropertyID', sort=True).size().items():
+        try:
+            cursor.execute(APPLY_PROPERTY, (int(property_id), as_of))
+            counts = dict(zip(APPLY_COUNTS, (int(value) for value in cursor.fetchone())))
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            failed.append({'property_id': int(property_id), 'error': str(e)})
+            continue
+        for name, value in counts.items():
+            totals[name] += value
+        properties.append(dict(counts, property_id=int(property_id), units=int(units)))
+    apply_seconds = time.perf_counter() - apply_started
+
+    try:
+        cursor.execute("DROP TABLE #RentRollStage")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+
+    seconds = time.perf_counter() - started
+    applied_units = sum(result['units'] for result in properties)
+    return dict(totals, properties=properties, failed=failed, as_of=as_of, units=applied_units,
+                stage_seconds=stage_seconds, apply_seconds=apply_seconds, write_seconds=seconds,
+                units_per_second=applied_units / seconds if seconds > 0 else 0.0)
@@ -0,0 +1,244 @@
+import argparse
+import html
+import importlib.util
+import json
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from charts import monthly_performance_figure, vacancy_trend_figure, noi_margin_figure, PRIMARY_COLOR, ACCENT_COLOR
+from cube import LINE_ITEMS
+
+# Static chart images need kaleido; packs still render without it
+HAS_KALEIDO = importlib.util.find_spec('kaleido') is not None
+HAS_OPENPYXL = importlib.util.find_spec('openpyxl') is not None
+
+PACK_FORMATS = ['xlsx', 'html']
+
+HTML_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="UTF-8">
+<title>{title}</title>
+<style>
+    body {{ font-family: Arial, sans-serif; background: #f5f5f5; color: {primary}; margin: 0; padding: 24px; }}
+    h1 {{ background: white; padding: 16px; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); }}
+    h2 {{ border-bottom: 2px solid {accent}; padding-bottom: 4px; }}
+    .section {{ background: white; padding: 20px; margin-bottom: 20px; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); }}
+    table.dataframe {{ border-collapse: collapse; font-size: 13px; width: 100%; }}
+    table.dataframe th {{ background: #f5f5f5; text-align: left; padding: 6px 10px; }}
+    table.dataframe td {{ padding: 6px 10px; border-bottom: 1px solid #eee; text-align: right; }}
+</style>
+</head>
+<body>
+<h1>{title}</h1>
+<div class="section"><h2>Summary</h2>{summary}</div>
+<div class="section"><h2>Trailing Twelve Months</h2>{t12}</div>
+<div class="section"><h2>Trends</h2>{charts}</div>
+</body>
+</html>
+"""
+
+
+def slugify(name: str) -> str:
+    return re.sub(r'[^A-Za-z0-9]+', '_', str(name)).strip('_') or 'property'
+
+
+def to_monthly_frame(history: pd.DataFrame) -> pd.DataFrame:
+    """Map MonthlyFinancials rows to the Revenue/Expenses/NOI/CashFlow/Vacancy shape the charts use"""
+    history = history.sort_values('ReportingMonth')
+    return pd.DataFrame({
+        'ReportingMonth': pd.to_datetime(history['ReportingMonth']).to_numpy(),
+        'Revenue': history['TotalIncome'].to_numpy(dtype=float),
+        'Expenses': history['TotalExpenses'].to_numpy(dtype=float),
+        'NOI': history['NOI'].to_numpy(dtype=float),
+        'CashFlow': history['CashFlow'].to_numpy(dtype=float),
+        'Vacancy': history['VacancyPct'].fillna(0).to_numpy(dtype=float),
+        'NOI_Margin': history['NOIMargin'].to_numpy(dtype=float)
+    })
+
+
+def t12_table(history: pd.DataFrame, as_of: pd.Timestamp) -> pd.DataFrame:
+    """Line items (rows) by month (columns) for the 12 months ending at `as_of`, plus a T12 column"""
+    months = pd.date_range(end=as_of, periods=12, freq='MS')
+    window = history[history['ReportingMonth'].isin(months)].set_index('ReportingMonth')
+    table = window[LINE_ITEMS].reindex(months).T
+    table.columns = [month.strftime('%b %Y') for month in months]
+
+    # Occupancy is a rate, so its T12 column is an average rather than a sum
+    totals = table.sum(axis=1, min_count=1)
+    totals['Occupancy'] = table.loc['Occupancy'].mean()
+    table['T12'] = totals
+    table.index.name = 'LineItem'
+    return table
+
+
+def pack_summary(history: pd.DataFrame, as_of: pd.Timestamp) -> Dict:
+    """Summary KPIs for the T12 ending at `as_of` against the prior T12"""
+    months = history['ReportingMonth']
+    current = history[(months > as_of - pd.DateOffset(months=12)) & (months <= as_of)]
+    prior = history[(months > as_of - pd.DateOffset(months=24)) & (months <= as_of - pd.DateOffset(months=12))]
+
+    revenue = float(current['TotalIncome'].sum())
+    noi = float(current['NOI'].sum())
+    prior_noi = float(prior['NOI'].sum())
+    debt_service = float(current['DebtService'].sum())
+
+    return {
+        'As Of': as_of.strftime('%Y-%m'),
+        'Months Reported': int(len(current)),
+        'T12 Revenue': revenue,
+        'T12 Expenses': float(current['TotalExpenses'].sum()),
+        'T12 NOI': noi,
+        'T12 Cash Flow': float(current['CashFlow'].sum()),
+        'T12 Debt Service': debt_service,
+        'NOI Margin %': (noi / revenue * 100) if revenue else np.nan,
+        'DSCR': (noi / debt_service) if debt_service else np.nan,
+        'Avg Occupancy %': float(current['OccupancyPct'].mean()) if len(current) else np.nan,
+        'Prior T12 NOI': prior_noi,
+        'NOI Change %': ((noi - prior_noi) / abs(prior_noi) * 100) if prior_noi else np.nan
+    }
+
+
+def render_pack(property_name: str, history: pd.DataFrame, output_dir: str,
+                formats: Iterable[str] = PACK_FORMATS, images: bool = True,
+                as_of: Optional[pd.Timestamp] = None) -> Dict:
+    """Render one property's pack to disk; runs headless in a worker process"""
+    started = time.perf_counter()
+    history = history.copy()
+    history['ReportingMonth'] = pd.to_datetime(history['ReportingMonth'])
+    as_of = pd.Timestamp(as_of) if as_of is not None else history['ReportingMonth'].max()
+    as_of = as_of.replace(day=1)
+
+    stem = os.path.join(output_dir, f"{slugify(property_name)}_{as_of.strftime('%Y%m')}")
+    summary = pack_summary(history, as_of)
+    t12 = t12_table(history, as_of)
+    monthly = to_monthly_frame(history)
+    figures = {
+        'performance': monthly_performance_figure(monthly),
+        'vacancy': vacancy_trend_figure(monthly),
+        'noi_margin': noi_margin_figure(monthly)
+    }
+
+    files = []
+    if 'xlsx' in formats and HAS_OPENPYXL:
+        path = f"{stem}.xlsx"
+        with pd.ExcelWriter(path, engine='openpyxl') as writer:
+            pd.DataFrame(list(summary.items()), columns=['Metric', 'Value']).to_excel(writer, sheet_name='Summary', index=False)
+            t12.to_excel(writer, sheet_name='T12')
+            history.sort_values('ReportingMonth').to_excel(writer, sheet_name='Monthly', index=False)
+        files.append(path)
+
+    if 'html' in formats:
+        path = f"{stem}.html"
+        summary_df = pd.DataFrame(list(summary.items()), columns=['Metric', 'Value'])
+        chart_html = "".join(
+            fig.to_html(full_html=False, include_plotlyjs='cdn' if i == 0 else False)
+            for i, fig in enumerate(figures.values())
+        )
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(HTML_TEMPLATE.format(
+                title=html.escape(f"{property_name} – Asset Management Pack ({as_of.strftime('%b %Y')})"),
+                primary=PRIMARY_COLOR,
+                accent=ACCENT_COLOR,
+                summary=summary_df.to_html(index=False, float_format=lambda v: f"{v:,.2f}", na_rep='–'),
+                t12=t12.to_html(float_format=lambda v: f"{v:,.0f}", na_rep='–'),
+                charts=chart_html
+            ))
+        files.append(path)
+
+    if images and HAS_KALEIDO:
+        for name, fig in figures.items():
+            path = f"{stem}_{name}.png"
+            fig.write_image(path, width=1000, height=fig.layout.height or 500)
+            files.append(path)
+
+    return {'property': property_name, 'files': files, 'seconds': time.perf_counter() - started}
+
+
+def _render_pack_job(job: Dict) -> Dict:
+    return render_pack(**job)
+
+
+def generate_report_packs(history: pd.DataFrame, output_dir: str, formats: Iterable[str] = PACK_FORMATS,
+                          images: bool = True, workers: Optional[int] = None,
+                          as_of=None, properties: Optional[List[str]] = None) -> Dict:
+    """Fan per-property packs out across a process pool and report throughput"""
+    os.makedirs(output_dir, exist_ok=True)
+    started = time.perf_counter()
+
+    if history.empty:
+        return {'packs': 0, 'failed': [], 'files': [], 'seconds': 0.0, 'packs_per_second': 0.0}
+
+    jobs = []
+    for property_name, group in history.groupby('PropertyName', sort=True):
+        if properties and property_name not in properties:
+            continue
+        jobs.append({'property_name': property_name, 'history': group, 'output_dir': output_dir,
+                     'formats': list(formats), 'images': images, 'as_of': as_of})
+
+    results, failed = [], []
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for job in jobs:
+            try:
+                results.append(_render_pack_job(job))
+            except Exception as e:
+                failed.append({'property': job['property_name'], 'error': str(e)})
+    else:
+        # Spawned workers stay safe when the caller is a multithreaded Streamlit process
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            futures = {executor.submit(_render_pack_job, job): job['property_name'] for job in jobs}
+            for future in as_completed(futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    failed.append({'property': futures[future], 'error': str(e)})
+
+    seconds = time.perf_counter() - started
+    return {
+        'packs': len(results),
+        'failed': failed,
+        'files': [path for result in results for path in result['files']],
+        'seconds': seconds,
+        'packs_per_second': len(results) / seconds if seconds > 0 else 0.0
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Generate per-property asset management report packs")
+    parser.add_argument('--output', default='report_packs', help="Directory to write packs into")
+    parser.add_argument('--format', nargs='+', choices=PACK_FORMATS, default=PACK_FORMATS, dest='formats')
+    parser.add_argument('--no-images', action='store_true', help="Skip static chart images")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument('--as-of', default=None, help="Report month (YYYY-MM); defaults to each property's latest month")
+    parser.add_argument('--property', action='append', dest='properties', help="Limit to a property name (repeatable)")
+    args = parser.parse_args(argv)
+
+    # Imported here so worker processes never load the Streamlit app module
+    from app import RealEstateDashboard
+
+    dashboard = RealEstateDashboard()
+    if not dashboard.connect_to_database():
+        raise SystemExit("Failed to connect to database")
+    try:
+        history = dashboard.get_financial_history()
+    finally:
+        dashboard.disconnect_from_database()
+
+    summary = generate_report_packs(
+        history, args.output, formats=args.formats, images=not args.no_images,
+        workers=args.workers, as_of=args.as_of, properties=args.properties
+    )
+    print(json.dumps({key: value for key, value in summary.items() if key != 'files'}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
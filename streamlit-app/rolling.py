@@ -0,0 +1,183 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from cube import FinancialCube, LINE_ITEMS, ITEM_INDEX
+from timeseries import month_ordinal
+
+# Trailing windows in months; each is annualized to a 12-month figure
+WINDOWS = {'T12': 12, 'T3': 3}
+
+# Rates are averaged over the window instead of summed and annualized
+RATE_ITEMS = ['Occupancy']
+
+# Line items shown in the per-property rolling table
+TABLE_ITEMS = ['TotalIncome', 'TotalExpenses', 'NOI', 'CashFlow', 'Occupancy']
+
+
+class RollingEngine:
+    """Trailing T12/T3 sums for every property x month x line item, kept in step with the cube.
+
+    sums[window] and counts[window] are shaped like the cube: the sum over the window ending
+    at each month, and the number of months reported in it. item_counts[window] counts, per
+    line item, the months whose value was not NULL; windows are grossed up by it. A write to one property-month
+    only changes the windows that end in the following W months of that property, so updates
+    re-sum just those instead of the whole portfolio.
+    """
+
+    def __init__(self, cube: FinancialCube):
+        self.cube = cube
+        self.sums: Dict[str, np.ndarray] = {}
+        self.counts: Dict[str, np.ndarray] = {}
+        self.item_counts: Dict[str, np.ndarray] = {}
+        self._rebuild()
+
+    def _rebuild(self):
+        properties, months, items = self.cube.values.shape
+        self.start_ordinal = self.cube.start_ordinal
+        for name in WINDOWS:
+            self.sums[name] = np.zeros((properties, months, items))
+            self.counts[name] = np.zeros((properties, months), dtype=np.int64)
+            self.item_counts[name] = np.zeros((properties, months, items), dtype=np.int64)
+        self._recompute(slice(None), 0, months)
+
+    def _recompute(self, rows, lo: int, hi: int):
+        """Recompute the windows ending at months [lo, hi) for the given property rows"""
+        if lo >= hi:
+            return
+        for name, width in WINDOWS.items():
+            start = max(lo - width + 1, 0)
+            mask = self.cube.mask[rows, start:hi]
+            segment = self.cube.values[rows, start:hi, :]
+            # NULL line items are NaN; zero them and count them out, or one NULL would turn
+            # every later prefix sum (and so every later window) NaN
+            valid = mask[..., None] & ~np.isnan(segment)
+            values = np.where(valid, segment, 0.0)
+
+            # Prefix sums over the segment; each window is a difference of two of them
+            prefix = np.zeros(values.shape[:-2] + (values.shape[-2] + 1, values.shape[-1]))
+            np.cumsum(values, axis=-2, out=prefix[..., 1:, :])
+            counts = np.zeros(mask.shape[:-1] + (mask.shape[-1] + 1,), dtype=np.int64)
+            np.cumsum(mask, axis=-1, out=counts[..., 1:])
+            item_counts = np.zeros(prefix.shape, dtype=np.int64)
+            np.cumsum(valid, axis=-2, out=item_counts[..., 1:, :])
+
+            ends = np.arange(lo, hi) - start + 1
+            begins = np.maximum(ends - width, 0)
+            self.sums[name][rows, lo:hi, :] = prefix[..., ends, :] - prefix[..., begins, :]
+            self.counts[name][rows, lo:hi] = counts[..., ends] - counts[..., begins]
+            self.item_counts[name][rows, lo:hi, :] = item_counts[..., ends, :] - item_counts[..., begins, :]
+
+    def _sync_shape(self) -> Optional[Tuple[int, int]]:
+        """Grow the arrays after the cube gained properties or months.
+
+        Returns the range of newly appended months (whose windows still need computing for
+        every property), or None when the cube grew backwards and a rebuild was done instead.
+        """
+        properties, months, items = self.cube.values.shape
+        old_properties, old_months = self.counts['T12'].shape
+        if self.cube.start_ordinal != self.start_ordinal:
+            self._rebuild()
+            return None
+        if (properties, months) != (old_properties, old_months):
+            grow = ((0, properties - old_properties), (0, months - old_months))
+            for name in WINDOWS:
+                self.sums[name] = np.pad(self.sums[name], grow + ((0, 0),))
+                self.counts[name] = np.pad(self.counts[name], grow)
+                self.item_counts[name] = np.pad(self.item_counts[name], grow + ((0, 0),))
+        return old_months, months
+
+    def update(self, cells: Iterable[Tuple[int, object]]) -> int:
+        """Re-sum only the windows covering written (PropertyID, month) cells; returns windows touched"""
+        appended = self._sync_shape()
+        if appended is None:
+            return int(self.counts['T12'].size)
+
+        touched = 0
+        lo, hi = appended
+        if lo < hi:
+            self._recompute(slice(None), lo, hi)
+            touched += (hi - lo) * self.cube.values.shape[0]
+
+        # Per property, merge the month ranges whose windows include a written month
+        longest = max(WINDOWS.values())
+        ranges: Dict[int, List[List[int]]] = {}
+        for property_id, month in cells:
+            row = self.cube.property_index.get(int(property_id))
+            if row is None:
+                continue
+            position = month_ordinal(month) - self.start_ordinal
+            start, end = max(position, 0), min(position + longest, lo)
+            ranges.setdefault(row, []).append([start, end])
+        for row, spans in ranges.items():
+            merged = []
+            for span in sorted(spans):
+                if merged and span[0] <= merged[-1][1]:
+                    merged[-1][1] = max(merged[-1][1], span[1])
+                else:
+                    merged.append(span)
+            for start, end in merged:
+                self._recompute(row, start, end)
+                touched += max(end - start, 0)
+        return touched
+
+    def annualized(self, window: str = 'T12', start=None, end=None) -> Tuple[np.ndarray, np.ndarray]:
+        """Annualized window values [property, month, item] and months reported [property, month].
+
+        Windows with gaps are grossed up by the months each line item was actually reported;
+        rates are averaged.
+        """
+        months = self.cube._month_slice(start, end)
+        sums = self.sums[window][:, months, :]
+        counts = self.counts[window][:, months]
+        item_counts = self.item_counts[window][:, months, :]
+        scale = np.full(len(LINE_ITEMS), 12.0)
+        scale[[ITEM_INDEX[item] for item in RATE_ITEMS]] = 1.0
+        with np.errstate(invalid='ignore', divide='ignore'):
+            values = np.where(item_counts > 0, sums * scale / item_counts, np.nan)
+        return values, counts
+
+    def table(self, month=None, items: Optional[List[str]] = None) -> pd.DataFrame:
+        """One row per property with T12 and annualized T3 figures for the window ending at `month`"""
+        if self.cube.month_count == 0:
+            return pd.DataFrame()
+        month = month if month is not None else self.cube.months()[-1]
+        items = items or TABLE_ITEMS
+        index = [ITEM_INDEX[item] for item in items]
+
+        data = {'PropertyID': self.cube.property_ids, 'PropertyName': self.cube.property_names}
+        reported = None
+        for name in WINDOWS:
+            values, counts = self.annualized(name, month, month)
+            if reported is None:
+                reported = counts[:, 0]
+                data['T12 Months'] = reported
+            for item, i in zip(items, index):
+                data[f'{name} {item}'] = values[:, 0, i]
+        df = pd.DataFrame(data)
+        if 'T12 NOI' in df.columns and 'T3 NOI' in df.columns:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                df['T3 vs T12 %'] = np.where(df['T12 NOI'].abs() > 0,
+                                             (df['T3 NOI'] - df['T12 NOI']) / df['T12 NOI'].abs() * 100, np.nan)
+        df = df[reported > 0]
+        return df.sort_values('PropertyName', kind='stable').reset_index(drop=True)
+
+    def portfolio_series(self, item: str = 'NOI', start=None, end=None) -> pd.DataFrame:
+        """Portfolio T12 and annualized T3 of one line item for every month in [start, end]"""
+        months = self.cube.months()[self.cube._month_slice(start, end)]
+        data = {'ReportingMonth': pd.to_datetime(months)}
+        for name in WINDOWS:
+            values, counts = self.annualized(name, start, end)
+            column = values[..., ITEM_INDEX[item]]
+            if item in RATE_ITEMS:
+                with np.errstate(invalid='ignore'):
+                    data[name] = np.nanmean(np.where(counts > 0, column, np.nan), axis=0)
+            else:
+                data[name] = np.nansum(column, axis=0)
+        df = pd.DataFrame(data)
+        return df[self.cube.mask[:, self.cube._month_slice(start, end)].any(axis=0)].reset_index(drop=True)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = list(self.sums.values()) + list(self.counts.values()) + list(self.item_counts.values())
+        return sum(array.nbytes for array in arrays)
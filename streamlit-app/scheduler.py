@@ -0,0 +1,402 @@
+import math
+import queue
+import random
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+# ODBC SQLSTATEs for dropped or refused connections, worth retrying on a fresh connection
+TRANSIENT_SQLSTATES = {'08001', '08S01', '08004', '08007', '40001', 'HYT01'}
+
+# ODBC SQLSTATEs for statement and login timeouts
+TIMEOUT_SQLSTATES = {'HYT00', 'HYT01'}
+
+# Azure SQL error numbers documented as transient (throttling, failover, resource limits)
+TRANSIENT_ERROR_NUMBERS = {'4060', '4221', '10053', '10054', '10060', '10928', '10929', '40143',
+                           '40197', '40501', '40540', '40613', '49918', '49919', '49920', '233', '64'}
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """True for connection drops and Azure throttling/failover errors; never for query timeouts"""
+    if isinstance(error, (QueryCancelled, CircuitOpenError)):
+        return False
+    args = getattr(error, 'args', ())
+    if args and isinstance(args[0], str) and args[0] in TRANSIENT_SQLSTATES:
+        return True
+    message = ' '.join(str(arg) for arg in args)
+    return any(f"({number})" in message or f"error {number}" in message.lower()
+               for number in TRANSIENT_ERROR_NUMBERS)
+
+
+def is_database_failure(error: BaseException) -> bool:
+    """True when the error says the database is unhealthy (transient, connection or timeout),
+    rather than that the query itself is wrong; only these count against the circuit breaker"""
+    if isinstance(error, (QueryCancelled, CircuitOpenError)):
+        return False
+    if is_transient_error(error) or isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    args = getattr(error, 'args', ())
+    return bool(args) and isinstance(args[0], str) and (args[0] in TIMEOUT_SQLSTATES or args[0].startswith('08'))
+
+
+def backoff_delay(attempt: int, base: float = 0.25, cap: float = 4.0) -> float:
+    """Equal jitter: half the exponential step is fixed, half random, so retries spread out"""
+    step = min(cap, base * (2 ** attempt))
+    return step / 2 + random.uniform(0, step / 2)
+
+
+class QueryCancelled(Exception):
+    """The caller abandoned the query (rerun, disconnect or deadline) and its statement was cancelled"""
+
+
+class CircuitOpenError(Exception):
+    """The database is treated as degraded; the query was not attempted"""
+
+
+class ConnectionPool:
+    """Thread-safe pool of database connections created on demand by a factory"""
+
+    def __init__(self, factory: Callable, max_size: int = 8):
+        self.factory = factory
+        self.max_size = max_size
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+
+    def acquire(self, timeout: Optional[float] = None):
+        """Take an idle connection, open a new one under the cap, or wait for a release"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            create = self._created < self.max_size
+            if create:
+                self._created += 1
+
+        if create:
+            try:
+                return self.factory()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No pooled connection available within {timeout}s")
+
+    def release(self, conn, discard: bool = False):
+        """Return a connection to the pool, or close it if it may be unusable"""
+        if conn is None:
+            return
+        if discard:
+            try:
+                conn.close()
+            except Exception:
+                pass
+            with self._lock:
+                self._created -= 1
+            return
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None):
+        """Borrow a connection for the duration of a block; failed connections are discarded"""
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        except Exception:
+            self.release(conn, discard=True)
+            raise
+        else:
+            self.release(conn)
+
+    def close_all(self):
+        """Close every idle connection"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self.release(conn, discard=True)
+
+    def stats(self) -> Dict:
+        return {'max_size': self.max_size, 'open': self._created, 'idle': self._idle.qsize()}
+
+
+class CircuitBreaker:
+    """Stop sending queries to a failing database for a cool-down, then let one trial through"""
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self) -> bool:
+        """Whether a query may run now; in half-open state only a single trial is allowed"""
+        with self._lock:
+            state = self._state()
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._failures >= self.failure_threshold or self._opened_at is not None:
+                self._opened_at = time.monotonic()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'state': self._state(), 'failures': self._failures}
+
+
+class CancellableConnection:
+    """Connection proxy that remembers its cursors so in-flight statements can be cancelled"""
+
+    def __init__(self, conn):
+        object.__setattr__(self, '_conn', conn)
+        object.__setattr__(self, '_cursors', weakref.WeakSet())
+        object.__setattr__(self, 'cancelled', False)
+
+    def cursor(self):
+        if self.cancelled:
+            raise QueryCancelled("Query cancelled before it started")
+        cursor = self._conn.cursor()
+        self._cursors.add(cursor)
+        return cursor
+
+    def cancel(self):
+        object.__setattr__(self, 'cancelled', True)
+        for cursor in list(self._cursors):
+            try:
+                cursor.cancel()
+            except Exception:
+                pass
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._conn, name, value)
+
+
+class _Execution:
+    """One submitted task: its future plus the handle needed to cancel it mid-statement"""
+
+    def __init__(self, name: str, timeout: Optional[float]):
+        self.name = name
+        self.timeout = timeout
+        self.future = None
+        self.conn: Optional[CancellableConnection] = None
+        self.cancelled = threading.Event()
+        self.attempts = 0
+
+    def cancel(self):
+        self.cancelled.set()
+        if self.future is not None:
+            self.future.cancel()
+        conn = self.conn
+        if conn is not None:
+            conn.cancel()
+
+
+class QueryResult:
+    """Outcome of one scheduled query: its value or the error it raised, plus timing"""
+
+    def __init__(self, name: str, value: Any = None, error: Optional[BaseException] = None,
+                 elapsed: float = 0.0, timed_out: bool = False, attempts: int = 1):
+        self.name = name
+        self.value = value
+        self.error = error
+        self.elapsed = elapsed
+        self.timed_out = timed_out
+        self.attempts = attempts
+
+    @property
+    def cancelled(self) -> bool:
+        return isinstance(self.error, QueryCancelled)
+
+    @property
+    def circuit_open(self) -> bool:
+        return isinstance(self.error, CircuitOpenError)
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def __repr__(self):
+        status = 'ok' if self.ok else ('timeout' if self.timed_out else f"error: {self.error}")
+        return f"QueryResult({self.name!r}, {status}, {self.elapsed:.3f}s)"
+
+
+# A task is either `fn(conn)` or `(fn(conn), timeout_seconds)`
+Task = Union[Callable, Tuple[Callable, Optional[float]]]
+
+
+class QueryScheduler:
+    """Run independent reads concurrently, each on its own pooled connection.
+
+    Every task gets a deadline; statements still running at the deadline, or when the
+    caller's cancel check fires, are cancelled on the server. Transient connection errors
+    are retried with jittered backoff inside the deadline, and a circuit breaker fails
+    queries fast while the database is degraded.
+    """
+
+    def __init__(self, pool: ConnectionPool, max_workers: Optional[int] = None,
+                 default_timeout: float = 30.0, retries: int = 2, backoff: float = 0.25,
+                 max_backoff: float = 4.0, breaker: Optional[CircuitBreaker] = None,
+                 poll_interval: float = 0.1):
+        self.pool = pool
+        self.default_timeout = default_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.breaker = breaker or CircuitBreaker()
+        self.poll_interval = poll_interval
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or pool.max_size,
+                                           thread_name_prefix='dashboard-query')
+
+    def _backoff_delay(self, attempt: int) -> float:
+        return backoff_delay(attempt, self.backoff, self.max_backoff)
+
+    def _execute(self, fn: Callable, execution: _Execution, deadline: Optional[float]):
+        """Worker body: borrow a connection, apply the statement timeout, run with retries"""
+        started = time.perf_counter()
+        attempt = 0
+        while True:
+            if execution.cancelled.is_set():
+                raise QueryCancelled(f"{execution.name} was cancelled")
+            if not self.breaker.allow():
+                raise CircuitOpenError("Database circuit is open; serving cached data")
+
+            remaining = None if deadline is None else deadline - time.perf_counter()
+            if remaining is not None and remaining <= 0:
+                raise TimeoutError(f"{execution.name} did not finish within {execution.timeout}s")
+
+            execution.attempts = attempt + 1
+            try:
+                with self.pool.connection(timeout=remaining) as conn:
+                    # pyodbc applies Connection.timeout as the per-statement query timeout
+                    if remaining and hasattr(conn, 'timeout'):
+                        conn.timeout = max(int(math.ceil(remaining)), 1)
+                    execution.conn = CancellableConnection(conn)
+                    try:
+                        value = fn(execution.conn)
+                    finally:
+                        execution.conn = None
+                        if remaining and hasattr(conn, 'timeout'):
+                            conn.timeout = 0
+                self.breaker.record_success()
+                return value, time.perf_counter() - started
+            except Exception as e:
+                if execution.cancelled.is_set():
+                    raise QueryCancelled(f"{execution.name} was cancelled") from e
+                # Bad SQL, missing tables or constraint violations are bugs, not an outage
+                if is_database_failure(e):
+                    self.breaker.record_failure()
+                delay = self._backoff_delay(attempt)
+                deadline_left = None if deadline is None else deadline - time.perf_counter()
+                if (not is_transient_error(e) or attempt >= self.retries
+                        or (deadline_left is not None and deadline_left <= delay)):
+                    raise
+                attempt += 1
+                # Wake early if the caller cancels while we back off
+                if execution.cancelled.wait(delay):
+                    raise QueryCancelled(f"{execution.name} was cancelled") from e
+
+    def run(self, tasks: Dict[str, Task], cancel_check: Optional[Callable[[], bool]] = None
+            ) -> Dict[str, QueryResult]:
+        """Submit every task at once and wait for all of them, each within its own deadline.
+
+        `cancel_check` is polled while waiting; when it returns True every outstanding
+        statement is cancelled and reported as QueryCancelled.
+        """
+        started = time.perf_counter()
+        executions: Dict[str, _Execution] = {}
+        deadlines: Dict[str, float] = {}
+        for name, task in tasks.items():
+            fn, timeout = task if isinstance(task, tuple) else (task, self.default_timeout)
+            execution = _Execution(name, timeout)
+            deadline = None if timeout is None else started + timeout
+            execution.future = self.executor.submit(self._execute, fn, execution, deadline)
+            executions[name] = execution
+            deadlines[name] = math.inf if deadline is None else deadline
+
+        results: Dict[str, QueryResult] = {}
+        pending = dict(executions)
+        while pending:
+            now = time.perf_counter()
+            # Wait in deadline order so a short timeout is not masked by a slower query
+            next_deadline = min(deadlines[name] for name in pending)
+            wait_for = max(min(next_deadline - now, self.poll_interval if cancel_check else math.inf), 0)
+            wait([execution.future for execution in pending.values()],
+                 timeout=None if math.isinf(wait_for) else wait_for, return_when=FIRST_COMPLETED)
+
+            cancel_all = cancel_check is not None and cancel_check()
+            now = time.perf_counter()
+            for name, execution in list(pending.items()):
+                future = execution.future
+                if future.done() and not future.cancelled():
+                    try:
+                        value, elapsed = future.result()
+                        results[name] = QueryResult(name, value=value, elapsed=elapsed,
+                                                    attempts=execution.attempts)
+                    except TimeoutError as e:
+                        results[name] = QueryResult(name, error=e, elapsed=now - started, timed_out=True,
+                                                    attempts=execution.attempts)
+                    except Exception as e:
+                        results[name] = QueryResult(name, error=e, elapsed=now - started,
+                                                    attempts=execution.attempts)
+                elif cancel_all:
+                    execution.cancel()
+                    results[name] = QueryResult(name, error=QueryCancelled(f"{name} was cancelled"),
+                                                elapsed=now - started, attempts=execution.attempts)
+                elif now >= deadlines[name]:
+                    # Cancel the statement on the server instead of leaving it to run on;
+                    # a query that overruns its deadline counts against the breaker
+                    execution.cancel()
+                    self.breaker.record_failure()
+                    results[name] = QueryResult(
+                        name, error=TimeoutError(f"{name} did not finish within {execution.timeout}s"),
+                        elapsed=now - started, timed_out=True, attempts=execution.attempts
+                    )
+                else:
+                    continue
+                del pending[name]
+        return {name: results[name] for name in tasks}
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.pool.close_all()
@@ -0,0 +1,120 @@
+from typing import List, Tuple
+
+from derived import DEFAULT_TOLERANCE, DERIVED_COLUMNS, PER_UNIT_COLUMNS, refresh_statement
+
+# Idempotent DDL applied once per process, in order. Each entry is (name, T-SQL batch).
+MIGRATIONS: List[Tuple[str, str]] = [
+    ('create_data_version', """
+    IF OBJECT_ID('dbo.DataVersion', 'U') IS NULL
+    BEGIN
+        CREATE TABLE dbo.DataVersion (
+            Name NVARCHAR(64) NOT NULL PRIMARY KEY,
+            Version BIGINT NOT NULL DEFAULT 0,
+            UpdatedAt DATETIME2 NOT NULL DEFAULT SYSUTCDATETIME()
+        )
+    END
+    """),
+    ('seed_data_version', """
+    IF NOT EXISTS (SELECT 1 FROM dbo.DataVersion WHERE Name = 'MonthlyFinancials')
+        INSERT INTO dbo.DataVersion (Name, Version) VALUES ('MonthlyFinancials', 0)
+    """),
+    ('add_row_hash', """
+    IF COL_LENGTH('dbo.MonthlyFinancials', 'RowHash') IS NULL
+        ALTER TABLE dbo.MonthlyFinancials ADD RowHash CHAR(32) NULL
+    """),
+    # Rates are annual decimals. AmortizationMonths NULL/0 means interest-only to maturity; any
+    # balance left at TermMonths is a balloon. Floating loans pay the index plus Spread, bounded
+    # by RateFloor and RateCap.
+    ('create_loans', """
+    IF OBJECT_ID('dbo.Loans', 'U') IS NULL
+    BEGIN
+        CREATE TABLE dbo.Loans (
+            LoanID INT IDENTITY(1,1) NOT NULL PRIMARY KEY,
+            PropertyID INT NOT NULL REFERENCES dbo.Properties (PropertyID),
+            LoanName NVARCHAR(100) NULL,
+            OriginalBalance DECIMAL(18,2) NOT NULL,
+            OriginationDate DATE NOT NULL,
+            TermMonths INT NOT NULL CHECK (TermMonths > 0),
+            AmortizationMonths INT NULL,
+            InterestOnlyMonths INT NOT NULL DEFAULT 0,
+            RateType VARCHAR(10) NOT NULL DEFAULT 'Fixed' CHECK (RateType IN ('Fixed', 'Floating')),
+            InterestRate DECIMAL(9,6) NULL,
+            Spread DECIMAL(9,6) NULL,
+            RateFloor DECIMAL(9,6) NULL,
+            RateCap DECIMAL(9,6) NULL,
+            IsActive BIT NOT NULL DEFAULT 1
+        )
+        CREATE INDEX IX_Loans_PropertyID ON dbo.Loans (PropertyID)
+    END
+    """),
+    # Rent roll imports bump their own counter; the rent roll views poll it lazily
+    ('seed_rent_roll_version', """
+    IF NOT EXISTS (SELECT 1 FROM dbo.DataVersion WHERE Name = 'RentRoll')
+        INSERT INTO dbo.DataVersion (Name, Version) VALUES ('RentRoll', 0)
+    """),
+    ('index_rent_roll', """
+    IF OBJECT_ID('dbo.Units', 'U') IS NOT NULL
+        AND NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Units_PropertyID')
+        CREATE INDEX IX_Units_PropertyID ON dbo.Units (PropertyID) INCLUDE (UnitType, SquareFeet, MarketRent)
+    IF OBJECT_ID('dbo.Tenants', 'U') IS NOT NULL
+        AND NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Tenants_UnitID_LeaseStart')
+        CREATE INDEX IX_Tenants_UnitID_LeaseStart ON dbo.Tenants (UnitID, LeaseStart)
+            INCLUDE (MonthlyRent, LeaseEnd, MoveOutDate)
+    """),
+    # Debt feeds the same cached views as MonthlyFinancials, so loan edits made anywhere bump
+    # its data version and every session reloads
+    ('loans_data_version_trigger', """
+    IF OBJECT_ID('dbo.TR_Loans_DataVersion', 'TR') IS NULL
+        EXEC('CREATE TRIGGER dbo.TR_Loans_DataVersion ON dbo.Loans AFTER INSERT, UPDATE, DELETE AS
+              BEGIN
+                  SET NOCOUNT ON
+                  UPDATE dbo.DataVersion SET Version = Version + 1, UpdatedAt = SYSUTCDATETIME()
+                  WHERE Name = ''MonthlyFinancials''
+              END')
+    """),
+    # Derived ratios are written with each row; existing rows are backfilled once, when the
+    # columns are added. The refresh is dynamic SQL so it compiles after the ALTER.
+    ('add_derived_metrics', f"""
+    IF COL_LENGTH('dbo.MonthlyFinancials', 'VacancyPct') IS NULL
+    BEGIN
+        ALTER TABLE dbo.MonthlyFinancials ADD {', '.join(f'{column} FLOAT NULL' for column in DERIVED_COLUMNS)}
+        EXEC(N'DECLARE @Tolerance FLOAT = {DEFAULT_TOLERANCE};
+              {refresh_statement().replace("'", "''")}')
+    END
+    """),
+    # Covers the portfolio and property reads, which filter or group on ReportingMonth
+    ('index_derived_metrics', f"""
+    IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_MonthlyFinancials_ReportingMonth')
+        CREATE INDEX IX_MonthlyFinancials_ReportingMonth ON dbo.MonthlyFinancials (ReportingMonth)
+            INCLUDE (PropertyID, TotalIncome, TotalExpenses, NOI, CashFlow, {', '.join(DERIVED_COLUMNS)})
+    """),
+    # Per-unit figures follow Properties.UnitCount, however it is edited
+    ('properties_per_unit_trigger', f"""
+    IF OBJECT_ID('dbo.TR_Properties_PerUnitMetrics', 'TR') IS NULL
+        EXEC(N'CREATE TRIGGER dbo.TR_Properties_PerUnitMetrics ON dbo.Properties AFTER UPDATE AS
+              BEGIN
+                  SET NOCOUNT ON
+                  IF NOT UPDATE(UnitCount) RETURN
+                  DECLARE @Tolerance FLOAT = {DEFAULT_TOLERANCE}
+                  {refresh_statement('mf.PropertyID IN (SELECT PropertyID FROM inserted)', PER_UNIT_COLUMNS)
+                   .replace("'", "''")}
+                  UPDATE dbo.DataVersion SET Version = Version + 1, UpdatedAt = SYSUTCDATETIME()
+                  WHERE Name = ''MonthlyFinancials''
+              END')
+    """),
+]
+
+
+def ensure_schema(conn) -> List[str]:
+    """Apply every migration; each statement is a no-op when its object already exists"""
+    applied = []
+    cursor = conn.cursor()
+    try:
+        for name, statement in MIGRATIONS:
+            cursor.execute(statement)
+            applied.append(name)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return applied
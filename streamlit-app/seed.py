@@ -0,0 +1,272 @@
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from cube import LINE_ITEMS
+from derived import DERIVED_COLUMNS, with_derived_metrics
+from etl import row_hashes
+from schema import ensure_schema
+
+# Base tables the dashboard reads, for standing up a local database (the Azure database already has them)
+BASE_TABLES: List[Tuple[str, str]] = [
+    ('create_properties', """
+    IF OBJECT_ID('dbo.Properties', 'U') IS NULL
+    BEGIN
+        CREATE TABLE dbo.Properties (
+            PropertyID INT IDENTITY(1,1) NOT NULL PRIMARY KEY,
+            PropertyName NVARCHAR(200) NOT NULL,
+            PurchasePrice DECIMAL(18,2) NULL,
+            UnitCount INT NULL
+        )
+    END
+    """),
+    ('create_monthly_financials', """
+    IF OBJECT_ID('dbo.MonthlyFinancials', 'U') IS NULL
+    BEGIN
+        CREATE TABLE dbo.MonthlyFinancials (
+            FinancialID INT IDENTITY(1,1) NOT NULL PRIMARY KEY,
+            PropertyID INT NOT NULL REFERENCES dbo.Properties (PropertyID),
+            ReportingMonth DATE NOT NULL,
+            GrossRent DECIMAL(18,2) NULL, Vacancy DECIMAL(18,2) NULL, OtherIncome DECIMAL(18,2) NULL,
+            TotalIncome DECIMAL(18,2) NULL, RepairsMaintenance DECIMAL(18,2) NULL,
+            Utilities DECIMAL(18,2) NULL, PropertyManagement DECIMAL(18,2) NULL,
+            PropertyTaxes DECIMAL(18,2) NULL, Insurance DECIMAL(18,2) NULL,
+            Marketing DECIMAL(18,2) NULL, Administrative DECIMAL(18,2) NULL,
+            TotalExpenses DECIMAL(18,2) NULL, NOI DECIMAL(18,2) NULL,
+            DebtService DECIMAL(18,2) NULL, CashFlow DECIMAL(18,2) NULL,
+            Occupancy DECIMAL(5,2) NULL,
+            FilePath NVARCHAR(260) NULL,
+            CONSTRAINT UQ_MonthlyFinancials_PropertyMonth UNIQUE (PropertyID, ReportingMonth)
+        )
+    END
+    """),
+    ('create_units', """
+    IF OBJECT_ID('dbo.Units', 'U') IS NULL
+    BEGIN
+        CREATE TABLE dbo.Units (
+            UnitID INT IDENTITY(1,1) NOT NULL PRIMARY KEY,
+            PropertyID INT NOT NULL REFERENCES dbo.Properties (PropertyID),
+            UnitNumber NVARCHAR(20) NOT NULL,
+            UnitType NVARCHAR(20) NULL,
+            Bedrooms INT NULL,
+            SquareFeet INT NULL,
+            MarketRent DECIMAL(18,2) NULL,
+            CONSTRAINT UQ_Units_PropertyUnit UNIQUE (PropertyID, UnitNumber)
+        )
+    END
+    """),
+    ('create_tenants', """
+    IF OBJECT_ID('dbo.Tenants', 'U') IS NULL
+    BEGIN
+        CREATE TABLE dbo.Tenants (
+            TenantID INT IDENTITY(1,1) NOT NULL PRIMARY KEY,
+            UnitID INT NOT NULL REFERENCES dbo.Units (UnitID),
+            TenantName NVARCHAR(200) NULL,
+            LeaseStart DATE NOT NULL,
+            LeaseEnd DATE NULL,
+            MonthlyRent DECIMAL(18,2) NULL,
+            MoveOutDate DATE NULL
+        )
+    END
+    """),
+]
+
+# Share of gross rent each expense line takes, before noise
+EXPENSE_RATIOS = {
+    'RepairsMaintenance': 0.08, 'Utilities': 0.05, 'PropertyManagement': 0.04, 'PropertyTaxes': 0.10,
+    'Insurance': 0.03, 'Marketing': 0.01, 'Administrative': 0.03,
+}
+
+INSERT_BATCH_ROWS = 1000
+
+
+def create_base_tables(conn) -> List[str]:
+    """Create Properties, MonthlyFinancials, Units and Tenants if missing, then apply the migrations"""
+    cursor = conn.cursor()
+    for _, statement in BASE_TABLES:
+        cursor.execute(statement)
+    conn.commit()
+    return [name for name, _ in BASE_TABLES] + ensure_schema(conn)
+
+
+def synthetic_properties(count: int, rng: np.random.Generator) -> pd.DataFrame:
+    units = rng.integers(24, 400, size=count)
+    return pd.DataFrame({
+        'PropertyName': [f"Seed Property {i + 1:05d}" for i in range(count)],
+        'PurchasePrice': (units * rng.uniform(90_000, 220_000, size=count)).round(-3),
+        'UnitCount': units
+    })
+
+
+def synthetic_financials(property_ids: np.ndarray, unit_counts: np.ndarray, months: int,
+                         end_month: pd.Timestamp, rng: np.random.Generator) -> pd.DataFrame:
+    """Monthly line items with rent growth, seasonal occupancy and noisy expenses, internally consistent"""
+    month_index = pd.date_range(end=end_month, periods=months, freq='MS')
+    p, m = len(property_ids), len(month_index)
+
+    base_rent = unit_counts[:, None] * rng.uniform(900, 2200, size=(p, 1))
+    growth = (1 + rng.normal(0.03, 0.01, size=(p, 1)) / 12) ** np.arange(m)[None, :]
+    seasonal = 1.5 * np.sin(2 * np.pi * (month_index.month.to_numpy() - 3) / 12)[None, :]
+    occupancy = np.clip(rng.normal(93, 3, size=(p, 1)) + seasonal + rng.normal(0, 1.5, size=(p, m)), 60, 100)
+
+    gross = base_rent * growth
+    data = {
+        'GrossRent': gross,
+        'Vacancy': gross * (100 - occupancy) / 100,
+        'OtherIncome': gross * rng.uniform(0.02, 0.06, size=(p, m)),
+        'Occupancy': occupancy,
+        'DebtService': np.repeat(gross[:, :1] * rng.uniform(0.25, 0.45, size=(p, 1)), m, axis=1),
+    }
+    data['TotalIncome'] = data['GrossRent'] - data['Vacancy'] + data['OtherIncome']
+    for item, ratio in EXPENSE_RATIOS.items():
+        data[item] = gross * ratio * rng.lognormal(0, 0.15, size=(p, m))
+    data['TotalExpenses'] = sum(data[item] for item in EXPENSE_RATIOS)
+    data['NOI'] = data['TotalIncome'] - data['TotalExpenses']
+    data['CashFlow'] = data['NOI'] - data['DebtService']
+
+    frame = pd.DataFrame({item: np.round(data[item], 2).ravel() for item in LINE_ITEMS})
+    frame.insert(0, 'PropertyID', np.repeat(property_ids, m))
+    frame.insert(1, 'ReportingMonth', np.tile(month_index.date, p))
+    return frame
+
+
+def synthetic_loans(property_ids: np.ndarray, purchase_prices: np.ndarray, end_month: pd.Timestamp,
+                    rng: np.random.Generator) -> pd.DataFrame:
+    """One acquisition loan per property: fixed with some interest-only, or capped floating bridge debt"""
+    p = len(property_ids)
+    floating = rng.random(p) < 0.3
+    originated = pd.DatetimeIndex([end_month - pd.DateOffset(months=int(m)) for m in rng.integers(1, 72, size=p)])
+    return pd.DataFrame({
+        'PropertyID': property_ids,
+        'LoanName': np.where(floating, 'Bridge Loan', 'Senior Mortgage'),
+        'OriginalBalance': (purchase_prices * rng.uniform(0.55, 0.70, size=p)).round(-3),
+        'OriginationDate': originated.date,
+        'TermMonths': np.where(floating, 36 + 12 * rng.integers(0, 3, size=p), rng.choice([84, 120], size=p)),
+        'AmortizationMonths': np.where(floating, 0, 360),
+        'InterestOnlyMonths': np.where(floating, 0, rng.choice([0, 12, 24], size=p)),
+        'RateType': np.where(floating, 'Floating', 'Fixed'),
+        'InterestRate': np.where(floating, np.nan, rng.uniform(0.035, 0.065, size=p).round(4)),
+        'Spread': np.where(floating, rng.uniform(0.02, 0.035, size=p).round(4), np.nan),
+        'RateFloor': np.where(floating, 0.05, np.nan),
+        'RateCap': np.where(floating, 0.075, np.nan)
+    })
+
+
+UNIT_TYPES = [('Studio', 0, 480, 0.75), ('1BR', 1, 720, 1.0), ('2BR', 2, 1050, 1.3), ('3BR', 3, 1350, 1.6)]
+
+
+def synthetic_rent_roll(property_ids: np.ndarray, unit_counts: np.ndarray, as_of: pd.Timestamp,
+                        rng: np.random.Generator) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Units with a type mix and market rents, and one current tenant per occupied unit.
+
+    Leases run 12 months from a start in the past year; a few have lapsed into month-to-month.
+    Tenants are keyed by (PropertyID, UnitNumber) since UnitIDs only exist after insert.
+    """
+    property_column = np.repeat(property_ids, unit_counts)
+    n = len(property_column)
+    numbers = np.concatenate([np.arange(1, count + 1) for count in unit_counts]) if n else np.array([], int)
+    kinds = rng.choice(len(UNIT_TYPES), size=n, p=[0.1, 0.4, 0.4, 0.1])
+    names, bedrooms, sizes, factors = (np.array(column) for column in zip(*UNIT_TYPES))
+    base = np.repeat(rng.uniform(900, 2200, size=len(property_ids)), unit_counts)
+    units = pd.DataFrame({
+        'PropertyID': property_column,
+        'UnitNumber': [f"{number:04d}" for number in numbers],
+        'UnitType': names[kinds],
+        'Bedrooms': bedrooms[kinds],
+        'SquareFeet': (sizes[kinds] * rng.uniform(0.85, 1.15, size=n)).round().astype(int),
+        'MarketRent': (base * factors[kinds] * rng.uniform(0.95, 1.05, size=n)).round(0)
+    })
+
+    occupied = rng.random(n) < rng.normal(0.93, 0.03)
+    starts = pd.DatetimeIndex([as_of - pd.DateOffset(days=int(d)) for d in rng.integers(0, 365, size=n)])
+    lapsed = rng.random(n) < 0.05
+    ends = starts + pd.DateOffset(months=12) - pd.DateOffset(days=1)
+    ends = ends.where(~lapsed, starts - pd.DateOffset(days=1))
+    tenants = pd.DataFrame({
+        'PropertyID': units['PropertyID'],
+        'UnitNumber': units['UnitNumber'],
+        'TenantName': [f"Resident {i + 1:06d}" for i in range(n)],
+        'LeaseStart': (starts.where(~lapsed, starts - pd.DateOffset(months=12))).date,
+        'LeaseEnd': ends.date,
+        'MonthlyRent': (units['MarketRent'] * rng.uniform(0.9, 1.02, size=n)).round(0)
+    })[occupied]
+    return units, tenants
+
+
+def seed_database(conn, properties: int = 25, months: int = 36, seed: int = 0,
+                  end_month: Optional[str] = None, replace: bool = False) -> Dict:
+    """Fill a local database with synthetic properties, monthly financials, loans and a rent roll.
+
+    Data is deterministic for a given seed, so load-test runs at the same scale are comparable.
+    With `replace`, existing rows in every seeded table are deleted first.
+    """
+    rng = np.random.default_rng(seed)
+    create_base_tables(conn)
+    cursor = conn.cursor()
+    cursor.fast_executemany = True
+    try:
+        if replace:
+            cursor.execute("DELETE FROM dbo.MonthlyFinancials")
+            cursor.execute("DELETE FROM dbo.Loans")
+            cursor.execute("DELETE FROM dbo.Tenants")
+            cursor.execute("DELETE FROM dbo.Units")
+            cursor.execute("DELETE FROM dbo.Properties")
+
+        frame = synthetic_properties(properties, rng)
+        property_ids = []
+        for row in frame.itertuples(index=False):
+            cursor.execute("""
+            INSERT INTO dbo.Properties (PropertyName, PurchasePrice, UnitCount)
+            OUTPUT INSERTED.PropertyID VALUES (?, ?, ?)
+            """, (row.PropertyName, float(row.PurchasePrice), int(row.UnitCount)))
+            property_ids.append(cursor.fetchone()[0])
+
+        end = pd.Timestamp(end_month or pd.Timestamp.today()).to_period('M').to_timestamp()
+        financials = synthetic_financials(np.asarray(property_ids), frame['UnitCount'].to_numpy(), months, end, rng)
+        financials['RowHash'] = row_hashes(financials)
+        financials = with_derived_metrics(financials, dict(zip(property_ids, frame['UnitCount'])))
+
+        columns = ['PropertyID', 'ReportingMonth'] + LINE_ITEMS + DERIVED_COLUMNS + ['RowHash']
+        insert = f"""
+        INSERT INTO dbo.MonthlyFinancials ({', '.join(columns)}, FilePath)
+        VALUES ({', '.join('?' * len(columns))}, 'Seed')
+        """
+        values = financials[columns].astype(object)
+        rows = [tuple(row) for row in values.where(values.notna(), None).itertuples(index=False)]
+        for i in range(0, len(rows), INSERT_BATCH_ROWS):
+            cursor.executemany(insert, rows[i:i + INSERT_BATCH_ROWS])
+
+        loans = synthetic_loans(np.asarray(property_ids), frame['PurchasePrice'].to_numpy(), end, rng)
+        loan_columns = list(loans.columns)
+        loan_rows = [tuple(None if pd.isna(value) else value for value in row)
+                     for row in loans.astype(object).itertuples(index=False)]
+        cursor.executemany(f"""
+        INSERT INTO dbo.Loans ({', '.join(loan_columns)})
+        VALUES ({', '.join('?' * len(loan_columns))})
+        """, loan_rows)
+
+        units, tenants = synthetic_rent_roll(np.asarray(property_ids), frame['UnitCount'].to_numpy(),
+                                             pd.Timestamp.today().normalize(), rng)
+        unit_columns = list(units.columns)
+        cursor.executemany(f"""
+        INSERT INTO dbo.Units ({', '.join(unit_columns)})
+        VALUES ({', '.join('?' * len(unit_columns))})
+        """, [tuple(row) for row in units.astype(object).itertuples(index=False)])
+        tenant_rows = [(row.TenantName, row.LeaseStart, row.LeaseEnd, row.MonthlyRent, row.PropertyID, row.UnitNumber)
+                       for row in tenants.astype(object).itertuples(index=False)]
+        for i in range(0, len(tenant_rows), INSERT_BATCH_ROWS):
+            cursor.executemany("""
+            INSERT INTO dbo.Tenants (UnitID, TenantName, LeaseStart, LeaseEnd, MonthlyRent)
+            SELECT UnitID, ?, ?, ?, ? FROM dbo.Units WHERE PropertyID = ? AND UnitNumber = ?
+            """, tenant_rows[i:i + INSERT_BATCH_ROWS])
+
+        cursor.execute("UPDATE dbo.DataVersion SET Version = Version + 1, UpdatedAt = SYSUTCDATETIME() "
+                       "WHERE Name IN ('MonthlyFinancials', 'RentRoll')")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    return {'properties': len(property_ids), 'months': months, 'rows': len(rows), 'loans': len(loan_rows),
+            'units': len(units), 'tenants': len(tenant_rows), 'seed': seed}
@@ -0,0 +1,132 @@
+import json
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from valuation import ValuationEngine, irr, loan_schedule
+
+# Assumptions that can span a grid axis: label, offsets around the current assumption, display format.
+# Vacancy has no single current value (each property keeps its own), so its axis is absolute.
+AXES = {
+    'rent_growth': ("Rent Growth", [-0.02, -0.01, 0.0, 0.01, 0.02], '{:.2%}'),
+    'expense_growth': ("Expense Growth", [-0.02, -0.01, 0.0, 0.01, 0.02], '{:.2%}'),
+    'vacancy': ("Vacancy", [0.03, 0.05, 0.07, 0.10, 0.15], '{:.1%}'),
+    'exit_cap_rate': ("Exit Cap", [-0.0075, -0.005, -0.0025, 0.0, 0.0025, 0.005, 0.0075], '{:.2%}'),
+}
+
+# Grid metrics and how each is shown
+METRICS = {
+    'DCF Value': '${:,.0f}',
+    'Exit Value': '${:,.0f}',
+    'Year 1 NOI': '${:,.0f}',
+    'Year 1 DSCR': '{:.2f}x',
+    'Unlevered IRR': '{:.1f}%',
+}
+
+MAX_GRID_CELLS = 2500
+
+
+def axis_values(name: str, engine: ValuationEngine, values: Optional[Sequence[float]] = None) -> np.ndarray:
+    """Explicit axis values, or the default offsets around the engine's current assumption"""
+    if values is not None:
+        return np.asarray(values, dtype=float)
+    _, offsets, _ = AXES[name]
+    if name == 'vacancy':
+        return np.asarray(offsets)
+    return getattr(engine.assumptions, name) + np.asarray(offsets)
+
+
+def grid_key(axes: Dict[str, Sequence[float]]) -> str:
+    """Stable cache key for a set of grid axes"""
+    return json.dumps({name: [round(float(v), 10) for v in values] for name, values in axes.items()})
+
+
+class SensitivityGrid:
+    """Evaluate valuation metrics over a full grid of two or three assumption axes at once.
+
+    Every axis becomes a leading array dimension; the cash-flow functions broadcast them against
+    the [property, year] matrices, so the whole grid is one vectorized evaluation per metric.
+    """
+
+    def __init__(self, engine: ValuationEngine, month=None):
+        self.engine = engine
+        self.month = month
+        self.base = engine.base_year(month)
+        # Properties without a T12 at this month have nothing to project
+        self.rows = np.flatnonzero(self.base['months'] > 0)
+
+    def evaluate(self, axes: Dict[str, Sequence[float]], metric: str = 'DCF Value',
+                 property_id: Optional[int] = None) -> np.ndarray:
+        """Metric over the grid, shaped [len(axis) for axis in axes]; portfolio totals unless property_id"""
+        if not 2 <= len(axes) <= 3:
+            raise ValueError("A sensitivity grid needs two or three axes")
+        unknown = [name for name in axes if name not in AXES]
+        if unknown or metric not in METRICS:
+            raise ValueError(f"Unknown axis or metric: {unknown or metric}")
+        cells = int(np.prod([len(values) for values in axes.values()]))
+        if cells > MAX_GRID_CELLS:
+            raise ValueError(f"Grid has {cells:,} cells; the limit is {MAX_GRID_CELLS:,}")
+
+        rows = self.rows
+        if property_id is not None:
+            row = self.engine.cube.property_index.get(int(property_id))
+            rows = self.rows[self.rows == row] if row is not None else self.rows[:0]
+        base = {name: values[rows] for name, values in self.base.items()}
+
+        # Axis k gets shape [1, .., n_k, .., 1, 1]: one slot per grid axis plus the property axis
+        dims = len(axes)
+        grid = {}
+        for k, (name, values) in enumerate(axes.items()):
+            shape = [1] * (dims + 1)
+            shape[k] = len(values)
+            grid[name] = np.asarray(values, dtype=float).reshape(shape)
+
+        a = self.engine.assumptions
+        projected = self.engine.cash_flows(base, **grid)
+        shape = tuple(len(values) for values in axes.values())
+        flows = np.broadcast_to(projected['flows'], shape + (len(rows), a.hold_years))
+        sale = np.broadcast_to(projected['sale'], shape + (len(rows),))
+        noi = np.broadcast_to(projected['noi'][..., 0], shape + (len(rows),))
+
+        if metric == 'DCF Value':
+            discount = (1 + a.discount_rate) ** -np.arange(1, a.hold_years + 1)
+            return (flows @ discount + sale * discount[-1]).sum(axis=-1)
+        if metric == 'Exit Value':
+            return sale.sum(axis=-1)
+        if metric == 'Year 1 NOI':
+            return noi.sum(axis=-1)
+
+        # Entry at the cost basis (or today's direct-cap value), as in ValuationEngine.value
+        direct = base['noi'] / self.engine.cap_rates()[rows]
+        entry = np.where(base['purchase_price'] > 0, base['purchase_price'], direct).sum()
+        if metric == 'Year 1 DSCR':
+            debt_service, _ = loan_schedule(entry * a.ltv, a.loan_rate, a.amortization_years, a.hold_years)
+            return noi.sum(axis=-1) / debt_service if debt_service > 0 else np.full(shape, np.nan)
+
+        combined = flows.sum(axis=-2).copy()
+        combined[..., -1] += sale.sum(axis=-1)
+        cash_flows = np.concatenate([np.full(shape + (1,), -entry), combined], axis=-1)
+        return irr(cash_flows) * 100
+
+    def table(self, axes: Dict[str, Sequence[float]], metric: str = 'DCF Value',
+              property_id: Optional[int] = None) -> List[pd.DataFrame]:
+        """Heatmap-ready frames: rows = first axis, columns = second, one frame per third-axis value"""
+        result = self.evaluate(axes, metric, property_id)
+        names = list(axes)
+        labels = [[AXES[name][2].format(v) for v in axes[name]] for name in names]
+        row_label, column_label = AXES[names[0]][0], AXES[names[1]][0]
+
+        planes = [result] if result.ndim == 2 else [result[..., i] for i in range(result.shape[-1])]
+        frames = []
+        for i, plane in enumerate(planes):
+            frame = pd.DataFrame(plane, index=pd.Index(labels[0], name=row_label),
+                                 columns=pd.Index(labels[1], name=column_label))
+            if result.ndim == 3:
+                frame.attrs['slice'] = f"{AXES[names[2]][0]} {labels[2][i]}"
+            frames.append(frame)
+        return frames
+
+    @property
+    def nbytes(self) -> int:
+        return sum(array.nbytes for array in self.base.values()) + self.rows.nbytes
@@ -0,0 +1,175 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+def measure_bytes(value: Any) -> int:
+    """Actual in-memory size of a cached value (deep for DataFrames and containers)"""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if hasattr(value, 'nbytes'):
+        return int(value.nbytes)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(measure_bytes(k) + measure_bytes(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set)):
+        return sys.getsizeof(value) + sum(measure_bytes(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class CacheEntry:
+    """One cached value with its measured size and usage bookkeeping"""
+
+    def __init__(self, value: Any, size: int):
+        self.value = value
+        self.size = size
+        self.created = time.time()
+        self.last_access = self.created
+        self.hits = 0
+        self.sessions = set()
+
+
+class SharedFrameCache:
+    """Process-wide LRU cache for immutable query results and derived frames, bounded in bytes"""
+
+    def __init__(self, budget_bytes: int):
+        self.budget_bytes = budget_bytes
+        self._entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._build_locks: Dict[Hashable, threading.Lock] = {}
+        self.used_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def contains(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def keys(self) -> List[Hashable]:
+        with self._lock:
+            return list(self._entries)
+
+    def get(self, key: Hashable, session_id: Optional[str] = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            entry.hits += 1
+            entry.last_access = time.time()
+            if session_id is not None:
+                entry.sessions.add(session_id)
+            return entry.value
+
+    def put(self, key: Hashable, value: Any, session_id: Optional[str] = None) -> Any:
+        """Store a value; values larger than the whole budget are returned but not cached"""
+        size = measure_bytes(value)
+        with self._lock:
+            self._remove(key)
+            if size > self.budget_bytes:
+                return value
+            entry = CacheEntry(value, size)
+            if session_id is not None:
+                entry.sessions.add(session_id)
+            self._entries[key] = entry
+            self.used_bytes += size
+            self._evict()
+        return value
+
+    def get_or_create(self, key: Hashable, build_fn: Callable[[], Any], session_id: Optional[str] = None) -> Any:
+        """Return the cached value, building it at most once even when sessions race for it"""
+        value = self.get(key, session_id)
+        if value is not None:
+            return value
+
+        with self._lock:
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+        with build_lock:
+            # Another session may have finished the build while we waited
+            value = self.get(key, session_id)
+            if value is None:
+                value = build_fn()
+                if value is not None:
+                    self.put(key, value, session_id)
+        with self._lock:
+            self._build_locks.pop(key, None)
+        return value
+
+    def latest(self, name: str, session_id: Optional[str] = None) -> Optional[Tuple[Hashable, Any]]:
+        """(key, value) of the newest-version entry named `name`; the last-known-good fallback"""
+        with self._lock:
+            keys = [key for key in self._entries
+                    if isinstance(key, tuple) and len(key) > 1 and key[0] == name and key[1] is not None]
+        if not keys:
+            return None
+        key = max(keys, key=lambda key: key[1])
+        value = self.get(key, session_id)
+        return (key, value) if value is not None else None
+
+    def rekey(self, old_key: Hashable, new_key: Hashable):
+        """Move an entry to a new key (e.g. a cube patched in place for a newer data version)"""
+        with self._lock:
+            entry = self._entries.pop(old_key, None)
+            if entry is None or old_key == new_key:
+                if entry is not None:
+                    self._entries[old_key] = entry
+                return
+            self._remove(new_key)
+            self._entries[new_key] = entry
+
+    def invalidate(self, predicate: Optional[Callable[[Hashable], bool]] = None) -> int:
+        """Drop entries whose key matches `predicate` (everything when omitted)"""
+        with self._lock:
+            keys = [key for key in self._entries if predicate is None or predicate(key)]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.used_bytes -= entry.size
+
+    def _evict(self):
+        # Least recently used entries go first
+        while self.used_bytes > self.budget_bytes and self._entries:
+            _, entry = self._entries.popitem(last=False)
+            self.used_bytes -= entry.size
+            self.evictions += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'used_bytes': self.used_bytes,
+                'budget_bytes': self.budget_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+    def stats_frame(self) -> pd.DataFrame:
+        """Per-entry bytes, hits and referencing sessions, most recently used first"""
+        now = time.time()
+        with self._lock:
+            rows = [{
+                'Key': ' / '.join(str(part) for part in (key if isinstance(key, tuple) else (key,))),
+                'Bytes': entry.size,
+                'MB': entry.size / 1024 ** 2,
+                'Hits': entry.hits,
+                'Sessions': len(entry.sessions),
+                'Age (s)': round(now - entry.created, 1),
+                'Idle (s)': round(now - entry.last_access, 1)
+            } for key, entry in reversed(self._entries.items())]
+        return pd.DataFrame(rows, columns=['Key', 'Bytes', 'MB', 'Hits', 'Sessions', 'Age (s)', 'Idle (s)'])
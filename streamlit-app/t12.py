@@ -0,0 +1,234 @@
+import fnmatch
+import json
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from cube import LINE_ITEMS
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+# MonthlyFinancials column -> GL account codes / line item labels (fnmatch patterns, case-insensitive).
+# Several GL lines may map to one column; their amounts are summed.
+DEFAULT_COA_MAPPING: Dict[str, List[str]] = {
+    'GrossRent': ['gross potential rent*', 'gross rent*', 'rental income', 'market rent', '40[01]*'],
+    'Vacancy': ['vacancy*', 'loss to lease', 'concessions*', 'bad debt*', '405*'],
+    'OtherIncome': ['other income*', 'late fee*', 'utility reimbursement*', 'parking*', 'laundry*',
+                    'pet fee*', 'application fee*', '44*'],
+    'RepairsMaintenance': ['repairs*', 'maintenance*', 'r&m*', 'turnover*', 'make ready*', '61*'],
+    'Utilities': ['utilities*', 'electric*', 'water*', 'sewer*', 'gas', 'trash*', '62*'],
+    'PropertyManagement': ['management fee*', 'property management*', '63*'],
+    'PropertyTaxes': ['property tax*', 'real estate tax*', '64*'],
+    'Insurance': ['insurance*', '65*'],
+    'Marketing': ['marketing*', 'advertising*', '66*'],
+    'Administrative': ['administrative*', 'office*', 'payroll*', 'professional fees*', 'g&a*', '67*'],
+    'DebtService': ['debt service*', 'mortgage payment*', 'interest expense*', 'principal*', '8*'],
+    'Occupancy': ['occupancy*', 'physical occupancy*', '% occupied'],
+}
+
+# Income lines net into TotalIncome; vacancy and credit loss reduce it
+EXPENSE_ITEMS = ['RepairsMaintenance', 'Utilities', 'PropertyManagement', 'PropertyTaxes',
+                 'Insurance', 'Marketing', 'Administrative']
+
+# Subtotal rows the workbook computes itself; we recompute them from the mapped lines
+SUBTOTAL_PATTERN = re.compile(r'^(total|net|subtotal)\b', re.IGNORECASE)
+ACCOUNT_PATTERN = re.compile(r'^\d{3,6}([-.]\d+)?$')
+PROPERTY_PATTERN = re.compile(r'^\s*property\s*(name)?\s*[:\-]\s*(.+)$', re.IGNORECASE)
+HEADER_SCAN_ROWS = 25
+
+
+def load_mapping(path: Optional[str] = None) -> Dict[str, List[str]]:
+    """Chart-of-accounts mapping from a JSON file of {column: [patterns]}, or the default"""
+    if path is None:
+        return DEFAULT_COA_MAPPING
+    with open(path, encoding='utf-8') as f:
+        mapping = json.load(f)
+    unknown = [column for column in mapping if column not in LINE_ITEMS]
+    if unknown:
+        raise ValueError(f"Mapping targets unknown MonthlyFinancials columns: {unknown}")
+    return mapping
+
+
+def _as_month(value) -> Optional[pd.Timestamp]:
+    """Header cell -> first-of-month timestamp, for datetime cells and labels like 'Jan 2024'"""
+    if isinstance(value, (datetime, date)):
+        return pd.Timestamp(value).replace(day=1).normalize()
+    if isinstance(value, str) and re.search(r'[A-Za-z]{3}', value) and re.search(r'\d{2}', value):
+        month = pd.to_datetime(value.strip(), errors='coerce', format='mixed')
+        if pd.notna(month):
+            return month.replace(day=1).normalize()
+    return None
+
+
+def match_column(label: Optional[str], account: Optional[str], mapping: Dict[str, List[str]]) -> Optional[str]:
+    """First MonthlyFinancials column whose patterns match the GL account code or label"""
+    candidates = [text.strip().lower() for text in (account, label) if text]
+    for column, patterns in mapping.items():
+        for pattern in patterns:
+            if any(fnmatch.fnmatchcase(text, pattern.lower()) for text in candidates):
+                return column
+    return None
+
+
+def read_t12_workbook(path: str, mapping: Dict[str, List[str]], sheet: Optional[str] = None) -> Dict:
+    """Stream one T12 workbook in read-only mode and unpivot it to one row per month.
+
+    Returns the property name found on the sheet (or the file name), a frame with
+    ReportingMonth plus the mapped MonthlyFinancials columns, and the unmapped GL lines.
+    """
+    if openpyxl is None:
+        raise ImportError("T12 ingestion requires openpyxl")
+
+    started = time.perf_counter()
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        worksheet = workbook[sheet] if sheet else workbook.worksheets[0]
+        property_name = None
+        month_columns: List[Tuple[int, pd.Timestamp]] = []
+        labels, accounts, amounts = [], [], []
+
+        for row_number, row in enumerate(worksheet.iter_rows(values_only=True)):
+            if not month_columns:
+                # Title block: look for the property name, then the row of month headers
+                for cell in row:
+                    if isinstance(cell, str) and property_name is None:
+                        match = PROPERTY_PATTERN.match(cell)
+                        if match:
+                            property_name = match.group(2).strip()
+                months = [(i, _as_month(cell)) for i, cell in enumerate(row)]
+                months = [(i, month) for i, month in months if month is not None]
+                if len(months) >= 3:
+                    month_columns = months
+                elif row_number >= HEADER_SCAN_ROWS:
+                    raise ValueError(f"No row of month headers in the first {HEADER_SCAN_ROWS} rows")
+                continue
+
+            first_month = month_columns[0][0]
+            text_cells = [str(cell).strip() for cell in row[:first_month] if cell is not None and str(cell).strip()]
+            if not text_cells:
+                continue
+            account = next((cell for cell in text_cells if ACCOUNT_PATTERN.match(cell)), None)
+            label = next((cell for cell in text_cells if cell != account), None)
+            values = [row[i] if i < len(row) else None for i, _ in month_columns]
+            if not any(isinstance(value, (int, float)) for value in values):
+                continue  # section heading
+            labels.append(label)
+            accounts.append(account)
+            amounts.append([float(value) if isinstance(value, (int, float)) else np.nan for value in values])
+    finally:
+        workbook.close()
+
+    if not month_columns:
+        raise ValueError("No row of month headers found")
+
+    lines = pd.DataFrame(amounts, columns=[month for _, month in month_columns])
+    lines.insert(0, 'Account', accounts)
+    lines.insert(1, 'Label', labels)
+    lines['Column'] = [None if label and SUBTOTAL_PATTERN.match(label) else match_column(label, account, mapping)
+                       for label, account in zip(labels, accounts)]
+    subtotal = lines['Label'].fillna('').str.match(SUBTOTAL_PATTERN)
+    unmapped = lines[lines['Column'].isna() & ~subtotal][['Account', 'Label']]
+
+    frame = unpivot_lines(lines[lines['Column'].notna()], [month for _, month in month_columns])
+    return {
+        'file': os.path.basename(path),
+        'property_name': property_name or os.path.splitext(os.path.basename(path))[0],
+        'frame': frame,
+        'unmapped': unmapped.to_dict('records'),
+        'seconds': time.perf_counter() - started
+    }
+
+
+def unpivot_lines(lines: pd.DataFrame, months: List[pd.Timestamp]) -> pd.DataFrame:
+    """GL lines x months -> one row per month with MonthlyFinancials columns and derived totals"""
+    long = lines.melt(id_vars=['Column'], value_vars=months, var_name='ReportingMonth', value_name='Amount')
+    occupancy = long['Column'] == 'Occupancy'
+    wide = long[~occupancy].pivot_table(index='ReportingMonth', columns='Column', values='Amount',
+                                        aggfunc='sum', fill_value=0.0)
+    wide = wide.reindex(index=pd.Index(months, name='ReportingMonth'), fill_value=0.0)
+    # Occupancy is a rate: average rather than sum when several lines report it
+    wide['Occupancy'] = long[occupancy].groupby('ReportingMonth')['Amount'].mean().reindex(months).fillna(0.0).to_numpy()
+
+    frame = wide.reindex(columns=LINE_ITEMS, fill_value=0.0).astype(float)
+    # T12s show vacancy and credit loss as negative income; MonthlyFinancials stores the loss as a positive amount
+    frame['Vacancy'] = frame['Vacancy'].abs()
+    frame['TotalIncome'] = frame['GrossRent'] - frame['Vacancy'] + frame['OtherIncome']
+    frame['TotalExpenses'] = frame[EXPENSE_ITEMS].sum(axis=1)
+    frame['NOI'] = frame['TotalIncome'] - frame['TotalExpenses']
+    frame['CashFlow'] = frame['NOI'] - frame['DebtService']
+    # Occupancy recorded as a fraction (0.95) is stored as a percentage
+    frame.loc[frame['Occupancy'].between(0, 1, inclusive='right'), 'Occupancy'] *= 100
+
+    frame = frame.reset_index()
+    frame.columns.name = None
+    frame['ReportingMonth'] = frame['ReportingMonth'].dt.date
+    return frame
+
+
+def _read_job(job: Dict) -> Dict:
+    return read_t12_workbook(**job)
+
+
+def ingest_workbooks(paths: Iterable[str], mapping: Optional[Dict[str, List[str]]] = None,
+                     property_ids: Optional[Dict[str, int]] = None, workers: Optional[int] = None,
+                     sheet: Optional[str] = None) -> Dict:
+    """Parse workbooks across a process pool and stack them into one import-ready frame.
+
+    `property_ids` maps property names (case-insensitive) to PropertyID; workbooks whose
+    property cannot be resolved are reported in `failed` rather than imported.
+    """
+    started = time.perf_counter()
+    mapping = mapping or DEFAULT_COA_MAPPING
+    lookup = {name.strip().lower(): pid for name, pid in (property_ids or {}).items()}
+    jobs = [{'path': path, 'mapping': mapping, 'sheet': sheet} for path in paths]
+
+    parsed, failed = [], []
+    workers = min(workers or os.cpu_count() or 1, max(len(jobs), 1))
+    if workers == 1:
+        for job in jobs:
+            try:
+                parsed.append(_read_job(job))
+            except Exception as e:
+                failed.append({'file': os.path.basename(job['path']), 'error': str(e)})
+    else:
+        # Spawned workers stay safe when the caller is a multithreaded Streamlit process
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            futures = {executor.submit(_read_job, job): job['path'] for job in jobs}
+            for future in as_completed(futures):
+                try:
+                    parsed.append(future.result())
+                except Exception as e:
+                    failed.append({'file': os.path.basename(futures[future]), 'error': str(e)})
+
+    frames, files = [], []
+    for result in sorted(parsed, key=lambda r: r['file']):
+        property_id = lookup.get(result['property_name'].strip().lower())
+        if property_id is None:
+            failed.append({'file': result['file'], 'error': f"Unknown property '{result['property_name']}'"})
+            continue
+        frames.append(result['frame'].assign(PropertyID=property_id))
+        files.append({'file': result['file'], 'property': result['property_name'], 'property_id': property_id,
+                      'months': len(result['frame']), 'unmapped': result['unmapped'],
+                      'parse_seconds': result['seconds']})
+
+    columns = ['PropertyID', 'ReportingMonth'] + LINE_ITEMS
+    frame = pd.concat(frames, ignore_index=True)[columns] if frames else pd.DataFrame(columns=columns)
+    seconds = time.perf_counter() - started
+    return {
+        'frame': frame,
+        'files': files,
+        'failed': failed,
+        'seconds': seconds,
+        'workbooks_per_second': len(files) / seconds if seconds > 0 else 0.0
+    }
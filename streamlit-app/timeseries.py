@@ -0,0 +1,262 @@
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+# Portfolio metrics that are summed across properties and months
+SUM_METRICS = ['Revenue', 'Expenses', 'NOI', 'CashFlow']
+
+# Window presets offered in the sidebar
+RANGE_MODES = [
+    "Calendar Year",
+    "Year to Date",
+    "Trailing 12 Months",
+    "Trailing 3 Months",
+    "Custom Range"
+]
+
+
+def month_ordinal(value) -> int:
+    """Convert a date-like value to a month ordinal (year * 12 + month - 1)"""
+    ts = pd.Timestamp(value)
+    return ts.year * 12 + ts.month - 1
+
+
+def ordinal_to_timestamp(ordinal: int) -> pd.Timestamp:
+    """Convert a month ordinal back to the first day of that month"""
+    return pd.Timestamp(year=ordinal // 12, month=ordinal % 12 + 1, day=1)
+
+
+class TimeRangeEngine:
+    """Serve any sub-window of the portfolio monthly series from cached arrays"""
+
+    def __init__(self, monthly_df: pd.DataFrame):
+        self.start_ordinal = 0
+        self.length = 0
+        self.arrays: Dict[str, np.ndarray] = {}
+        self.present = np.zeros(0, dtype=bool)
+        self._delta_cache: Dict[str, pd.DataFrame] = {}
+
+        if monthly_df is None or monthly_df.empty:
+            return
+
+        ordinals = pd.to_datetime(monthly_df['ReportingMonth']).map(month_ordinal).to_numpy()
+        self.start_ordinal = int(ordinals.min())
+        self.length = int(ordinals.max()) - self.start_ordinal + 1
+        positions = ordinals - self.start_ordinal
+
+        # Dense monthly arrays; months without data stay NaN
+        self.present = np.zeros(self.length, dtype=bool)
+        self.present[positions] = True
+        for column in SUM_METRICS + ['VacancySum', 'VacancyCount', 'PropertyCount']:
+            values = np.full(self.length, np.nan)
+            values[positions] = monthly_df[column].to_numpy(dtype=float)
+            self.arrays[column] = values
+
+        # VacancySum/VacancyCount total the stored VacancyPct, already a 0-100 percent per row
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.arrays['Vacancy'] = np.where(self.arrays['VacancyCount'] > 0,
+                                              self.arrays['VacancySum'] / self.arrays['VacancyCount'], 0.0)
+            self.arrays['NOI_Margin'] = np.where(self.arrays['Revenue'] > 0,
+                                                 self.arrays['NOI'] / self.arrays['Revenue'] * 100, np.nan)
+        self.arrays['Vacancy'][~self.present] = np.nan
+
+    @property
+    def nbytes(self) -> int:
+        cached = sum(int(frame.memory_usage(deep=True).sum()) for frame in self._delta_cache.values())
+        return self.present.nbytes + sum(array.nbytes for array in self.arrays.values()) + cached
+
+    @property
+    def is_empty(self) -> bool:
+        return self.length == 0
+
+    @property
+    def first_month(self) -> Optional[pd.Timestamp]:
+        return None if self.is_empty else ordinal_to_timestamp(self.start_ordinal)
+
+    @property
+    def last_month(self) -> Optional[pd.Timestamp]:
+        return None if self.is_empty else ordinal_to_timestamp(self.start_ordinal + self.length - 1)
+
+    def years(self) -> List[int]:
+        """Years covered by the loaded series"""
+        if self.is_empty:
+            return []
+        return list(range(self.first_month.year, self.last_month.year + 1))
+
+    def months(self) -> List[pd.Timestamp]:
+        """Every month in the loaded series, including gaps"""
+        return [ordinal_to_timestamp(self.start_ordinal + i) for i in range(self.length)]
+
+    def _slice(self, start, end) -> slice:
+        """Translate a [start, end] month window to array positions (clamped)"""
+        lo = month_ordinal(start) - self.start_ordinal
+        hi = month_ordinal(end) - self.start_ordinal + 1
+        return slice(min(max(lo, 0), self.length), min(max(hi, 0), self.length))
+
+    # Window presets
+    def calendar_year(self, year: int) -> Tuple[pd.Timestamp, pd.Timestamp]:
+        return pd.Timestamp(year=year, month=1, day=1), pd.Timestamp(year=year, month=12, day=1)
+
+    def ytd(self, year: int, through_month: Optional[int] = None) -> Tuple[pd.Timestamp, pd.Timestamp]:
+        """Year-to-date window, matching the KPI query's MONTH(GETDATE()) cutoff"""
+        through_month = through_month or datetime.now().month
+        return pd.Timestamp(year=year, month=1, day=1), pd.Timestamp(year=year, month=through_month, day=1)
+
+    def trailing(self, months: int, end=None) -> Tuple[pd.Timestamp, pd.Timestamp]:
+        """Trailing N-month window ending at the latest loaded month (or `end`)"""
+        end_ordinal = month_ordinal(end) if end is not None else self.start_ordinal + self.length - 1
+        return ordinal_to_timestamp(end_ordinal - months + 1), ordinal_to_timestamp(end_ordinal)
+
+    def resolve(self, mode: str, year: Optional[int] = None, start=None, end=None) -> Tuple[pd.Timestamp, pd.Timestamp]:
+        """Resolve a sidebar range mode to a (start, end) month window"""
+        if mode == "Year to Date":
+            return self.ytd(year)
+        if mode == "Trailing 12 Months":
+            return self.trailing(12)
+        if mode == "Trailing 3 Months":
+            return self.trailing(3)
+        if mode == "Custom Range":
+            return pd.Timestamp(start).replace(day=1), pd.Timestamp(end).replace(day=1)
+        return self.calendar_year(year)
+
+    # Views
+    def window(self, start, end) -> pd.DataFrame:
+        """Monthly performance rows for the window, shaped like get_monthly_performance"""
+        columns = ['ReportingMonth'] + SUM_METRICS + ['Vacancy', 'NOI_Margin']
+        if self.is_empty:
+            return pd.DataFrame(columns=columns)
+
+        window = self._slice(start, end)
+        present = self.present[window]
+        ordinals = np.arange(self.length)[window][present] + self.start_ordinal
+
+        data = {'ReportingMonth': pd.to_datetime([ordinal_to_timestamp(o) for o in ordinals])}
+        for column in SUM_METRICS + ['Vacancy', 'NOI_Margin']:
+            data[column] = self.arrays[column][window][present]
+        return pd.DataFrame(data, columns=columns)
+
+    def totals(self, start, end) -> Dict:
+        """Window totals for the summed metrics plus the row-weighted average vacancy"""
+        totals = {column: 0.0 for column in SUM_METRICS}
+        totals.update({'Vacancy': 0.0, 'PropertyCount': 0})
+        if self.is_empty:
+            return totals
+
+        window = self._slice(start, end)
+        for column in SUM_METRICS:
+            totals[column] = float(np.nansum(self.arrays[column][window]))
+
+        vacancy_count = np.nansum(self.arrays['VacancyCount'][window])
+        if vacancy_count > 0:
+            totals['Vacancy'] = float(np.nansum(self.arrays['VacancySum'][window]) / vacancy_count)
+
+        # Distinct properties cannot be recovered from monthly counts; report the peak month
+        property_counts = self.arrays['PropertyCount'][window]
+        if np.any(~np.isnan(property_counts)):
+            totals['PropertyCount'] = int(np.nanmax(property_counts))
+        return totals
+
+    def last_reported(self, start, end) -> Optional[pd.Timestamp]:
+        """Latest month in [start, end] with data, or None"""
+        if self.is_empty:
+            return None
+        window = self._slice(start, end)
+        positions = np.flatnonzero(self.present[window])
+        if len(positions) == 0:
+            return None
+        return ordinal_to_timestamp(self.start_ordinal + window.start + int(positions[-1]))
+
+    def kpis(self, start, end) -> Dict:
+        """KPI dict for the window with variances against the same window a year earlier"""
+        current = self.totals(start, end)
+        # Compare like for like: a partly reported window (the current calendar year) is
+        # matched with the same months a year earlier, not the full prior window
+        start_ts, end_ts = pd.Timestamp(start), self.last_reported(start, end) or pd.Timestamp(end)
+        previous = self.totals(start_ts - pd.DateOffset(years=1), end_ts - pd.DateOffset(years=1))
+
+        current_noi, prev_noi = current['NOI'], previous['NOI']
+        current_revenue, prev_revenue = current['Revenue'], previous['Revenue']
+        noi_variance = ((current_noi - prev_noi) / prev_noi * 100) if prev_noi != 0 else 0
+        revenue_variance = ((current_revenue - prev_revenue) / prev_revenue * 100) if prev_revenue != 0 else 0
+
+        return {
+            'total_revenue': current_revenue,
+            'total_expenses': current['Expenses'],
+            'total_noi': current_noi,
+            'avg_vacancy': current['Vacancy'],
+            'property_count': current['PropertyCount'],
+            'noi_variance': noi_variance,
+            'revenue_variance': revenue_variance,
+            'prev_noi': prev_noi,
+            'prev_revenue': prev_revenue
+        }
+
+    def deltas(self, metric: str) -> pd.DataFrame:
+        """MoM and YoY changes (absolute and percent) for every loaded month"""
+        if metric in self._delta_cache:
+            return self._delta_cache[metric]
+
+        values = self.arrays[metric]
+        prev_month = np.full(self.length, np.nan)
+        prev_month[1:] = values[:-1]
+        prev_year = np.full(self.length, np.nan)
+        prev_year[12:] = values[:-12]
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mom_pct = np.where(prev_month != 0, (values - prev_month) / np.abs(prev_month) * 100, np.nan)
+            yoy_pct = np.where(prev_year != 0, (values - prev_year) / np.abs(prev_year) * 100, np.nan)
+
+        df = pd.DataFrame({
+            'ReportingMonth': pd.to_datetime(self.months()),
+            metric: values,
+            'MoM': values - prev_month,
+            'MoM_Pct': mom_pct,
+            'YoY': values - prev_year,
+            'YoY_Pct': yoy_pct
+        })
+        self._delta_cache[metric] = df
+        return df
+
+    def window_deltas(self, metric: str, start, end) -> pd.DataFrame:
+        """MoM/YoY changes restricted to the months with data inside the window"""
+        if self.is_empty:
+            return pd.DataFrame(columns=['ReportingMonth', metric, 'MoM', 'MoM_Pct', 'YoY', 'YoY_Pct'])
+        window = self._slice(start, end)
+        df = self.deltas(metric).iloc[window]
+        return df[self.present[window]].reset_index(drop=True)
+
+    def rolling(self, metric: str, months: int, how: str = 'sum') -> np.ndarray:
+        """Rolling window sum/mean over the full series using cumulative sums"""
+        values = self.arrays[metric]
+        filled = np.nan_to_num(values, nan=0.0)
+        counts = (~np.isnan(values)).astype(float)
+
+        csum = np.concatenate([[0.0], np.cumsum(filled)])
+        ccount = np.concatenate([[0.0], np.cumsum(counts)])
+        window_sum = np.full(self.length, np.nan)
+        window_count = np.zeros(self.length)
+        if self.length >= months:
+            window_sum[months - 1:] = csum[months:] - csum[:-months]
+            window_count[months - 1:] = ccount[months:] - ccount[:-months]
+
+        # Only report windows that are fully populated
+        window_sum[window_count < months] = np.nan
+        if how == 'mean':
+            return window_sum / months
+        return window_sum
+
+    def yoy_overlay(self, metric: str) -> pd.DataFrame:
+        """Metric by calendar month (rows 1-12) with one column per year"""
+        if self.is_empty:
+            return pd.DataFrame()
+        first_year = self.first_month.year
+        offset = self.start_ordinal - first_year * 12
+        years = self.years()
+
+        # Pad the series to whole years and fold it into a years x 12 matrix
+        grid = np.full(len(years) * 12, np.nan)
+        grid[offset:offset + self.length] = self.arrays[metric]
+        grid = grid.reshape(len(years), 12)
+
+        return pd.DataFrame(grid.T, index=pd.Index(range(1, 13), name='Month'), columns=years)
@@ -0,0 +1,261 @@
+import json
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from cube import ITEM_INDEX
+from rolling import RollingEngine
+
+# Rates the IRR solver searches between; anything outside is reported as NaN
+IRR_BOUNDS = (-0.99, 10.0)
+IRR_TOLERANCE = 1e-9
+IRR_MAX_ITERATIONS = 100
+
+
+class ValuationAssumptions:
+    """Underwriting assumptions applied to every property, with optional per-property cap rates"""
+
+    def __init__(self, cap_rate: float = 0.055, exit_cap_rate: float = 0.06, discount_rate: float = 0.08,
+                 hold_years: int = 5, rent_growth: float = 0.03, expense_growth: float = 0.03,
+                 vacancy: Optional[float] = None, capex_per_unit: float = 250.0, selling_cost: float = 0.02,
+                 ltv: float = 0.65, loan_rate: float = 0.065, amortization_years: int = 30,
+                 cap_rate_overrides: Optional[Dict[int, float]] = None):
+        if hold_years < 1:
+            raise ValueError("hold_years must be at least 1")
+        if cap_rate <= 0 or exit_cap_rate <= 0:
+            raise ValueError("Cap rates must be positive")
+        self.cap_rate = float(cap_rate)
+        self.exit_cap_rate = float(exit_cap_rate)
+        self.discount_rate = float(discount_rate)
+        self.hold_years = int(hold_years)
+        self.rent_growth = float(rent_growth)
+        self.expense_growth = float(expense_growth)
+        # None keeps each property's own T12 vacancy rate
+        self.vacancy = None if vacancy is None else float(vacancy)
+        self.capex_per_unit = float(capex_per_unit)
+        self.selling_cost = float(selling_cost)
+        self.ltv = float(ltv)
+        self.loan_rate = float(loan_rate)
+        self.amortization_years = int(amortization_years)
+        self.cap_rate_overrides = {int(pid): float(rate) for pid, rate in (cap_rate_overrides or {}).items()}
+
+    def to_dict(self) -> Dict:
+        return {'cap_rate': self.cap_rate, 'exit_cap_rate': self.exit_cap_rate,
+                'discount_rate': self.discount_rate, 'hold_years': self.hold_years,
+                'rent_growth': self.rent_growth, 'expense_growth': self.expense_growth,
+                'vacancy': self.vacancy, 'capex_per_unit': self.capex_per_unit,
+                'selling_cost': self.selling_cost, 'ltv': self.ltv, 'loan_rate': self.loan_rate,
+                'amortization_years': self.amortization_years, 'cap_rate_overrides': self.cap_rate_overrides}
+
+
+def assumptions_key(assumptions: ValuationAssumptions) -> str:
+    """Stable cache key for an assumption set"""
+    return json.dumps(assumptions.to_dict(), sort_keys=True)
+
+
+# Cash-flow building blocks. Assumption arguments broadcast against the property axis, so a
+# scalar values every property alike and an array shaped [..., 1] evaluates a grid of scenarios.
+
+def project_noi(gross_rent: np.ndarray, other_income: np.ndarray, expenses: np.ndarray, vacancy,
+                rent_growth, expense_growth, years: int) -> np.ndarray:
+    """Annual NOI for years 1..years; shape [..., property, year]"""
+    t = np.arange(1, years + 1)
+    vacancy = np.asarray(vacancy, dtype=float)
+    income = (gross_rent * (1 - vacancy) + other_income)[..., None] * (1 + np.asarray(rent_growth))[..., None] ** t
+    costs = expenses[..., None] * (1 + np.asarray(expense_growth))[..., None] ** t
+    return income - costs
+
+
+def loan_schedule(principal: np.ndarray, rate: float, amortization_years: int, hold_years: int):
+    """Annual debt service and the balance left at the end of the hold for fully amortizing loans"""
+    monthly = rate / 12
+    periods = amortization_years * 12
+    if monthly == 0:
+        payment = principal / periods
+        balance = principal - payment * hold_years * 12
+    else:
+        payment = principal * monthly / (1 - (1 + monthly) ** -periods)
+        growth = (1 + monthly) ** (hold_years * 12)
+        balance = principal * growth - payment * (growth - 1) / monthly
+    return payment * 12, np.maximum(balance, 0.0)
+
+
+def npv(rates: np.ndarray, cash_flows: np.ndarray) -> np.ndarray:
+    """Net present value per row of [..., period] cash flows, period 0 undiscounted"""
+    t = np.arange(cash_flows.shape[-1])
+    return np.sum(cash_flows * (1 + rates)[..., None] ** -t, axis=-1)
+
+
+def irr(cash_flows: np.ndarray, tol: float = IRR_TOLERANCE, max_iter: int = IRR_MAX_ITERATIONS) -> np.ndarray:
+    """IRR of every row at once: Newton steps, falling back to bisection when a step leaves the bracket.
+
+    Rows whose NPV does not change sign inside IRR_BOUNDS have no IRR there and come back NaN.
+    Converged rows drop out of the iteration, so a few slow rows don't hold up the batch.
+    """
+    cash_flows = np.asarray(cash_flows, dtype=float)
+    shape = cash_flows.shape[:-1]
+    flows = cash_flows.reshape(-1, cash_flows.shape[-1])
+    t = np.arange(flows.shape[-1])
+    result = np.full(len(flows), np.nan)
+
+    lo = np.full(len(flows), IRR_BOUNDS[0])
+    hi = np.full(len(flows), IRR_BOUNDS[1])
+    with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+        f_lo, f_hi = npv(lo, flows), npv(hi, flows)
+        active = np.flatnonzero(np.isfinite(f_lo) & np.isfinite(f_hi) & (np.sign(f_lo) != np.sign(f_hi)))
+        lo, hi, f_lo, flows = lo[active], hi[active], f_lo[active], flows[active]
+        rate = np.full(len(active), 0.1)
+
+        for _ in range(max_iter):
+            if len(active) == 0:
+                break
+            discount = (1 + rate)[:, None] ** -t
+            f = np.sum(flows * discount, axis=1)
+            df = -np.sum(t * flows * discount, axis=1) / (1 + rate)
+
+            # Keep the root bracketed: replace whichever end has the same NPV sign
+            same = np.sign(f) == np.sign(f_lo)
+            lo = np.where(same, rate, lo)
+            f_lo = np.where(same, f, f_lo)
+            hi = np.where(same, hi, rate)
+
+            step = rate - f / df
+            bisect = ~np.isfinite(step) | (step <= lo) | (step >= hi)
+            updated = np.where(bisect, (lo + hi) / 2, step)
+            converged = np.abs(updated - rate) <= tol * (1 + np.abs(rate))
+            result[active[converged]] = updated[converged]
+
+            keep = ~converged
+            active, rate, lo, hi, f_lo, flows = (active[keep], updated[keep], lo[keep], hi[keep],
+                                                 f_lo[keep], flows[keep])
+    return result.reshape(shape)
+
+
+class ValuationEngine:
+    """Direct-cap value, DCF value and unlevered/levered IRR for every property in one pass.
+
+    The base year is each property's T12 from the rolling engine at the valuation month. Cash
+    flows are [property, year] matrices built with the functions above, so the sensitivity
+    grids can reuse them with assumption axes broadcast in front.
+    """
+
+    def __init__(self, rolling: RollingEngine, assumptions: Optional[ValuationAssumptions] = None):
+        self.rolling = rolling
+        self.cube = rolling.cube
+        self.assumptions = assumptions or ValuationAssumptions()
+
+    def base_year(self, month=None) -> Dict[str, np.ndarray]:
+        """T12 figures per property for the window ending at `month` (default: latest month)"""
+        month = month if month is not None else self.cube.months()[-1]
+        values, counts = self.rolling.annualized('T12', month, month)
+        values, counts = values[:, 0, :], counts[:, 0]
+        item = lambda name: np.nan_to_num(values[:, ITEM_INDEX[name]])
+        gross = item('GrossRent')
+        with np.errstate(invalid='ignore', divide='ignore'):
+            vacancy = np.where(gross > 0, item('Vacancy') / gross, 0.0)
+        return {
+            'gross_rent': gross,
+            'vacancy': np.clip(vacancy, 0, 1),
+            'other_income': item('OtherIncome'),
+            'expenses': item('TotalExpenses'),
+            'noi': item('NOI'),
+            'debt_service': item('DebtService'),
+            'units': np.nan_to_num(self.cube.unit_counts),
+            'purchase_price': np.nan_to_num(self.cube.purchase_prices),
+            'months': counts
+        }
+
+    def cap_rates(self) -> np.ndarray:
+        rates = np.full(len(self.cube.property_ids), self.assumptions.cap_rate)
+        for property_id, rate in self.assumptions.cap_rate_overrides.items():
+            row = self.cube.property_index.get(property_id)
+            if row is not None:
+                rates[row] = rate
+        return rates
+
+    def cash_flows(self, base: Dict[str, np.ndarray], rent_growth=None, expense_growth=None, vacancy=None,
+                   exit_cap_rate=None) -> Dict[str, np.ndarray]:
+        """Unlevered annual cash flows over the hold plus the net sale proceeds in the final year"""
+        a = self.assumptions
+        rent_growth = a.rent_growth if rent_growth is None else rent_growth
+        expense_growth = a.expense_growth if expense_growth is None else expense_growth
+        if vacancy is None:
+            vacancy = base['vacancy'] if a.vacancy is None else a.vacancy
+        exit_cap_rate = a.exit_cap_rate if exit_cap_rate is None else exit_cap_rate
+
+        # One year past the hold is projected for the buyer's going-in NOI
+        noi = project_noi(base['gross_rent'], base['other_income'], base['expenses'], vacancy,
+                          rent_growth, expense_growth, a.hold_years + 1)
+        t = np.arange(1, a.hold_years + 1)
+        capex = (a.capex_per_unit * base['units'])[..., None] * (1 + np.asarray(expense_growth))[..., None] ** t
+        flows = noi[..., :a.hold_years] - capex
+        sale = noi[..., a.hold_years] / np.asarray(exit_cap_rate) * (1 - a.selling_cost)
+        return {'noi': noi, 'flows': flows, 'sale': sale}
+
+    def value(self, month=None) -> pd.DataFrame:
+        """One row per property with T12 NOI, direct-cap and DCF values, and IRRs on the cost basis"""
+        if self.cube.month_count == 0:
+            return pd.DataFrame()
+        a = self.assumptions
+        base = self.base_year(month)
+        caps = self.cap_rates()
+        direct = base['noi'] / caps
+
+        projected = self.cash_flows(base)
+        flows, sale = projected['flows'], projected['sale']
+        t = np.arange(1, a.hold_years + 1)
+        discount = (1 + a.discount_rate) ** -t
+        dcf = flows @ discount + sale * discount[-1]
+
+        # Entry at the cost basis; properties without one enter at today's direct-cap value
+        entry = np.where(base['purchase_price'] > 0, base['purchase_price'], direct)
+        unlevered = np.concatenate([-entry[:, None], flows], axis=1)
+        unlevered[:, -1] += sale
+
+        loan = entry * a.ltv
+        debt_service, balance = loan_schedule(loan, a.loan_rate, a.amortization_years, a.hold_years)
+        levered = np.concatenate([-(entry - loan)[:, None], flows - debt_service[:, None]], axis=1)
+        levered[:, -1] += sale - balance
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            value_vs_cost = np.where(base['purchase_price'] > 0, (direct / base['purchase_price'] - 1) * 100, np.nan)
+            equity_multiple = np.where(entry - loan > 0, levered[:, 1:].sum(axis=1) / (entry - loan), np.nan)
+            dscr = np.where(debt_service > 0, projected['noi'][:, 0] / debt_service, np.nan)
+
+        df = pd.DataFrame({
+            'PropertyID': self.cube.property_ids,
+            'PropertyName': self.cube.property_names,
+            'PurchasePrice': base['purchase_price'],
+            'T12 NOI': base['noi'],
+            'Cap Rate': caps,
+            'Direct Cap Value': direct,
+            'DCF Value': dcf,
+            'Value vs Cost %': value_vs_cost,
+            'Unlevered IRR': irr(unlevered) * 100,
+            'Levered IRR': irr(levered) * 100,
+            'Equity Multiple': equity_multiple,
+            'Year 1 DSCR': dscr
+        })
+        df = df[base['months'] > 0]
+        return df.sort_values('PropertyName', kind='stable').reset_index(drop=True)
+
+    @staticmethod
+    def summary(values: pd.DataFrame) -> Dict:
+        """Portfolio totals and value-weighted IRRs from a value() frame"""
+        if values.empty:
+            return {'direct_cap_value': 0.0, 'dcf_value': 0.0, 'cost_basis': 0.0,
+                    'unlevered_irr': np.nan, 'levered_irr': np.nan}
+        weights = values['Direct Cap Value'].clip(lower=0)
+
+        def weighted(column):
+            valid = values[column].notna() & (weights > 0)
+            return float(np.average(values.loc[valid, column], weights=weights[valid])) if valid.any() else np.nan
+
+        return {
+            'direct_cap_value': float(values['Direct Cap Value'].sum()),
+            'dcf_value': float(values['DCF Value'].sum()),
+            'cost_basis': float(values['PurchasePrice'].sum()),
+            'unlevered_irr': weighted('Unlevered IRR'),
+            'levered_irr': weighted('Levered IRR')
+        }
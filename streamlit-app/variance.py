@@ -0,0 +1,149 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+
+from cube import FinancialCube, LINE_ITEMS, ITEM_INDEX
+
+# Comparison name -> (baseline kind, months): 'lag' compares with the month N back,
+# 'mean' with the average of the N months before the current one
+COMPARISONS = {
+    'MoM': ('lag', 1),
+    'YoY': ('lag', 12),
+    'vs T3': ('mean', 3),
+    'vs T12 Avg': ('mean', 12),
+}
+
+LOOKBACK = max(months for _, months in COMPARISONS.values())
+
+# Baselines this small make percent changes meaningless, so they rank as NaN
+MIN_PERCENT_BASE = 1.0
+
+
+class VarianceEngine:
+    """Variance of every property x line item against each baseline, computed over the cube at once"""
+
+    def __init__(self, cube: FinancialCube):
+        self.cube = cube
+
+    def compute(self, start=None, end=None) -> Dict:
+        """Current values and every baseline for the months in [start, end] (default: latest month).
+
+        Arrays are shaped [property, month, line item]; missing months are NaN.
+        """
+        cube = self.cube
+        if start is None and end is None:
+            window = slice(max(cube.month_count - 1, 0), cube.month_count)
+        else:
+            window = cube._month_slice(start, end)
+        width = window.stop - window.start
+
+        # Extend the window back by the longest lookback, padding with empty months before the first
+        lo = window.start - LOOKBACK
+        mask = cube.mask[:, max(lo, 0):window.stop]
+        raw = cube.values[:, max(lo, 0):window.stop, :]
+        if lo < 0:
+            mask = np.pad(mask, ((0, 0), (-lo, 0)))
+            raw = np.pad(raw, ((0, 0), (-lo, 0), (0, 0)))
+        # NULL line items are NaN even in reported months, so validity is per cell
+        valid = mask[..., None] & ~np.isnan(raw)
+        values = np.where(valid, raw, 0.0)
+        masked = np.where(valid, raw, np.nan)
+
+        # Prefix sums over months; NULL cells are zeroed and counted out per line item so one
+        # NULL doesn't turn every later trailing mean NaN
+        sums = np.zeros((values.shape[0], values.shape[1] + 1, values.shape[2]))
+        np.cumsum(values, axis=1, out=sums[:, 1:, :])
+        counts = np.zeros(sums.shape, dtype=np.int64)
+        np.cumsum(valid, axis=1, out=counts[:, 1:, :])
+
+        current = masked[:, LOOKBACK:, :]
+        bases = {}
+        for name, (kind, months) in COMPARISONS.items():
+            if kind == 'lag':
+                bases[name] = masked[:, LOOKBACK - months:LOOKBACK - months + width, :]
+            else:
+                # Trailing mean of the N months before each month, from prefix sums
+                hi = np.arange(LOOKBACK, LOOKBACK + width)
+                total = sums[:, hi, :] - sums[:, hi - months, :]
+                count = counts[:, hi, :] - counts[:, hi - months, :]
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    bases[name] = np.where(count > 0, total / count, np.nan)
+
+        return {
+            'months': cube.months()[window],
+            'current': current,
+            'bases': bases
+        }
+
+    @staticmethod
+    def changes(current: np.ndarray, base: np.ndarray, min_base: float = MIN_PERCENT_BASE):
+        """Dollar and percent change against a baseline"""
+        change = current - base
+        with np.errstate(invalid='ignore', divide='ignore'):
+            percent = np.where(np.abs(base) >= min_base, change / np.abs(base) * 100, np.nan)
+        return change, percent
+
+    def table(self, month=None, items: Optional[List[str]] = None) -> pd.DataFrame:
+        """One row per property x line item for a month, with every comparison's change and percent"""
+        result = self.compute(month, month) if month is not None else self.compute()
+        if not result['months']:
+            return pd.DataFrame()
+
+        items = items or LINE_ITEMS
+        columns = [ITEM_INDEX[item] for item in items]
+        current = result['current'][:, 0, columns]
+        properties, lines = current.shape
+
+        data = {
+            'PropertyID': np.repeat(self.cube.property_ids, lines),
+            'PropertyName': np.repeat(np.asarray(self.cube.property_names, dtype=object), lines),
+            'LineItem': np.tile(np.asarray(items, dtype=object), properties),
+            'Current': current.ravel()
+        }
+        for name, base in result['bases'].items():
+            base = base[:, 0, columns]
+            change, percent = self.changes(current, base)
+            data[f'{name} Base'] = base.ravel()
+            data[f'{name} Change'] = change.ravel()
+            data[f'{name} %'] = percent.ravel()
+
+        df = pd.DataFrame(data)
+        df.insert(2, 'ReportingMonth', result['months'][0])
+        return df[~np.isnan(current.ravel())].reset_index(drop=True)
+
+    def movers(self, month=None, comparison: str = 'YoY', by: str = 'dollar', top: int = 20,
+               items: Optional[List[str]] = None) -> pd.DataFrame:
+        """Largest absolute movers for one comparison, ranked by dollar or percent change"""
+        result = self.compute(month, month) if month is not None else self.compute()
+        columns = ['PropertyID', 'PropertyName', 'ReportingMonth', 'LineItem', 'Current', 'Base', 'Change', 'Change %']
+        if not result['months']:
+            return pd.DataFrame(columns=columns)
+
+        items = items or LINE_ITEMS
+        index = [ITEM_INDEX[item] for item in items]
+        current = result['current'][:, 0, index]
+        base = result['bases'][comparison][:, 0, index]
+        change, percent = self.changes(current, base)
+
+        score = np.abs(percent if by == 'percent' else change).ravel()
+        score = np.where(np.isnan(score), -1.0, score)
+        valid = int((score >= 0).sum())
+        k = min(top, valid)
+        if k == 0:
+            return pd.DataFrame(columns=columns)
+
+        # Partial selection keeps ranking O(n) over properties x line items
+        picked = np.argpartition(-score, k - 1)[:k]
+        picked = picked[np.argsort(-score[picked], kind='stable')]
+        p, l = np.unravel_index(picked, current.shape)
+
+        return pd.DataFrame({
+            'PropertyID': self.cube.property_ids[p],
+            'PropertyName': [self.cube.property_names[i] for i in p],
+            'ReportingMonth': result['months'][0],
+            'LineItem': [items[i] for i in l],
+            'Current': current[p, l],
+            'Base': base[p, l],
+            'Change': change[p, l],
+            'Change %': percent[p, l]
+        }, columns=columns)
@@ -0,0 +1,239 @@
+import json
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from debt import DebtEngine
+from valuation import irr
+
+FUND_ID = 0
+FUND_NAME = 'Fund (all properties)'
+
+
+class WaterfallTerms:
+    """Distribution terms for one scenario.
+
+    Investors (LPs plus the GP's co-invest, pro rata) first receive the preferred return on
+    unreturned capital, then their capital back (or the reverse with `return_capital_first`).
+    The GP then takes `catch_up` of each dollar until it holds `carried_interest` of the profit
+    paid so far. After that cash splits `carried_interest` to the GP until investors reach the
+    first IRR hurdle in `promote_tiers`, then each tier's GP share until the next hurdle.
+    """
+
+    def __init__(self, pref_rate: float = 0.08, carried_interest: float = 0.20, catch_up: float = 1.0,
+                 gp_coinvest: float = 0.10, promote_tiers: Sequence[Tuple[float, float]] = ((0.12, 0.30),),
+                 return_capital_first: bool = False):
+        if not 0 <= carried_interest < 1 or not 0 <= gp_coinvest <= 1:
+            raise ValueError("carried_interest must be in [0, 1) and gp_coinvest in [0, 1]")
+        if not 0 <= catch_up <= 1:
+            raise ValueError("catch_up must be between 0 and 1")
+        tiers = sorted((float(hurdle), float(promote)) for hurdle, promote in promote_tiers)
+        if any(not 0 <= promote < 1 for _, promote in tiers):
+            raise ValueError("Promote shares must be in [0, 1)")
+        self.pref_rate = float(pref_rate)
+        self.carried_interest = float(carried_interest)
+        self.catch_up = float(catch_up)
+        self.gp_coinvest = float(gp_coinvest)
+        self.promote_tiers = tiers
+        self.return_capital_first = bool(return_capital_first)
+
+    def to_dict(self) -> Dict:
+        return {'pref_rate': self.pref_rate, 'carried_interest': self.carried_interest,
+                'catch_up': self.catch_up, 'gp_coinvest': self.gp_coinvest,
+                'promote_tiers': self.promote_tiers, 'return_capital_first': self.return_capital_first}
+
+
+def terms_key(scenarios: Sequence[WaterfallTerms]) -> str:
+    """Stable cache key for a list of scenarios"""
+    return json.dumps([terms.to_dict() for terms in scenarios], sort_keys=True)
+
+
+def monthly_rate(annual) -> np.ndarray:
+    return (1 + np.asarray(annual, dtype=float)) ** (1 / 12) - 1
+
+
+def _scenario_arrays(scenarios: Sequence[WaterfallTerms]) -> Dict[str, np.ndarray]:
+    """Terms as [scenario, 1] arrays; scenarios with fewer tiers repeat their last one at a 0% hurdle"""
+    tiers = max(len(terms.promote_tiers) for terms in scenarios)
+    hurdles = np.zeros((len(scenarios), tiers))
+    promotes = np.zeros((len(scenarios), tiers + 1))
+    for s, terms in enumerate(scenarios):
+        promotes[s, 0] = terms.carried_interest
+        for k in range(tiers):
+            if k < len(terms.promote_tiers):
+                hurdles[s, k], promotes[s, k + 1] = terms.promote_tiers[k]
+            else:
+                # A 0% hurdle is met once capital is back, which any higher hurdle already implies
+                promotes[s, k + 1] = promotes[s, k]
+    column = lambda name: np.array([getattr(terms, name) for terms in scenarios], dtype=float)[:, None]
+    return {
+        'pref': monthly_rate(column('pref_rate')),
+        'catch_up': column('catch_up'),
+        'carry': column('carried_interest'),
+        'coinvest': column('gp_coinvest'),
+        'capital_first': column('return_capital_first').astype(bool),
+        'hurdles': monthly_rate(hurdles)[:, None, :],
+        'promotes': promotes[:, None, :]
+    }
+
+
+def run_waterfall(contributions: np.ndarray, distributions: np.ndarray,
+                  scenarios: Sequence[WaterfallTerms]) -> Dict[str, np.ndarray]:
+    """Split each entity's cash under every scenario at once.
+
+    `contributions` and `distributions` are [entity, month] (or [scenario, entity, month])
+    non-negative cash amounts. Accounts are [scenario, entity] arrays stepped through the months
+    together, so cost grows with months, not with entities x scenarios. Returns LP and GP
+    contributions and distributions, each [scenario, entity, month], plus the GP's promote.
+    """
+    terms = _scenario_arrays(scenarios)
+    scenario_count = len(scenarios)
+    shape = (scenario_count,) + np.broadcast_shapes(contributions.shape[-2:], distributions.shape[-2:])[:1]
+    months = contributions.shape[-1]
+    contributions = np.broadcast_to(contributions, shape + (months,))
+    distributions = np.broadcast_to(distributions, shape + (months,))
+
+    unreturned = np.zeros(shape)
+    unpaid_pref = np.zeros(shape)
+    pref_paid = np.zeros(shape)
+    catch_up_paid = np.zeros(shape)
+    hurdle_accounts = np.zeros(shape + (terms['hurdles'].shape[-1],))
+    investor = np.zeros(shape + (months,))
+    promote = np.zeros(shape + (months,))
+
+    def pay_investors(cash, limit):
+        paid = np.minimum(cash, np.maximum(limit, 0.0))
+        hurdle_accounts[...] -= paid[..., None]
+        return paid
+
+    for t in range(months):
+        # Accrue on balances outstanding through the month, then add this month's calls
+        unpaid_pref += (unreturned + unpaid_pref) * terms['pref']
+        hurdle_accounts *= 1 + terms['hurdles']
+        called = contributions[..., t]
+        unreturned += called
+        hurdle_accounts += called[..., None]
+        cash = distributions[..., t].copy()
+        paid_to_investors = np.zeros(shape)
+
+        # Preferred return then capital, or capital then preferred return, per scenario
+        for step in range(2):
+            capital_step = terms['capital_first'] if step == 0 else ~terms['capital_first']
+            capital = pay_investors(np.where(capital_step, cash, 0.0), unreturned)
+            unreturned -= capital
+            pref = pay_investors(np.where(capital_step, 0.0, cash), unpaid_pref)
+            unpaid_pref -= pref
+            pref_paid += pref
+            cash -= capital + pref
+            paid_to_investors += capital + pref
+
+        # GP catch-up until promote = carry x (pref + catch-up); impossible when catch_up <= carry
+        with np.errstate(invalid='ignore', divide='ignore'):
+            catch_up_total = np.where(terms['catch_up'] > terms['carry'],
+                                      terms['carry'] * pref_paid / (terms['catch_up'] - terms['carry']), 0.0)
+        tier_cash = np.minimum(cash, np.maximum(catch_up_total - catch_up_paid, 0.0))
+        catch_up_paid += tier_cash
+        promote[..., t] += tier_cash * terms['catch_up']
+        paid_to_investors += pay_investors(tier_cash * (1 - terms['catch_up']), np.inf)
+        cash -= tier_cash
+
+        # Promote segments: each runs until investors reach the next hurdle; the last is unbounded
+        segments = terms['promotes'].shape[-1]
+        for k in range(segments):
+            share = terms['promotes'][..., k]
+            if k < segments - 1:
+                needed = np.maximum(hurdle_accounts[..., k], 0.0) / (1 - share)
+                tier_cash = np.minimum(cash, needed)
+            else:
+                tier_cash = cash
+            promote[..., t] += tier_cash * share
+            paid_to_investors += pay_investors(tier_cash * (1 - share), np.inf)
+            cash = cash - tier_cash
+        investor[..., t] = paid_to_investors
+
+    coinvest = terms['coinvest'][..., None]
+    return {
+        'lp_contributions': contributions * (1 - coinvest),
+        'gp_contributions': contributions * coinvest,
+        'lp_distributions': investor * (1 - coinvest),
+        'gp_distributions': investor * coinvest + promote,
+        'promote': promote
+    }
+
+
+def entity_cash_flows(debt: DebtEngine, exit_values: Optional[pd.Series] = None,
+                      ltv: float = 0.65) -> Dict:
+    """Monthly equity contributions and distributions per property, plus the fund as a whole.
+
+    Equity goes in the month before a property's first reported month: purchase price less its
+    loans' original balances (or less `ltv` of the price for properties without loans). Monthly
+    CashFlow is distributed when positive and called from investors when negative. With
+    `exit_values` (PropertyID -> value), a sale at the last month pays off the loan balance and
+    distributes the rest, giving a hypothetical-liquidation return.
+    """
+    cube = debt.cube
+    monthly = debt.monthly()
+    properties, months = monthly['mask'].shape
+    # Column 0 is the month before the cube starts, so the earliest properties can be funded
+    contributions = np.zeros((properties, months + 1))
+    distributions = np.zeros((properties, months + 1))
+
+    reported = monthly['mask'].any(axis=1)
+    first = np.argmax(monthly['mask'], axis=1)
+    borrowed = debt.loans.groupby('PropertyID')['OriginalBalance'].sum() if not debt.loans.empty else pd.Series()
+    loans = pd.Series(cube.property_ids).map(borrowed).to_numpy(dtype=float)
+    prices = np.nan_to_num(cube.purchase_prices)
+    equity = np.where(np.isnan(loans), prices * (1 - ltv), np.maximum(prices - np.nan_to_num(loans), 0.0))
+    rows = np.flatnonzero(reported)
+    contributions[rows, first[rows]] = equity[rows]
+
+    cash_flow = np.where(monthly['mask'], monthly['cash_flow'], 0.0)
+    distributions[:, 1:] = np.maximum(cash_flow, 0.0)
+    contributions[:, 1:] += np.maximum(-cash_flow, 0.0)
+
+    if exit_values is not None and months:
+        value = pd.Series(cube.property_ids).map(exit_values).to_numpy(dtype=float)
+        proceeds = np.nan_to_num(value) - monthly['balance'][:, -1]
+        sold = reported & ~np.isnan(value)
+        distributions[sold, -1] += np.maximum(proceeds[sold], 0.0)
+        contributions[sold, -1] += np.maximum(-proceeds[sold], 0.0)
+
+    ids = np.concatenate([[FUND_ID], cube.property_ids[rows]])
+    names = [FUND_NAME] + [cube.property_names[row] for row in rows]
+    start = pd.Timestamp(cube.months()[0]) - pd.DateOffset(months=1) if months else pd.Timestamp.today()
+    return {
+        'entity_ids': ids,
+        'entity_names': names,
+        'months': pd.date_range(start, periods=months + 1, freq='MS'),
+        'contributions': np.vstack([contributions[rows].sum(axis=0), contributions[rows]]),
+        'distributions': np.vstack([distributions[rows].sum(axis=0), distributions[rows]])
+    }
+
+
+def waterfall_summary(flows: Dict, result: Dict[str, np.ndarray],
+                      scenario_names: List[str]) -> pd.DataFrame:
+    """One row per scenario x entity: LP/GP contributed and distributed, IRR and multiple"""
+    def annual_irr(paid_in, paid_out):
+        return ((1 + irr(paid_out - paid_in)) ** 12 - 1) * 100
+
+    with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+        lp_in, lp_out = result['lp_contributions'], result['lp_distributions']
+        gp_in, gp_out = result['gp_contributions'], result['gp_distributions']
+        lp_contributed, lp_distributed = lp_in.sum(axis=-1), lp_out.sum(axis=-1)
+        gp_contributed, gp_distributed = gp_in.sum(axis=-1), gp_out.sum(axis=-1)
+        frame = {
+            'Scenario': np.repeat(scenario_names, len(flows['entity_ids'])),
+            'EntityID': np.tile(flows['entity_ids'], len(scenario_names)),
+            'Entity': np.tile(flows['entity_names'], len(scenario_names)),
+            'LP Contributed': lp_contributed.ravel(),
+            'LP Distributed': lp_distributed.ravel(),
+            'LP IRR': annual_irr(lp_in, lp_out).ravel(),
+            'LP Multiple': np.where(lp_contributed > 0, lp_distributed / lp_contributed, np.nan).ravel(),
+            'GP Contributed': gp_contributed.ravel(),
+            'GP Distributed': gp_distributed.ravel(),
+            'GP Promote': result['promote'].sum(axis=-1).ravel(),
+            'GP IRR': annual_irr(gp_in, gp_out).ravel(),
+            'GP Multiple': np.where(gp_contributed > 0, gp_distributed / gp_contributed, np.nan).ravel()
+        }
+    return pd.DataFrame(frame)